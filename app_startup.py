@@ -0,0 +1,20 @@
+import time
+
+# ==============================================
+# STARTUP BEFORE THE FIRST WINDOW
+# ==============================================
+#
+# Both apps import this module before anything else, so STARTED marks the
+# start of their imports and the time-to-first-paint they report covers
+# them. open_sources() is the part of their startup that needs no Tk;
+# benchmark.py times it (with its imports) in a fresh interpreter.
+
+STARTED = time.perf_counter()
+
+
+def open_sources(db_path, cache_size):
+    """Open the icon database and its thumbnail cache; returns (repo, thumbnails)."""
+    from icon_repository import IconRepository
+    from thumbnail_cache import ThumbnailCache
+
+    return IconRepository(db_path), ThumbnailCache(db_path, cache_size)
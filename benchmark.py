@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+
+# ==============================================
+# BENCHMARK SETTINGS
+# ==============================================
+
+DEFAULT_SIZES = (10_000, 100_000)   # add 1000000 with --sizes for the big run
+WORK_DIR = "bench_dbs"
+REPEAT = 5
+SEARCH_TERMS = ("sword", "fire ring", "ol", "0x0600")
+
+# Mirrors the app settings (the apps themselves need Tk, this must not)
+VIEWER_PAGE_SIZE = 8 * 4
+VIEWER_ICON = (64, 64)
+SHEET_GRID = (30, 20)   # contact-sheet mode: columns, rows
+SHEET_ICON = (32, 32)
+EDITOR_PAGE_SIZE = 100
+EDITOR_ICON = (32, 32)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _timed(fn, repeat=REPEAT):
+    """Run fn `repeat` times; returns the timing summary in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(times), 3),
+            "min_ms": round(min(times), 3), "runs": repeat}
+
+
+def run_scenarios(db_path):
+    """Time the query and decode paths the apps use against `db_path`."""
+    from contact_sheet import ContactSheet, SheetLayout
+    from icon_pager import KeysetPager
+    from icon_repository import IconRepository
+    from thumbnail_cache import ThumbnailCache, decode_thumbnail
+
+    results = {}
+    repo = IconRepository(db_path)
+    reader = repo.reader()
+    viewer_cols = ("icon_id", "name", "category", "icon_data")
+
+    def fresh_pager(term=""):
+        pager = KeysetPager(viewer_cols, VIEWER_PAGE_SIZE)
+        pager.set_query(term, repo.fts_enabled)
+        return pager
+
+    # -- viewer --------------------------------------------------------------
+    results["viewer.load_data"] = _timed(lambda: fresh_pager().count(reader))
+    last_page = fresh_pager().page_count(reader)
+    for label, page in (("first", 1), ("middle", last_page // 2), ("last", last_page)):
+        results[f"viewer.display_page[{label}]"] = _timed(
+            lambda page=page: repo.page(fresh_pager(), page))
+    pager = fresh_pager()
+    repo.page(pager, 1)
+    pages = iter(range(2, last_page + 1))
+    results["viewer.next_page"] = _timed(lambda: repo.page(pager, next(pages, 1)), repeat=20)
+    for term in SEARCH_TERMS:
+        results[f"viewer.search_icons[{term}]"] = _timed(
+            lambda term=term: repo.page(fresh_pager(term), 1))
+
+    blobs = [row[3] for row in repo.page(fresh_pager(), max(1, last_page // 3))]
+    results["viewer.decode_page"] = _timed(
+        lambda: [decode_thumbnail(b, VIEWER_ICON) for b in blobs])
+    thumbnails = ThumbnailCache(db_path)
+    thumbnails.thumbnails(blobs, VIEWER_ICON)  # warm the sidecar
+    results["viewer.cached_page"] = _timed(lambda: thumbnails.thumbnails(blobs, VIEWER_ICON))
+
+    sheet = ContactSheet(thumbnails, SheetLayout(*SHEET_GRID, SHEET_ICON), "#252526")
+    sheet_blobs = [row[3] for row in repo.page(
+        KeysetPager(viewer_cols, SHEET_GRID[0] * SHEET_GRID[1]), 2)]
+    sheet.prepare(sheet_blobs, SHEET_ICON)  # warm the sidecar
+    results["viewer.contact_sheet"] = _timed(lambda: sheet.prepare(sheet_blobs, SHEET_ICON))
+
+    # -- editor --------------------------------------------------------------
+    editor_cols = ("icon_id", "name", "category", "keywords")
+    results["editor.load_data"] = _timed(lambda: repo.search(editor_cols, ""), repeat=3)
+    results["editor.load_data[sword]"] = _timed(lambda: repo.search(editor_cols, "sword"))
+    rows = repo.search(editor_cols, "")
+    ids = [r[0] for r in rows[len(rows) // 2:len(rows) // 2 + EDITOR_PAGE_SIZE]]
+    results["editor.display_page"] = _timed(
+        lambda: [decode_thumbnail(b, EDITOR_ICON) for b in repo.icon_data(ids).values() if b])
+    del rows
+
+    # -- the original code paths, for before/after comparisons -------------
+    like = ("%sword%",) * 4
+    results["legacy.viewer_page_last"] = _timed(lambda: reader.execute(
+        "SELECT icon_id, name, category, icon_data FROM ac_icons LIMIT ? OFFSET ?",
+        (VIEWER_PAGE_SIZE, (last_page - 1) * VIEWER_PAGE_SIZE)).fetchall())
+    results["legacy.search_count"] = _timed(lambda: reader.execute(
+        "SELECT COUNT(*) FROM ac_icons WHERE icon_id LIKE ? OR name LIKE ? "
+        "OR category LIKE ? OR keywords LIKE ?", like).fetchone())
+    results["legacy.editor_load_data"] = _timed(lambda: reader.execute(
+        "SELECT icon_id,name,category,keywords,metadata_json,icon_data FROM ac_icons "
+        "ORDER BY icon_id").fetchall(), repeat=1)
+
+    repo.close()
+    return results
+
+
+def _startup_probe(db_path):
+    """What a cold start has to do before the first page can be shown."""
+    from icon_pager import KeysetPager
+    from icon_repository import IconRepository
+    from thumbnail_cache import decode_thumbnail
+
+    repo = IconRepository(db_path)
+    pager = KeysetPager(("icon_id", "name", "category", "icon_data"), VIEWER_PAGE_SIZE)
+    pager.set_query("", repo.fts_enabled)
+    pager.count(repo.reader())
+    for row in repo.page(pager, 1):
+        decode_thumbnail(row[3], VIEWER_ICON)
+
+
+def _before_paint_probe(db_path):
+    """What the apps do before their window can paint, minus Tk: app_startup's imports and
+    open_sources(), plus the facet sidebar's first query. Returns when it started.
+
+    Run it in a fresh interpreter (--before-paint) so the imports are timed
+    cold. Creating the Tk widgets comes on top; the apps report the full
+    time-to-first-paint in their status bar.
+    """
+    started = time.perf_counter()
+    from app_startup import open_sources
+
+    repo, _ = open_sources(db_path, 1)
+    repo.categories()
+    return started
+
+
+def _child(args, db_path):
+    """Run this script in a fresh interpreter and return its JSON output."""
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), *args, db_path],
+                         check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(out.stdout)
+
+
+def benchmark_size(rows, work_dir):
+    from synthetic_db import generate
+
+    db_path = os.path.abspath(os.path.join(work_dir, f"ac_icons_{rows}.db"))
+    if not os.path.exists(db_path):
+        print(f"Generating {db_path} ...", file=sys.stderr)
+        generate(db_path, rows)
+    # The first open builds the derived indexes; keep that out of the timings.
+    _child(["--startup"], db_path)
+
+    start = time.perf_counter()
+    startup = _child(["--startup"], db_path)
+    startup["wall_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    startup.update(_child(["--before-paint"], db_path))
+    result = _child(["--scenarios"], db_path)
+    result["startup"] = startup
+    result["db_size_mb"] = round(os.path.getsize(db_path) / 2 ** 20, 1)
+    return result
+
+
+def compare(old, new):
+    """Print median changes between two result files."""
+    for size, result in new["results"].items():
+        base = old["results"].get(size, {}).get("scenarios", {})
+        print(f"== {size} rows")
+        for name, timing in result["scenarios"].items():
+            before = base.get(name, {}).get("median_ms")
+            after = timing["median_ms"]
+            change = f"{(after - before) / before * 100:+7.1f}%" if before else "    new"
+            print(f"  {name:36s} {before if before is not None else '-':>10} -> {after:>10} ms {change}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Headless benchmarks for the icon viewer/editor data and decode paths.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated row counts")
+    parser.add_argument("--work-dir", default=WORK_DIR, help="where generated databases are kept")
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="print the change against an earlier run")
+    parser.add_argument("--scenarios", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--startup", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--before-paint", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("db", nargs="?", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.scenarios:
+        json.dump({"scenarios": run_scenarios(args.db), "peak_rss_mb": _peak_rss_mb()}, sys.stdout)
+        return
+    if args.startup:
+        start = time.perf_counter()
+        _startup_probe(args.db)
+        json.dump({"first_page_ms": round((time.perf_counter() - start) * 1000, 1),
+                   "peak_rss_mb": _peak_rss_mb()}, sys.stdout)
+        return
+    if args.before_paint:
+        started = _before_paint_probe(args.db)
+        json.dump({"before_paint_ms": round((time.perf_counter() - started) * 1000, 1)}, sys.stdout)
+        return
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": {},
+    }
+    for rows in (int(s) for s in args.sizes.split(",")):
+        report["results"][str(rows)] = benchmark_size(rows, args.work_dir)
+        print(f"{rows} rows done", file=sys.stderr)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
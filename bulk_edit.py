@@ -0,0 +1,129 @@
+import json
+from collections import deque
+
+# ==============================================
+# BULK EDITS AND UNDO/REDO
+# ==============================================
+
+KEYWORD_SEPARATOR = ", "
+UNDO_LIMIT = 50  # edit batches kept for undo
+
+
+def split_keywords(text):
+    """'a, b,,c ' -> ['a', 'b', 'c']"""
+    return [k.strip() for k in (text or "").split(",") if k.strip()]
+
+
+def join_keywords(words):
+    return KEYWORD_SEPARATOR.join(words) or None
+
+
+class BulkEdit:
+    """One edit applied to many icons: category, keywords and/or metadata keys.
+
+    `category=None` leaves categories alone and "" clears them. Keyword
+    matching ignores case; added keywords go to the end unless already there.
+    `set_metadata` is a dict merged into each metadata_json object and
+    `remove_metadata` a list of keys dropped from it.
+    """
+
+    def __init__(self, category=None, add_keywords=(), remove_keywords=(),
+                 set_metadata=None, remove_metadata=()):
+        self.category = category
+        self.add_keywords = list(add_keywords)
+        self.remove_keywords = {k.lower() for k in remove_keywords}
+        self.set_metadata = dict(set_metadata or {})
+        self.remove_metadata = list(remove_metadata)
+
+    def __bool__(self):
+        return bool(self.category is not None or self.add_keywords or self.remove_keywords
+                    or self.set_metadata or self.remove_metadata)
+
+    def apply(self, record):
+        """Return {column: new_value} for the fields of an IconRecord this edit changes."""
+        new = {}
+        if self.category is not None:
+            new["category"] = self.category.strip() or None
+        if self.add_keywords or self.remove_keywords:
+            words = [k for k in split_keywords(record.keywords) if k.lower() not in self.remove_keywords]
+            seen = {k.lower() for k in words}
+            for k in self.add_keywords:
+                if k.lower() not in seen:
+                    words.append(k)
+                    seen.add(k.lower())
+            new["keywords"] = join_keywords(words)
+        if self.set_metadata or self.remove_metadata:
+            try:
+                meta = json.loads(record.metadata_json) if record.metadata_json else {}
+            except json.JSONDecodeError:
+                raise ValueError(f"{record.icon_id}: metadata_json is not valid JSON")
+            if not isinstance(meta, dict):
+                raise ValueError(f"{record.icon_id}: metadata_json is not a JSON object")
+            for key in self.remove_metadata:
+                meta.pop(key, None)
+            meta.update(self.set_metadata)
+            new["metadata_json"] = json.dumps(meta)
+        return {c: v for c, v in new.items() if v != getattr(record, c)}
+
+    def plan(self, records):
+        """Return the changes as [(icon_id, column, old, new)], skipping no-ops."""
+        return [(r.icon_id, column, getattr(r, column), value)
+                for r in records for column, value in self.apply(r).items()]
+
+
+class EditHistory:
+    """Undo/redo stacks of change batches written through IconRepository.update_many().
+
+    A change is (icon_id, column, old, new); undo writes the old values of
+    the whole batch back in one transaction, redo the new ones. Each batch
+    remembers the row versions its write produced, so an undo or redo that
+    would overwrite someone else's later edit raises EditConflict and
+    leaves both stacks as they were.
+    """
+
+    def __init__(self, repo, limit=UNDO_LIMIT):
+        self.repo = repo
+        self._undo = deque(maxlen=limit)
+        self._redo = []
+
+    def apply(self, changes, label, expected=None):
+        """Write a batch and make it undoable; returns the affected icon_ids.
+
+        `expected` is {icon_id: version} as read before the `old` values.
+        """
+        changes = list(changes)
+        if changes:
+            versions = self.repo.update_many(((i, c, new) for i, c, _, new in changes), expected)
+            self._undo.append((label, changes, versions))
+            self._redo.clear()
+        return _icon_ids(changes)
+
+    def undo(self):
+        """Revert the last batch; returns (label, affected icon_ids) or None."""
+        if not self._undo:
+            return None
+        label, changes, versions = self._undo[-1]
+        versions = self.repo.update_many(((i, c, old) for i, c, old, _ in reversed(changes)), versions)
+        self._undo.pop()
+        self._redo.append((label, changes, versions))
+        return label, _icon_ids(changes)
+
+    def redo(self):
+        """Re-apply the last undone batch; returns (label, affected icon_ids) or None."""
+        if not self._redo:
+            return None
+        label, changes, versions = self._redo[-1]
+        versions = self.repo.update_many(((i, c, new) for i, c, _, new in changes), versions)
+        self._redo.pop()
+        self._undo.append((label, changes, versions))
+        return label, _icon_ids(changes)
+
+    def undo_label(self):
+        return self._undo[-1][0] if self._undo else None
+
+    def redo_label(self):
+        return self._redo[-1][0] if self._redo else None
+
+
+def _icon_ids(changes):
+    return list(dict.fromkeys(i for i, _, _, _ in changes))
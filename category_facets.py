@@ -0,0 +1,99 @@
+from trigger_gates import gate, install_triggers
+
+# ==============================================
+# CATEGORY FACETS
+# ==============================================
+#
+# icon_categories holds one row per category (trimmed, case-insensitive)
+# with the number of icons in it. Triggers on ac_icons keep the counts
+# current, so reading the facet list never scans ac_icons. Icons with no
+# category are counted under the empty name.
+
+FACET_TABLE = "icon_categories"
+CATEGORY_INDEX = "ac_icons_category_key"
+NO_CATEGORY = ""
+
+# The normalized category of an ac_icons row; filters must use this exact
+# expression so SQLite picks the expression index.
+CATEGORY_KEY = "ifnull(trim(ac_icons.category), '')"
+
+
+def _key(row=None):
+    column = f"{row}.category" if row else "category"
+    return f"ifnull(trim({column}), '')"
+
+
+_FACET_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {FACET_TABLE} (
+    name TEXT PRIMARY KEY COLLATE NOCASE,
+    icon_count INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS {CATEGORY_INDEX} ON ac_icons({_key()} COLLATE NOCASE, icon_id);
+"""
+
+_FACET_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS {FACET_TABLE}_ai AFTER INSERT ON ac_icons WHEN {gate(FACET_TABLE)} BEGIN
+    INSERT INTO {FACET_TABLE}(name, icon_count) VALUES ({_key("new")}, 1)
+    ON CONFLICT(name) DO UPDATE SET icon_count = icon_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS {FACET_TABLE}_ad AFTER DELETE ON ac_icons WHEN {gate(FACET_TABLE)} BEGIN
+    UPDATE {FACET_TABLE} SET icon_count = icon_count - 1 WHERE name = {_key("old")};
+    DELETE FROM {FACET_TABLE} WHERE name = {_key("old")} AND icon_count <= 0;
+END;
+CREATE TRIGGER IF NOT EXISTS {FACET_TABLE}_au AFTER UPDATE OF category ON ac_icons
+WHEN {gate(FACET_TABLE)} AND {_key("old")} <> {_key("new")} COLLATE NOCASE BEGIN
+    UPDATE {FACET_TABLE} SET icon_count = icon_count - 1 WHERE name = {_key("old")};
+    DELETE FROM {FACET_TABLE} WHERE name = {_key("old")} AND icon_count <= 0;
+    INSERT INTO {FACET_TABLE}(name, icon_count) VALUES ({_key("new")}, 1)
+    ON CONFLICT(name) DO UPDATE SET icon_count = icon_count + 1;
+END;
+"""
+
+
+def ensure_facets(conn):
+    """Create the facet table, index and triggers, counting existing rows once."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (FACET_TABLE,)
+    ).fetchone()
+    conn.executescript(_FACET_SCHEMA)
+    install_triggers(conn, FACET_TABLE, _FACET_TRIGGERS)
+    if not exists:
+        rebuild_facets(conn)
+
+
+def rebuild_facets(conn):
+    """Recount every category from scratch (after bulk imports with triggers off)."""
+    with conn:
+        conn.execute(f"DELETE FROM {FACET_TABLE}")
+        conn.execute(
+            f"INSERT INTO {FACET_TABLE}(name, icon_count) "
+            f"SELECT {CATEGORY_KEY}, COUNT(*) FROM ac_icons GROUP BY {CATEGORY_KEY} COLLATE NOCASE")
+
+
+def list_facets(conn):
+    """Return [(category, icon_count)] sorted by name; NO_CATEGORY sorts first."""
+    return conn.execute(
+        f"SELECT name, icon_count FROM {FACET_TABLE} WHERE icon_count > 0 ORDER BY name").fetchall()
+
+
+def has_facets(conn):
+    """True if the facet table exists (without creating it)."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (FACET_TABLE,)).fetchone() is not None
+
+
+def count_categories(conn):
+    """list_facets() computed from ac_icons itself, for databases without the facet table."""
+    return conn.execute(
+        f"SELECT {CATEGORY_KEY}, COUNT(*) FROM ac_icons GROUP BY {CATEGORY_KEY} COLLATE NOCASE "
+        f"ORDER BY {CATEGORY_KEY} COLLATE NOCASE").fetchall()
+
+
+def category_condition(categories):
+    """Return (where_sql, params) restricting ac_icons to `categories` ("" if none)."""
+    categories = tuple(categories or ())
+    if not categories:
+        return "", ()
+    if len(categories) == 1:
+        return f"{CATEGORY_KEY} = ? COLLATE NOCASE", categories
+    return f"{CATEGORY_KEY} COLLATE NOCASE IN ({', '.join('?' * len(categories))})", categories
@@ -0,0 +1,119 @@
+from trigger_gates import gate, install_triggers
+
+# ==============================================
+# CHANGE JOURNAL FOR ac_icons
+# ==============================================
+#
+# Triggers append one row per changed field to ac_icons_journal, so the
+# edits made to a local database can be exported without diffing it
+# against the original.
+
+JOURNAL_TABLE = "ac_icons_journal"
+JOURNALED_COLUMNS = ("name", "category", "keywords", "metadata_json", "icon_data")
+# column_name values for whole-row events
+ROW_INSERTED = "+row"
+ROW_DELETED = "-row"
+
+_NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {JOURNAL_TABLE} (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    icon_id TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    old_value,
+    new_value,
+    changed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS {JOURNAL_TABLE}_icon ON {JOURNAL_TABLE}(icon_id, column_name);
+CREATE TABLE IF NOT EXISTS {JOURNAL_TABLE}_watermarks (
+    name TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+"""
+
+
+def _triggers():
+    parts = []
+    for col in JOURNALED_COLUMNS:
+        parts.append(f"""
+CREATE TRIGGER IF NOT EXISTS {JOURNAL_TABLE}_{col}_au AFTER UPDATE OF {col} ON ac_icons
+WHEN {gate(JOURNAL_TABLE)} AND old.{col} IS NOT new.{col} BEGIN
+    INSERT INTO {JOURNAL_TABLE}(icon_id, column_name, old_value, new_value, changed_at)
+    VALUES (new.icon_id, '{col}', old.{col}, new.{col}, {_NOW});
+END;
+""")
+    inserts = "".join(f"""
+    INSERT INTO {JOURNAL_TABLE}(icon_id, column_name, old_value, new_value, changed_at)
+    SELECT new.icon_id, '{col}', NULL, new.{col}, {_NOW} WHERE new.{col} IS NOT NULL;"""
+                      for col in JOURNALED_COLUMNS)
+    parts.append(f"""
+CREATE TRIGGER IF NOT EXISTS {JOURNAL_TABLE}_ai AFTER INSERT ON ac_icons WHEN {gate(JOURNAL_TABLE)} BEGIN
+    INSERT INTO {JOURNAL_TABLE}(icon_id, column_name, old_value, new_value, changed_at)
+    VALUES (new.icon_id, '{ROW_INSERTED}', NULL, new.icon_id, {_NOW});{inserts}
+END;
+CREATE TRIGGER IF NOT EXISTS {JOURNAL_TABLE}_ad AFTER DELETE ON ac_icons WHEN {gate(JOURNAL_TABLE)} BEGIN
+    INSERT INTO {JOURNAL_TABLE}(icon_id, column_name, old_value, new_value, changed_at)
+    VALUES (old.icon_id, '{ROW_DELETED}', old.icon_id, NULL, {_NOW});
+END;
+""")
+    return "".join(parts)
+
+
+def ensure_journal(conn):
+    """Create the journal table and its triggers if they are missing."""
+    conn.executescript(_SCHEMA)
+    install_triggers(conn, JOURNAL_TABLE, _triggers())
+
+
+def iter_changes(conn, since=0, until=None):
+    """Yield journal rows in (since, until] as dicts, oldest first."""
+    cur = conn.execute(
+        f"SELECT seq, icon_id, column_name, old_value, new_value, changed_at FROM {JOURNAL_TABLE} "
+        "WHERE seq > ? AND seq <= ? ORDER BY seq", (since, _upper(conn, until)))
+    for seq, icon_id, column, old, new, changed_at in cur:
+        yield {"seq": seq, "icon_id": icon_id, "column": column,
+               "old": old, "new": new, "changed_at": changed_at}
+
+
+def iter_compacted(conn, since=0, until=None):
+    """Yield one change per (icon_id, column) in (since, until]: last write wins.
+
+    `old` is the value before the first journaled write and `new` the value
+    after the last one; fields that were changed and then changed back are
+    left out. Ordered by the last write.
+    """
+    cur = conn.execute(f"""
+        SELECT g.icon_id, g.column_name, f.old_value, l.new_value,
+               g.first_seq, g.last_seq, l.changed_at
+        FROM (SELECT icon_id, column_name, MIN(seq) AS first_seq, MAX(seq) AS last_seq
+              FROM {JOURNAL_TABLE} WHERE seq > ? AND seq <= ?
+              GROUP BY icon_id, column_name) AS g
+        JOIN {JOURNAL_TABLE} AS f ON f.seq = g.first_seq
+        JOIN {JOURNAL_TABLE} AS l ON l.seq = g.last_seq
+        ORDER BY g.last_seq""", (since, _upper(conn, until)))
+    for icon_id, column, old, new, first_seq, last_seq, changed_at in cur:
+        if old == new and column not in (ROW_INSERTED, ROW_DELETED):
+            continue
+        yield {"seq": last_seq, "first_seq": first_seq, "icon_id": icon_id, "column": column,
+               "old": old, "new": new, "changed_at": changed_at}
+
+
+def _upper(conn, until):
+    return latest_seq(conn) if until is None else until
+
+
+def latest_seq(conn):
+    return conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {JOURNAL_TABLE}").fetchone()[0]
+
+
+def get_watermark(conn, name):
+    row = conn.execute(
+        f"SELECT seq FROM {JOURNAL_TABLE}_watermarks WHERE name=?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def set_watermark(conn, name, seq):
+    with conn:
+        conn.execute(f"INSERT OR REPLACE INTO {JOURNAL_TABLE}_watermarks(name, seq) VALUES (?, ?)",
+                     (name, seq))
@@ -0,0 +1,93 @@
+from icon_trace import span
+
+# ==============================================
+# CONTACT SHEET (ONE IMAGE PER PAGE)
+# ==============================================
+
+SHEET_PADDING = 2          # pixels around each icon inside its cell
+CAPTION_HEIGHT = 12        # extra cell height when captions are shown
+
+
+def _rgb(color):
+    """'#252526' -> (37, 37, 38)"""
+    color = color.lstrip("#")
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+class SheetLayout:
+    """Cell geometry of a `columns` x `rows` contact sheet, and hit-testing on it.
+
+    Cells are laid out row by row; index i of a page is at
+    (i % columns, i // columns). Icons are centred at the top of their cell,
+    with the caption (if any) underneath.
+    """
+
+    def __init__(self, columns, rows, icon_size, captions=False, padding=SHEET_PADDING):
+        self.columns = columns
+        self.rows = rows
+        self.icon_size = icon_size
+        self.padding = padding
+        self.cell_width = icon_size[0] + 2 * padding
+        self.cell_height = icon_size[1] + 2 * padding + (CAPTION_HEIGHT if captions else 0)
+        self.width = self.cell_width * columns
+        self.height = self.cell_height * rows
+
+    def __len__(self):
+        return self.columns * self.rows
+
+    def cell_origin(self, index):
+        return (index % self.columns) * self.cell_width, (index // self.columns) * self.cell_height
+
+    def icon_origin(self, index, image_size):
+        """Top-left corner for an image of `image_size` in cell `index`."""
+        x, y = self.cell_origin(index)
+        return x + (self.cell_width - image_size[0]) // 2, y + self.padding
+
+    def caption_anchor(self, index):
+        """Top-centre point for the caption of cell `index`."""
+        x, y = self.cell_origin(index)
+        return x + self.cell_width // 2, y + self.padding + self.icon_size[1] + 1
+
+    def index_at(self, x, y):
+        """The cell index under sheet pixel (x, y), or None outside the sheet."""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        return int(y // self.cell_height) * self.columns + int(x // self.cell_width)
+
+
+class ContactSheet:
+    """Renders a whole page of icons into one image.
+
+    It has the prepare()/realize() interface of ThumbnailCache, so an
+    IconLoader can use it in place of one. prepare() runs on the loader
+    thread and pastes the page's thumbnails (from the same two-level
+    cache) onto a single RGBA image. realize() turns that image into one
+    PhotoImage on the Tk thread. The Tk side therefore does the same work
+    for 600 icons as for one.
+    """
+
+    def __init__(self, thumbnails, layout, background):
+        self.thumbnails = thumbnails
+        self.layout = layout
+        self.background = _rgb(background) + (255,)
+
+    def prepare(self, blobs, size):
+        from PIL import Image
+
+        images = self.thumbnails.thumbnails(blobs, size)
+        with span("composite"):
+            sheet = Image.new("RGBA", (self.layout.width, self.layout.height), self.background)
+            for index, img in enumerate(images[:len(self.layout)]):
+                if img is None:
+                    continue
+                if img.mode != "RGBA":
+                    img = img.convert("RGBA")
+                sheet.alpha_composite(img, self.layout.icon_origin(index, img.size))
+        return sheet
+
+    def realize(self, sheet):
+        """Return the PhotoImage for a prepare() result; must run on the Tk thread."""
+        from PIL import ImageTk
+
+        with span("photo"):
+            return ImageTk.PhotoImage(sheet)
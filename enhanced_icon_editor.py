@@ -1,9 +1,19 @@
-import sqlite3
-from PIL import Image, ImageTk
-import io
+from app_startup import STARTED, open_sources  # first: time-to-first-paint is measured from its import
 import tkinter as tk
 from tkinter import ttk, messagebox
 import json
+from collections import OrderedDict
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from icon_pager import KeysetPager
+from icon_loader import IconLoader
+from term_index import TermIndex
+from facet_sidebar import FacetSidebar
+from metadata_index import has_meta_filters
+from bulk_edit import BulkEdit, EditHistory, split_keywords
+from icon_changes import ChangeWatcher
+from related_index import parse_query
+from icon_trace import tracer, span, format_readout, report_first_paint
 
 DB_PATH = "enhanced_icons.db"
 ICON_SIZE = 32
@@ -21,6 +31,24 @@ COLUMN_WIDTHS = {
     'metadata': 300
 }
 PAGE_SIZE = 100
+# One scrolling list over the whole result; only the rows on screen exist as Treeview items
+VIRTUAL_SCROLL = True
+VIRTUAL_STEP = 8     # image loads are requested per step of rows (viewport + one step each)
+WHEEL_ROWS = 3
+ROW_HEIGHT = ICON_SIZE + 4
+THUMBNAIL_CACHE_SIZE = 512  # PhotoImages kept in memory across page turns
+SHOW_LATENCY = False  # per-page timing readout under the status bar (toggle with F12)
+SEARCH_DEBOUNCE_MS = 150  # search once typing pauses this long
+INDEX_POLL_MS = 100
+# Show the window and the first FIRST_ROWS rows at once, read the rest on a worker (False: read all, then show)
+FAST_START = True
+FIRST_ROWS = 200
+ROWS_POLL_MS = 50
+CHANGE_POLL_MS = 500  # check for saves from other windows and processes this often
+# Keep keywords out of memory until a row is opened (metadata_json always is)
+LAZY_TEXT_COLUMNS = False
+LAZY_PLACEHOLDER = "[...] Click to view"
+ROW_COLUMNS = ("icon_id","name","category") if LAZY_TEXT_COLUMNS else ("icon_id","name","category","keywords")
 
 KEYWORDS_POPUP_WIDTH = 60
 KEYWORDS_POPUP_HEIGHT = 20
@@ -32,6 +60,31 @@ class EnhancedIconDatabaseEditor:
         self.image_references = []
         self.current_page = 0
         self.dark_mode = False
+        self.repo, self.thumbnails = open_sources(DB_PATH, THUMBNAIL_CACHE_SIZE)
+        self.loader = IconLoader(self.root, self.thumbnails, (ICON_SIZE, ICON_SIZE),
+                                 self.fetch_page, self.show_load_error, self.show_timings)
+        self.page_items = []  # Treeview items on screen (recycled while scrolling in virtual mode)
+        self.page_start = 0   # current_data index of page_items[0]
+        self.top = 0
+        self.selected_index = None
+        self.selected_ids = set()  # virtual mode keeps the selection by icon_id, not by tree item
+        self.anchor_index = None
+        self.history = EditHistory(self.repo)
+        self.changes = ChangeWatcher(self.repo)
+        self.row_photos = OrderedDict()  # icon_id -> PhotoImage for rows recently on screen
+        self.similarity = None
+        self._similarity_build = None  # Future of a SimilarityIndex refresh on a worker thread
+        self._similar_waiting = None  # the icon to find similar ones for once it is done
+        self.related = None  # keyword RelatedIndex, opened on first use
+        self._related_build = None  # Future of a RelatedIndex being built on a worker thread
+        self._related_waiting = None  # the query to run once it is ready
+        self.all_data = []
+        self.rows_by_id = None  # icon_id -> row of all_data, built on the first live search
+        self.rows_complete = False  # all_data holds every icon (not just the fast-start rows)
+        self.edited_while_loading = set()
+        self._search_after = None
+        self.term_index = TermIndex()
+        self._index_build = None  # started once the window is up
 
         self.root.title(WINDOW_TITLE)
         self.root.geometry("1200x600")
@@ -40,7 +93,25 @@ class EnhancedIconDatabaseEditor:
 
         self.setup_styles()
         self.setup_ui()
-        self.load_data()
+        if not FAST_START:
+            self.load_data()
+        self._map_binding = self.root.bind("<Map>", self.on_map, "+")
+
+    def on_map(self, event):
+        if event.widget is self.root:
+            self.root.unbind("<Map>", self._map_binding)
+            self.root.after_idle(self.on_first_paint)
+
+    def on_first_paint(self):
+        """The window is on screen: report time-to-first-paint, then start the slower work"""
+        self.root.update_idletasks()
+        ms = report_first_paint(STARTED)
+        if FAST_START:
+            self.load_first_rows()
+        self.status_var.set(f"{self.status_var.get()} | first paint {ms:.0f} ms")
+        self._index_build = self.term_index.load_in_background(self.repo)
+        self.root.after(INDEX_POLL_MS, self.check_term_index)
+        self.root.after(CHANGE_POLL_MS, self.poll_changes)
 
     def setup_styles(self):
         style = ttk.Style()
@@ -48,7 +119,7 @@ class EnhancedIconDatabaseEditor:
         style.configure(
             "Dark.Treeview",
             font=(FONT_FAMILY, FONT_SIZE),
-            rowheight=ICON_SIZE + 4,
+            rowheight=ROW_HEIGHT,
             background=BG_COLOR,
             fieldbackground=BG_COLOR,
             foreground=FONT_COLOR
@@ -70,6 +141,12 @@ class EnhancedIconDatabaseEditor:
 
         self.dark_mode_btn = ttk.Button(top_bar, text="Dark Mode", command=self.toggle_dark_mode)
         self.dark_mode_btn.pack(side=tk.RIGHT)
+        self.redo_btn = ttk.Button(top_bar, text="Redo", command=self.redo, state=tk.DISABLED)
+        self.redo_btn.pack(side=tk.RIGHT, padx=(0, 5))
+        self.undo_btn = ttk.Button(top_bar, text="Undo", command=self.undo, state=tk.DISABLED)
+        self.undo_btn.pack(side=tk.RIGHT, padx=(0, 5))
+        self.bulk_btn = ttk.Button(top_bar, text="Bulk Edit...", command=self.open_bulk_edit)
+        self.bulk_btn.pack(side=tk.RIGHT, padx=(0, 5))
 
         search_frame = ttk.Frame(top_bar)
         search_frame.pack(fill=tk.X, pady=5, expand=True)
@@ -79,6 +156,7 @@ class EnhancedIconDatabaseEditor:
         search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=50)
         search_entry.pack(side=tk.LEFT, padx=5)
         search_entry.bind("<Return>", lambda e: self.search_icons())
+        self.search_var.trace_add("write", lambda *_: self.schedule_search())
 
         ttk.Button(search_frame, text="Search", command=self.search_icons).pack(side=tk.LEFT, padx=5)
         ttk.Button(search_frame, text="Reset", command=self.reset_search).pack(side=tk.LEFT)
@@ -90,7 +168,7 @@ class EnhancedIconDatabaseEditor:
             tree_frame,
             columns=list(COLUMN_WIDTHS.keys())[1:],
             show="tree headings",
-            selectmode="browse",
+            selectmode="extended",
             style="Dark.Treeview"
         )
 
@@ -101,27 +179,65 @@ class EnhancedIconDatabaseEditor:
             self.tree.column(col, width=width, anchor="w")
             self.tree.heading(col, text=col.replace('_', ' ').title())
 
-        vsb = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        vsb = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL,
+                            command=self.on_vscroll if VIRTUAL_SCROLL else self.tree.yview)
         hsb = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.tree.configure(xscrollcommand=hsb.set)
+        if not VIRTUAL_SCROLL:
+            self.tree.configure(yscrollcommand=vsb.set)
+        self.vsb = vsb
         self.tree.grid(row=0, column=0, sticky="nsew")
         vsb.grid(row=0, column=1, sticky="ns")
         hsb.grid(row=1, column=0, sticky="ew")
         tree_frame.grid_rowconfigure(0, weight=1)
         tree_frame.grid_columnconfigure(0, weight=1)
         self.tree.bind("<Double-1>", self.on_double_click)
+        self.tree.bind("<Button-3>", self.on_right_click)
+        self.tree.bind("<Control-z>", lambda e: self.undo())
+        self.tree.bind("<Control-y>", lambda e: self.redo())
+        self.tree.bind("<Control-Z>", lambda e: self.redo())
+        if VIRTUAL_SCROLL:
+            self.tree.bind("<Configure>", lambda e: self.resize_rows())
+            self.tree.bind("<Button-1>", self.on_tree_click)
+            self.tree.bind("<Control-a>", lambda e: self.select_all())
+            for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+                self.tree.bind(seq, self.on_mousewheel)
+            for key in ("Up", "Down", "Prior", "Next", "Home", "End"):
+                self.tree.bind(f"<{key}>", self.on_tree_key)
 
         nav_frame = ttk.Frame(main_frame)
         nav_frame.pack(fill=tk.X, pady=5)
         self.prev_button = ttk.Button(nav_frame, text="Previous", command=self.prev_page)
-        self.prev_button.pack(side=tk.LEFT)
         self.page_label = ttk.Label(nav_frame, text="Page 1")
-        self.page_label.pack(side=tk.LEFT, padx=10)
         self.next_button = ttk.Button(nav_frame, text="Next", command=self.next_page)
-        self.next_button.pack(side=tk.LEFT)
+        if not VIRTUAL_SCROLL:
+            self.prev_button.pack(side=tk.LEFT)
+        self.page_label.pack(side=tk.LEFT, padx=10)
+        if not VIRTUAL_SCROLL:
+            self.next_button.pack(side=tk.LEFT)
 
         self.status_var = tk.StringVar()
         ttk.Label(main_frame, textvariable=self.status_var).pack(fill=tk.X)
+        self.latency_var = tk.StringVar()
+        self.latency_label = ttk.Label(main_frame, textvariable=self.latency_var)
+        self.root.bind("<F12>", lambda e: self.set_latency_visible(not self.show_latency))
+        self.set_latency_visible(SHOW_LATENCY)
+
+        self.facets = FacetSidebar(self.root, self.repo, self.search_icons)
+        self.facets.pack(side=tk.LEFT, fill=tk.Y, padx=(5, 0), pady=5, before=main_frame)
+
+    def set_latency_visible(self, visible):
+        self.show_latency = visible
+        tracer.set_enabled(visible)
+        if visible:
+            self.latency_label.pack(fill=tk.X)
+            self.latency_var.set("Latency: waiting for the next page…")
+        else:
+            self.latency_label.pack_forget()
+
+    def show_timings(self, page, timings):
+        if self.show_latency:
+            self.latency_var.set(format_readout(f"page {page+1}", timings))
 
     def toggle_dark_mode(self):
         self.dark_mode = not self.dark_mode
@@ -161,48 +277,276 @@ class EnhancedIconDatabaseEditor:
         apply_colors(self.root)
 
     def reset_search(self):
+        self.facets.clear()
         self.search_var.set("")
-        self.current_page = 0
-        self.load_data()
+        self.search_icons()
 
-    def search_icons(self):
-        self.current_page = 0
+    def schedule_search(self):
+        """Search as you type, once keystrokes pause for SEARCH_DEBOUNCE_MS"""
+        if self._search_after is not None:
+            self.root.after_cancel(self._search_after)
+        self._search_after = self.root.after(SEARCH_DEBOUNCE_MS, lambda: self.search_icons(typing=True))
+
+    def search_icons(self, typing=False):
+        if self._search_after is not None:
+            self.root.after_cancel(self._search_after)
+            self._search_after = None
+        self._related_waiting = self._similar_waiting = None
         term = self.search_var.get().strip()
-        self.load_data(term if term else None)
+        categories = self.facets.selected()
+        query = parse_query(term)
+        # While typing, related: waits for a complete icon id and ~ for Enter
+        if typing and query is not None and (query[0]!='related' or self.repo.get(query[1]) is None):
+            self.status_var.set("Press Enter to search"); return
+        self.current_page = 0
+        if query is not None:  # ranked keyword queries ignore the category filter
+            if query[0]=='related': self.find_related(query[1])
+            else: self.find_ranked(query[1])
+        elif categories:  # text and category filters in one SQLite query
+            self.load_data(term, categories)
+        elif not term:
+            self.current_data = self.all_data
+            self.loader.reset()
+            self.display_page()
+        elif self.term_index.ready and self.rows_complete and not has_meta_filters(term):
+            # Rows come from memory; superseded page loads are dropped by the loader reset
+            self.current_data = self.rows_in_order(self.term_index.search(term))
+            self.loader.reset()
+            self.display_page()
+        else:  # meta.* filters, or still indexing/loading: SQLite
+            self.load_data(term)
 
-    def load_data(self, search_term=None):
+    def rows_in_order(self, icon_ids):
+        """Rows of all_data for `icon_ids`, in that order (SQLite while all_data is incomplete)"""
+        if not self.rows_complete:
+            return self.repo.rows_for(ROW_COLUMNS, icon_ids)
+        if self.rows_by_id is None:
+            self.rows_by_id = {row[0]: row for row in self.all_data}
+        rows = self.rows_by_id
+        return [rows[i] for i in icon_ids if i in rows]
+
+    def check_term_index(self):
+        """Wait for the background term index; searches use SQLite until it is ready"""
+        if not self._index_build.done():
+            self.root.after(INDEX_POLL_MS, self.check_term_index)
+        elif self._index_build.exception() is not None:
+            self.status_var.set(f"Live search unavailable: {self._index_build.exception()}")
+
+    def load_data(self, search_term=None, categories=()):
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cur = conn.cursor()
-            if search_term:
-                q = ("SELECT icon_id,name,category,keywords,metadata_json,icon_data FROM ac_icons "
-                     "WHERE icon_id LIKE ? OR name LIKE ? OR category LIKE ? OR keywords LIKE ? "
-                     "ORDER BY icon_id")
-                params = (f"%{search_term}%",)*4
-                cur.execute(q, params)
-            else:
-                cur.execute("SELECT icon_id,name,category,keywords,metadata_json,icon_data FROM ac_icons ORDER BY icon_id")
-            self.current_data = cur.fetchall()
-            conn.close()
+            # Only keys and short text stay in memory; blobs are fetched per page
+            with span("load_data"):
+                self.current_data = self.repo.search(ROW_COLUMNS, search_term, categories)
+            if not search_term and not categories:
+                self.all_data = self.current_data
+                self.rows_by_id = None
+                self.rows_complete = True
+            self.loader.reset()
             self.display_page()
         except Exception as e:
             messagebox.showerror("Error", f"Database error: {e}")
 
+    def load_first_rows(self):
+        """Fast start: show the first rows now (count from the stats table) and read the rest on a worker"""
+        try:
+            pager = KeysetPager(ROW_COLUMNS, FIRST_ROWS)
+            with span("load_data"):
+                self.all_data = self.current_data = self.repo.page(pager, 1)
+                total = self.repo.count()
+        except Exception as e:
+            messagebox.showerror("Error", f"Database error: {e}"); return
+        self.loader.reset()
+        self.display_page()
+        if len(self.all_data) >= total:
+            self.rows_complete = True
+            return
+        self.status_var.set(f"Loading {total} icons...")
+        pool = ThreadPoolExecutor(1, "editor-rows")
+        self._rows_load = pool.submit(self.repo.search, ROW_COLUMNS)
+        pool.shutdown(wait=False)
+        self.root.after(ROWS_POLL_MS, self.check_rows_load)
+
+    def check_rows_load(self):
+        """Swap in the full row list once the worker has read it, keeping scroll position and selection"""
+        if not self._rows_load.done():
+            self.root.after(ROWS_POLL_MS, self.check_rows_load); return
+        try: rows = self._rows_load.result()
+        except Exception as e: self.status_var.set(f"Loading icons failed: {e}"); return
+        showing_all = self.current_data is self.all_data
+        self.all_data, self.rows_by_id, self.rows_complete = rows, None, True
+        if showing_all:
+            self.current_data = rows
+            if VIRTUAL_SCROLL: self.render_rows()
+            else: self.display_page()
+            self.status_var.set(f"{len(rows)} icons")
+        edited, self.edited_while_loading = self.edited_while_loading, set()
+        self.refresh_rows(list(edited))  # the worker may have read them before they were saved
+
+    def fetch_page(self, page):
+        """Runs on a loader thread: the page's rows and their image blobs"""
+        if VIRTUAL_SCROLL:
+            start = page*VIRTUAL_STEP
+            rows = self.current_data[start:start+len(self.page_items)+VIRTUAL_STEP]
+        else:
+            rows = self.current_data[page*PAGE_SIZE:(page+1)*PAGE_SIZE]
+        blobs = self.repo.icon_data(r[0] for r in rows)
+        return rows, [blobs.get(r[0]) for r in rows]
+
     def display_page(self):
+        if VIRTUAL_SCROLL:
+            self.top, self.selected_index, self.anchor_index = 0, None, None
+            self.selected_ids = set()
+            self.status_var.set(f"{len(self.current_data)} icons")
+            self.render_rows()
+            return
         self.tree.delete(*self.tree.get_children())
         self.image_references = []
         start, end = self.current_page*PAGE_SIZE, (self.current_page+1)*PAGE_SIZE
-        for icon_id,name,cat,kw,meta,imgdata in self.current_data[start:end]:
-            try:
-                img = Image.open(io.BytesIO(imgdata))
-                img.thumbnail((ICON_SIZE, ICON_SIZE))
-                photo = ImageTk.PhotoImage(img)
-                self.image_references.append(photo)
-            except: photo=None
-            self.tree.insert("", "end", image=photo, values=(icon_id,name,cat,kw,"[...] Click to view"))
+        # Rows go in straight away; icons follow once the loader has them
+        self.page_items = []
+        self.page_start = start
+        for icon_id,name,cat,*rest in self.current_data[start:end]:
+            kw = rest[0] if rest else LAZY_PLACEHOLDER
+            self.page_items.append(self.tree.insert("", "end", values=(icon_id,name,cat,kw,LAZY_PLACEHOLDER)))
         total = max(1, (len(self.current_data)+PAGE_SIZE-1)//PAGE_SIZE)
         self.page_label.config(text=f"Page {self.current_page+1} of {total}")
         self.status_var.set(f"Showing {min(len(self.current_data)-start, PAGE_SIZE)} of {len(self.current_data)} icons")
+        self.loader.request(self.current_page, self.show_page, range(total))
+
+    def show_page(self, page, rows, photos):
+        if VIRTUAL_SCROLL:
+            return self.show_row_photos(rows, photos)
+        for iid, photo in zip(self.page_items, photos):
+            if photo and self.tree.exists(iid): self.tree.item(iid, image=photo)
+        self.image_references = [p for p in photos if p]
+
+    # -- virtual scrolling ---------------------------------------------------
+
+    def resize_rows(self):
+        """Keep exactly as many Treeview items as fit in the widget"""
+        bbox = self.tree.bbox(self.page_items[0]) if self.page_items else None
+        heading = bbox[1] if bbox else ROW_HEIGHT
+        fit = max(1, (self.tree.winfo_height() - heading) // ROW_HEIGHT)
+        while len(self.page_items) < fit:
+            self.page_items.append(self.tree.insert("", "end"))
+        if len(self.page_items) > fit:
+            self.tree.delete(*self.page_items[fit:])
+            del self.page_items[fit:]
+        self.render_rows()
+
+    def render_rows(self):
+        """Show current_data[top:] in the recycled row items and ask for their icons"""
+        n, visible = len(self.current_data), len(self.page_items)
+        self.top = max(0, min(self.top, n - visible))
+        self.page_start = self.top
+        selected, focus = [], None
+        for pos, iid in enumerate(self.page_items):
+            i = self.top + pos
+            if i >= n:
+                self.tree.detach(iid)
+                continue
+            icon_id, name, cat, *rest = self.current_data[i]
+            kw = rest[0] if rest else LAZY_PLACEHOLDER
+            self.tree.move(iid, "", pos)
+            self.tree.item(iid, values=(icon_id,name,cat,kw,LAZY_PLACEHOLDER),
+                           image=self.row_photos.get(icon_id, ""))
+            if icon_id in self.selected_ids: selected.append(iid)
+            if i == self.selected_index: focus = iid
+        if selected:
+            self.tree.selection_set(selected)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+        if focus: self.tree.focus(focus)
+        shown = min(n - self.top, visible)
+        self.vsb.set(self.top / n if n else 0, (self.top + shown) / n if n else 1)
+        self.page_label.config(text=f"Rows {self.top+1 if n else 0}-{self.top+shown} of {n}")
+        if n and visible:
+            self.loader.request(self.top // VIRTUAL_STEP, self.show_page,
+                                range((n + VIRTUAL_STEP - 1) // VIRTUAL_STEP))
+
+    def show_row_photos(self, rows, photos):
+        for row, photo in zip(rows, photos):
+            if photo:
+                self.row_photos[row[0]] = photo
+                self.row_photos.move_to_end(row[0])
+        while len(self.row_photos) > THUMBNAIL_CACHE_SIZE:
+            self.row_photos.popitem(last=False)
+        for pos, iid in enumerate(self.page_items[:len(self.current_data) - self.top]):
+            photo = self.row_photos.get(self.current_data[self.top + pos][0])
+            if photo: self.tree.item(iid, image=photo)
+
+    def scroll_to(self, top):
+        top = max(0, min(top, len(self.current_data) - len(self.page_items)))
+        if top != self.top:
+            self.top = top
+            self.render_rows()
+
+    def on_vscroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.current_data)))
+        else:
+            self.scroll_to(self.top + int(amount) * (len(self.page_items) if unit == "pages" else 1))
+
+    def on_mousewheel(self, event):
+        if event.num in (4, 5):
+            rows = WHEEL_ROWS if event.num == 5 else -WHEEL_ROWS
+        elif abs(event.delta) >= 120:
+            rows = -WHEEL_ROWS * event.delta // 120
+        else:  # macOS reports small deltas
+            rows = -event.delta
+        self.scroll_to(self.top + rows)
+        return "break"
+
+    def on_tree_click(self, event):
+        if self.tree.identify_region(event.x, event.y) not in ("cell", "tree"): return
+        item = self.tree.identify_row(event.y)
+        if item not in self.page_items: return
+        self.tree.focus_set()
+        self.select_index(self.page_start + self.page_items.index(item),
+                          extend=event.state & 0x1, toggle=event.state & 0x4)
+        return "break"
+
+    def on_tree_key(self, event):
+        n, visible = len(self.current_data), max(1, len(self.page_items))
+        if n:
+            current = self.selected_index if self.selected_index is not None else self.top
+            move = {"Up": -1, "Down": 1, "Prior": -visible, "Next": visible, "Home": -n, "End": n}[event.keysym]
+            i = max(0, min(n - 1, current + move))
+            if i < self.top:
+                self.top = i
+            elif i >= self.top + visible:
+                self.top = i - visible + 1
+            self.select_index(i, extend=event.state & 0x1)
+        return "break"
+
+    def select_index(self, i, extend=False, toggle=False):
+        """Click semantics over current_data: plain selects one, Shift a range, Ctrl toggles"""
+        icon_id = self.current_data[i][0]
+        if extend and self.anchor_index is not None:
+            lo, hi = sorted((self.anchor_index, i))
+            self.selected_ids = {r[0] for r in self.current_data[lo:hi+1]}
+        elif toggle:
+            self.selected_ids ^= {icon_id}
+            self.anchor_index = i
+        else:
+            self.selected_ids = {icon_id}
+            self.anchor_index = i
+        self.selected_index = i
+        self.render_rows()
+
+    def select_all(self):
+        self.selected_ids = {r[0] for r in self.current_data}
+        self.render_rows()
+        return "break"
+
+    def selected_icon_ids(self):
+        """Selected icon_ids in list order (across the whole result in virtual mode)"""
+        if VIRTUAL_SCROLL:
+            return [r[0] for r in self.current_data if r[0] in self.selected_ids]
+        return [self.tree.set(i, '#1') for i in self.tree.selection()]
+
+    def show_load_error(self, page, error):
+        messagebox.showerror("Error", f"Failed to load icons: {error}")
 
     def next_page(self):
         if (self.current_page+1)*PAGE_SIZE < len(self.current_data):
@@ -212,6 +556,182 @@ class EnhancedIconDatabaseEditor:
         if self.current_page>0:
             self.current_page-=1; self.display_page()
 
+    def on_right_click(self, event):
+        item = self.tree.identify_row(event.y)
+        if not item: return
+        if item not in self.tree.selection():
+            if VIRTUAL_SCROLL: self.select_index(self.page_start + self.page_items.index(item))
+            else: self.tree.selection_set(item)
+        icon_id = self.tree.set(item, '#1')
+        count = len(self.selected_icon_ids())
+        menu = tk.Menu(self.root, tearoff=0)
+        menu.add_command(label=f"Bulk edit {count} selected...", command=self.open_bulk_edit)
+        menu.add_command(label="Find similar", command=lambda: self.find_similar(icon_id))
+        menu.add_command(label="Related icons", command=lambda: self.find_related(icon_id))
+        menu.tk_popup(event.x_root, event.y_root)
+
+    def open_bulk_edit(self):
+        """Set category, add/remove keywords or patch metadata keys on every selected icon"""
+        ids = self.selected_icon_ids()
+        if not ids:
+            messagebox.showinfo("Bulk Edit", "Select one or more icons first"); return
+        win = tk.Toplevel(self.root)
+        win.title(f"Bulk edit {len(ids)} icons")
+        frm = ttk.Frame(win); frm.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        set_category = tk.BooleanVar(value=False)
+        category_var, add_var, remove_var, remove_meta_var = (tk.StringVar() for _ in range(4))
+        ttk.Checkbutton(frm, text="Set category:", variable=set_category).grid(row=0, column=0, sticky="w", pady=3)
+        ttk.Entry(frm, textvariable=category_var, width=40).grid(row=0, column=1, sticky="ew", pady=3)
+        ttk.Label(frm, text="Add keywords:").grid(row=1, column=0, sticky="w", pady=3)
+        ttk.Entry(frm, textvariable=add_var, width=40).grid(row=1, column=1, sticky="ew", pady=3)
+        ttk.Label(frm, text="Remove keywords:").grid(row=2, column=0, sticky="w", pady=3)
+        ttk.Entry(frm, textvariable=remove_var, width=40).grid(row=2, column=1, sticky="ew", pady=3)
+        ttk.Label(frm, text="Set metadata keys\n(JSON object):").grid(row=3, column=0, sticky="nw", pady=3)
+        meta_txt = tk.Text(frm, wrap=tk.WORD, width=40, height=4)
+        meta_txt.grid(row=3, column=1, sticky="nsew", pady=3)
+        ttk.Label(frm, text="Remove metadata keys:").grid(row=4, column=0, sticky="w", pady=3)
+        ttk.Entry(frm, textvariable=remove_meta_var, width=40).grid(row=4, column=1, sticky="ew", pady=3)
+        ttk.Label(frm, text="Keywords and keys are comma separated").grid(row=5, column=0, columnspan=2, sticky="w")
+        frm.grid_columnconfigure(1, weight=1); frm.grid_rowconfigure(3, weight=1)
+
+        def apply():
+            try:
+                meta_text = meta_txt.get("1.0", "end-1c").strip()
+                set_meta = json.loads(meta_text) if meta_text else {}
+                if not isinstance(set_meta, dict): raise ValueError("Metadata keys must be a JSON object")
+                edit = BulkEdit(category=category_var.get() if set_category.get() else None,
+                                add_keywords=split_keywords(add_var.get()),
+                                remove_keywords=split_keywords(remove_var.get()),
+                                set_metadata=set_meta, remove_metadata=split_keywords(remove_meta_var.get()))
+                if not edit:
+                    messagebox.showinfo("Bulk Edit", "Nothing to change", parent=win); return
+                versions = self.repo.versions(ids)  # before the records, so a save in between is a conflict
+                changes = edit.plan(self.repo.get_many(ids))
+                affected = self.history.apply(changes, f"bulk edit of {len(ids)} icons", versions)
+            except (ValueError, json.JSONDecodeError) as e:
+                messagebox.showerror("Error", str(e), parent=win); return
+            except Exception as e:
+                messagebox.showerror("Error", f"Bulk edit failed: {e}", parent=win); return
+            win.destroy()
+            self.after_edit(f"Updated {len(affected)} of {len(ids)} icons (Ctrl+Z to undo)")
+
+        btns = ttk.Frame(frm); btns.grid(row=6, column=0, columnspan=2, pady=(10, 0))
+        ttk.Button(btns, text="Cancel", command=win.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(btns, text="Apply", command=apply).pack(side=tk.RIGHT, padx=5)
+
+    def undo(self):
+        try: result = self.history.undo()
+        except Exception as e: messagebox.showerror("Error", f"Undo failed: {e}"); return "break"
+        if result: self.after_edit(f"Undid {result[0]}")
+        return "break"
+
+    def redo(self):
+        try: result = self.history.redo()
+        except Exception as e: messagebox.showerror("Error", f"Redo failed: {e}"); return "break"
+        if result: self.after_edit(f"Redid {result[0]}")
+        return "break"
+
+    def after_edit(self, message=None):
+        """Refresh just the changed rows, the facet counts and the undo/redo buttons"""
+        self.apply_changes()  # the edited rows, plus anything saved elsewhere meanwhile
+        undo, redo = self.history.undo_label(), self.history.redo_label()
+        self.undo_btn.config(state=tk.NORMAL if undo else tk.DISABLED)
+        self.redo_btn.config(state=tk.NORMAL if redo else tk.DISABLED)
+        if message: self.status_var.set(message)
+
+    def poll_changes(self):
+        self.root.after(CHANGE_POLL_MS, self.poll_changes)
+        self.apply_changes()
+
+    def apply_changes(self):
+        """Patch the rows of icons saved anywhere since the last check; no-op if nothing was committed"""
+        changed, deleted = self.changes.poll()
+        if not changed and not deleted: return
+        for icon_id in changed + deleted: self.row_photos.pop(icon_id, None)  # the image may be new
+        self.loader.reset()  # loaded pages may hold old images; the rows on screen ask again
+        self.refresh_rows(changed + deleted)  # patches the rows on screen in place
+        self.facets.refresh()
+
+    def find_similar(self, icon_id):
+        """List the icon and its nearest neighbours by perceptual hash, once new icons are hashed"""
+        self._related_waiting = None
+        self._similar_waiting = icon_id  # only the latest click is answered
+        if self._similarity_build is not None: return
+        try:
+            if self.similarity is None:
+                from similarity_index import SimilarityIndex  # numpy + PIL, only when asked for
+                self.similarity = SimilarityIndex(self.repo)
+        except Exception as e:
+            messagebox.showerror("Error", f"Similarity search failed: {e}"); return
+        self.status_var.set("Updating similarity index...")
+        self._similarity_build = self.similarity.refresh_in_background()
+        self.root.after(INDEX_POLL_MS, self.check_similarity_index)
+
+    def check_similarity_index(self):
+        """Run the waiting Find similar once the background refresh of the hashes is done"""
+        if not self._similarity_build.done():
+            self.root.after(INDEX_POLL_MS, self.check_similarity_index); return
+        build, self._similarity_build = self._similarity_build, None
+        icon_id, self._similar_waiting = self._similar_waiting, None
+        try:
+            build.result()
+            if icon_id is None: return
+            matches = self.similarity.similar(icon_id)
+            self.current_data = self.repo.rows_for(ROW_COLUMNS, [icon_id]+[m for m,_ in matches])
+        except Exception as e:
+            messagebox.showerror("Error", f"Similarity search failed: {e}"); return
+        self.show_rows(f"{len(matches)} icons similar to {icon_id} | Reset to go back")
+
+    def with_related(self, run):
+        """Call run(index) with the keyword index, once it is ready if it is still being built (on a worker thread)"""
+        self._similar_waiting = None
+        if self.related is None: self._related_waiting = run; self.status_var.set("Indexing keywords...")
+        else: run(self.related)
+        # A stale index keeps answering while its replacement is built
+        if self._related_build is None and (self.related is None or self.related.stale):
+            from related_index import RelatedIndex  # numpy, only when asked for
+            self._related_build = RelatedIndex.open_in_background(self.repo, rebuild=self.related is not None)
+            self.root.after(INDEX_POLL_MS, self.check_related_index)
+
+    def check_related_index(self):
+        """Swap in the keyword index built in the background, then run the query waiting for it"""
+        if not self._related_build.done():
+            self.root.after(INDEX_POLL_MS, self.check_related_index); return
+        build, self._related_build = self._related_build, None
+        run, self._related_waiting = self._related_waiting, None
+        if build.exception() is not None:
+            messagebox.showerror("Error", f"Keyword index failed: {build.exception()}"); return
+        self.related = build.result()
+        if run: run(self.related)
+
+    def find_related(self, icon_id):
+        """List the icon and the icons sharing most of its name/category/keyword terms"""
+        def show(index):
+            try:
+                matches = index.related(icon_id)
+                self.current_data = self.repo.rows_for(ROW_COLUMNS, [icon_id]+[m for m,_ in matches])
+            except Exception as e:
+                messagebox.showerror("Error", f"Related search failed: {e}"); return
+            self.show_rows(f"{len(matches)} icons related to {icon_id} | Reset to go back")
+        self.with_related(show)
+
+    def find_ranked(self, text):
+        """List every icon sharing a word with `text`, best match first"""
+        def show(index):
+            try:
+                matches = index.search(text)
+                self.current_data = self.rows_in_order([m for m,_ in matches])
+            except Exception as e:
+                messagebox.showerror("Error", f"Ranked search failed: {e}"); return
+            self.show_rows(f"{len(matches)} icons ranked for '{text}'")
+        self.with_related(show)
+
+    def show_rows(self, status):
+        self.current_page = 0
+        self.loader.reset()
+        self.display_page()
+        self.status_var.set(status)
+
     def on_double_click(self, event):
         item = self.tree.identify_row(event.y)
         col = self.tree.identify_column(event.x)
@@ -221,13 +741,12 @@ class EnhancedIconDatabaseEditor:
         if idx<0 or idx>=len(cols): return
         col_name=cols[idx]
         icon_id=self.tree.set(item, '#1')
-        if col_name=='metadata':
-            conn=sqlite3.connect(DB_PATH);cur=conn.cursor()
-            cur.execute("SELECT metadata_json FROM ac_icons WHERE icon_id=?", (icon_id,))
-            row=cur.fetchone();conn.close()
-            current=json.dumps(json.loads(row[0]), indent=2) if row else ""
-        else:
-            current=self.tree.set(item, f"#{idx+1}")
+        column='metadata_json' if col_name=='metadata' else col_name
+        # Version first, then the value: a save that lands in between makes ours a conflict, not an overwrite
+        version=self.repo.versions([icon_id])[icon_id]
+        old=self.repo.get_value(icon_id, column)
+        if col_name=='metadata': current=json.dumps(json.loads(old), indent=2) if old else ""
+        else: current=old or ""
         win=tk.Toplevel(self.root)
         win.title(f"Edit {col_name.replace('_',' ')}")
         if col_name in ['metadata','keywords']:
@@ -244,15 +763,54 @@ class EnhancedIconDatabaseEditor:
             if col_name=='metadata':
                 try: json.loads(new)
                 except json.JSONDecodeError: messagebox.showerror("Error","Invalid JSON");return
-            self.tree.set(item, f"#{idx+1}", "[...] Click to view" if col_name=='metadata' else new)
-            conn=sqlite3.connect(DB_PATH);cur=conn.cursor()
-            if col_name=='name': cur.execute("UPDATE ac_icons SET name=? WHERE icon_id=?", (new,icon_id))
-            if col_name=='category': cur.execute("UPDATE ac_icons SET category=? WHERE icon_id=?", (new,icon_id))
-            if col_name=='keywords': cur.execute("UPDATE ac_icons SET keywords=? WHERE icon_id=?", (new,icon_id))
-            if col_name=='metadata': cur.execute("UPDATE ac_icons SET metadata_json=? WHERE icon_id=?", (new,icon_id))
-            conn.commit();conn.close();win.destroy()
+            try: self.history.apply([(icon_id, column, old, new)] if new != old else [], f"edit of {col_name} on {icon_id}", {icon_id: version})
+            except Exception as e:
+                messagebox.showerror("Error", f"Save failed: {e}", parent=win); self.after_edit(); return
+            self.after_edit()
+            win.destroy()
         ttk.Button(win,text="Save",command=save).pack(pady=5)
 
+    def refresh_rows(self, icon_ids):
+        """Re-read saved rows into the in-memory lists, the term index and the rows on screen
+
+        Ids that no longer exist are dropped; new ones are added to the full list (not to a search result).
+        """
+        if not icon_ids: return
+        if not self.rows_complete: self.edited_while_loading.update(icon_ids)
+        rows = {}
+        for rec in self.repo.get_many(icon_ids):
+            self.term_index.update(rec.icon_id, rec.name, rec.category, rec.keywords)
+            rows[rec.icon_id] = tuple(getattr(rec, c) for c in ROW_COLUMNS)
+        gone = {i for i in icon_ids if i not in rows}
+        for icon_id in gone: self.term_index.remove(icon_id)
+        showing_all = self.current_data is self.all_data
+        for icon_id in rows.keys() | gone:
+            i = bisect_left(self.all_data, (icon_id,))  # all_data is in icon_id order
+            found = i < len(self.all_data) and self.all_data[i][0] == icon_id
+            if icon_id in gone:
+                if found: del self.all_data[i]
+            elif found: self.all_data[i] = rows[icon_id]
+            elif self.rows_complete: self.all_data.insert(i, rows[icon_id])
+            if self.rows_by_id is not None:
+                if icon_id in gone: self.rows_by_id.pop(icon_id, None)
+                elif found or self.rows_complete: self.rows_by_id[icon_id] = rows[icon_id]
+        if not showing_all:
+            self.current_data[:] = [rows.get(r[0], r) for r in self.current_data if r[0] not in gone]
+        self.selected_ids -= gone
+        if VIRTUAL_SCROLL:
+            self.render_rows()
+            return
+        page = self.current_data[self.page_start:self.page_start+PAGE_SIZE]
+        if [r[0] for r in page] != [self.tree.set(iid, '#1') for iid in self.page_items]:
+            self.display_page(); return  # rows came or went on this page: lay it out again
+        for iid, (icon_id, name, cat, *rest) in zip(self.page_items, page):
+            if icon_id in rows:
+                self.tree.item(iid, values=(icon_id, name, cat, rest[0] if rest else LAZY_PLACEHOLDER, LAZY_PLACEHOLDER))
+        total = max(1, (len(self.current_data)+PAGE_SIZE-1)//PAGE_SIZE)
+        self.page_label.config(text=f"Page {self.current_page+1} of {total}")
+        if any(r[0] in rows for r in page):  # their images may have changed too
+            self.loader.request(self.current_page, self.show_page, range(total))
+
 if __name__ == "__main__":
     root=tk.Tk()
     app=EnhancedIconDatabaseEditor(root)
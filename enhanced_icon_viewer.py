@@ -1,10 +1,17 @@
-import sqlite3
-from PIL import Image, ImageTk
-import io
+from app_startup import STARTED, open_sources  # first: time-to-first-paint is measured from its import
 import tkinter as tk
 from tkinter import ttk, messagebox
 import math
 import json
+from icon_pager import KeysetPager, ListPager
+from term_index import TermIndex
+from facet_sidebar import FacetSidebar
+from metadata_index import has_meta_filters
+from contact_sheet import ContactSheet, SheetLayout
+from icon_loader import IconLoader
+from icon_changes import ChangeWatcher
+from related_index import parse_query
+from icon_trace import tracer, span, format_readout, report_first_paint
 
 # ==============================================
 # CUSTOMIZATION SETTINGS
@@ -21,12 +28,26 @@ PADX = 5
 PADY = 5
 TEXT_WRAPLENGTH = CELL_WIDTH - 10
 WINDOW_TITLE = "Enhanced AC Icon Viewer"
-WINDOW_SIZE = f"{CELL_WIDTH * COLUMNS + 100}x{CELL_HEIGHT * ROWS + 200}"
+WINDOW_SIZE = f"{CELL_WIDTH * COLUMNS + 300}x{CELL_HEIGHT * ROWS + 200}"
 BG_COLOR = "#252526"
 FONT_FAMILY = "Segoe UI"
 TITLE_FONT_SIZE = 9
 STATUS_FONT_SIZE = 9
 FONT_COLOR = "#FFFFFF"
+THUMBNAIL_CACHE_SIZE = 512  # PhotoImages kept in memory across page turns
+SHOW_LATENCY = False  # per-page timing readout under the status bar (toggle with F12)
+SEARCH_DEBOUNCE_MS = 150  # search once typing pauses this long
+INDEX_POLL_MS = 100
+CHANGE_POLL_MS = 500  # check for saves from other windows and processes this often
+FAST_START = True  # show the window first; count and first page follow (False: load, then show)
+# Contact sheet: each page is composited into one image on one canvas, for dense overviews
+CONTACT_SHEET = False
+SHEET_COLUMNS = 30
+SHEET_ROWS = 20
+SHEET_ICON_SIZE = 32
+SHEET_CAPTIONS = False  # icon ids under each icon
+SHEET_CAPTION_FONT_SIZE = 7
+PAGE_SIZE = SHEET_COLUMNS * SHEET_ROWS if CONTACT_SHEET else COLUMNS * ROWS
 
 # ==============================================
 # MAIN APPLICATION
@@ -37,10 +58,38 @@ class EnhancedIconViewer:
         self.root = root
         self.current_page = 1
         self.total_icons = 0
+        self.repo, self.thumbnails = open_sources(DB_PATH, THUMBNAIL_CACHE_SIZE)
+        self.browse_pager = KeysetPager(("icon_id", "name", "category", "icon_data"), PAGE_SIZE)
+        self.pager = self.browse_pager
+        self.similarity = None
+        self._similarity_build = None  # Future of a SimilarityIndex refresh on a worker thread
+        self._similar_waiting = None  # the icon to find similar ones for once it is done
+        self.related = None  # keyword RelatedIndex, opened on first use
+        self._related_build = None  # Future of a RelatedIndex being built on a worker thread
+        self._related_waiting = None  # the query to run once it is ready
+        self.live_term = None  # search term behind the current term-index results
+        self._search_after = None
+        self.term_index = TermIndex()
+        self._index_build = None  # started once the window is up
+        self.changes = ChangeWatcher(self.repo)
+        self.page_rows = []  # rows of the page on screen, in cell order
+        if CONTACT_SHEET:
+            self.sheet_layout = SheetLayout(SHEET_COLUMNS, SHEET_ROWS, (SHEET_ICON_SIZE, SHEET_ICON_SIZE),
+                                            SHEET_CAPTIONS)
+            self.sheet_photo = None
+            self.loader = IconLoader(self.root, ContactSheet(self.thumbnails, self.sheet_layout, BG_COLOR),
+                                     (SHEET_ICON_SIZE, SHEET_ICON_SIZE),
+                                     self.fetch_page, self.show_load_error, self.show_timings)
+        else:
+            self.loader = IconLoader(self.root, self.thumbnails, (ICON_WIDTH, ICON_HEIGHT),
+                                     self.fetch_page, self.show_load_error, self.show_timings)
         
         # Configure window
         self.root.title(WINDOW_TITLE)
-        self.root.geometry(WINDOW_SIZE)
+        if CONTACT_SHEET:
+            self.root.geometry(f"{self.sheet_layout.width + 300}x{self.sheet_layout.height + 200}")
+        else:
+            self.root.geometry(WINDOW_SIZE)
         self.root.configure(bg=BG_COLOR)
         
         # Create styles
@@ -53,7 +102,27 @@ class EnhancedIconViewer:
         self.main_frame.grid_columnconfigure(0, weight=1)
         
         self.setup_ui()
-        self.load_data()
+        if FAST_START:
+            self.status_var.set("Loading…")
+        else:
+            self.load_data()
+        self._map_binding = self.root.bind("<Map>", self.on_map, "+")
+
+    def on_map(self, event):
+        if event.widget is self.root:
+            self.root.unbind("<Map>", self._map_binding)
+            self.root.after_idle(self.on_first_paint)
+
+    def on_first_paint(self):
+        """The window is on screen: report time-to-first-paint, then start the slower work"""
+        self.root.update_idletasks()
+        ms = report_first_paint(STARTED)
+        if FAST_START:
+            self.load_data()  # the count is one stats-table lookup; icons stream in from the loader
+        self.status_var.set(f"{self.status_var.get()} | first paint {ms:.0f} ms")
+        self._index_build = self.term_index.load_in_background(self.repo)
+        self.root.after(INDEX_POLL_MS, self.check_term_index)
+        self.root.after(CHANGE_POLL_MS, self.poll_changes)
         
     def setup_styles(self):
         style = ttk.Style()
@@ -71,6 +140,7 @@ class EnhancedIconViewer:
         self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=30)
         self.search_entry.pack(side=tk.LEFT, padx=PADX)
         self.search_entry.bind("<Return>", lambda e: self.search_icons())
+        self.search_var.trace_add("write", lambda *_: self.schedule_search())
         
         ttk.Button(search_frame, text="Search", command=self.search_icons).pack(side=tk.LEFT, padx=PADX)
         ttk.Button(search_frame, text="Reset", command=self.reset_search).pack(side=tk.LEFT)
@@ -79,9 +149,12 @@ class EnhancedIconViewer:
         self.grid_frame = ttk.Frame(self.main_frame)
         self.grid_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
         
+        if CONTACT_SHEET:
+            self.setup_sheet()
+        
         # Create fixed grid cells with top-aligned icons
         self.cells = []
-        for row in range(ROWS):
+        for row in range(0 if CONTACT_SHEET else ROWS):
             row_cells = []
             for col in range(COLUMNS):
                 # Cell container
@@ -103,7 +176,7 @@ class EnhancedIconViewer:
                 text_label.grid(row=1, sticky="ew", pady=(0, 5))
                 
                 # Right-click menu
-                cell.bind("<Button-3>", lambda e, r=row, c=col: self.show_context_menu(e, r, c))
+                cell.bind("<Button-3>", lambda e, r=row, c=col: self.show_context_menu(e, self.cell_icon_id(r, c)))
                 
                 row_cells.append((cell, icon_label, text_label))
             self.cells.append(row_cells)
@@ -124,38 +197,97 @@ class EnhancedIconViewer:
         self.next_btn = ttk.Button(inner_pagination, text="Next →", command=self.next_page)
         self.next_btn.pack(side=tk.LEFT, padx=PADX)
         
+        ttk.Label(inner_pagination, text="Go to:").pack(side=tk.LEFT, padx=(PADX * 2, 0))
+        self.jump_var = tk.StringVar()
+        jump_entry = ttk.Entry(inner_pagination, textvariable=self.jump_var, width=6)
+        jump_entry.pack(side=tk.LEFT, padx=PADX)
+        jump_entry.bind("<Return>", lambda e: self.jump_to_page())
+        
         # Status Bar
         self.status_var = tk.StringVar()
         self.status_bar = ttk.Label(self.main_frame, textvariable=self.status_var, style="Status.TLabel")
         self.status_bar.grid(row=3, column=0, sticky="ew")
+        
+        # Latency readout (hidden unless SHOW_LATENCY or F12)
+        self.latency_var = tk.StringVar()
+        self.latency_bar = ttk.Label(self.main_frame, textvariable=self.latency_var, style="Status.TLabel")
+        self.root.bind("<F12>", lambda e: self.toggle_latency())
+        self.set_latency_visible(SHOW_LATENCY)
+        
+        # Category facets, left of everything else
+        self.facets = FacetSidebar(self.root, self.repo, self.search_icons)
+        self.facets.listbox.configure(background=BG_COLOR, foreground=FONT_COLOR)
+        self.facets.pack(side=tk.LEFT, fill=tk.Y, padx=(10, 0), pady=10, before=self.main_frame)
+    
+    def set_latency_visible(self, visible):
+        self.show_latency = visible
+        tracer.set_enabled(visible)
+        if visible:
+            self.latency_bar.grid(row=4, column=0, sticky="ew")
+            self.latency_var.set("Latency: waiting for the next page…")
+        else:
+            self.latency_bar.grid_remove()
+    
+    def toggle_latency(self):
+        self.set_latency_visible(not self.show_latency)
+    
+    def show_timings(self, page, timings):
+        if self.show_latency:
+            self.latency_var.set(format_readout(f"page {page}", timings))
+    
+    def setup_sheet(self):
+        """One canvas for the whole page; clicks are mapped back to icons through the layout"""
+        layout = self.sheet_layout
+        self.canvas = tk.Canvas(self.grid_frame, width=layout.width, height=layout.height,
+                                background=BG_COLOR, highlightthickness=0)
+        self.canvas.pack(anchor="n")
+        self.canvas.bind("<Button-1>", self.on_sheet_click)
+        self.canvas.bind("<Double-1>", lambda e: self.edit_metadata(self.sheet_icon_id(e)))
+        self.canvas.bind("<Button-3>", lambda e: self.show_context_menu(e, self.sheet_icon_id(e)))
     
-    def show_context_menu(self, event, row, col):
+    def sheet_icon_id(self, event):
+        """The icon_id under a canvas event, or None"""
+        index = self.sheet_layout.index_at(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        if index is None or index >= len(self.page_rows):
+            return None
+        return self.page_rows[index][0]
+    
+    def on_sheet_click(self, event):
+        icon_id = self.sheet_icon_id(event)
+        if icon_id is not None:
+            _, name, category = next(r for r in self.page_rows if r[0] == icon_id)
+            self.status_var.set(" | ".join(filter(None, (icon_id, name, category))))
+    
+    def cell_icon_id(self, row, col):
+        text = self.cells[row][col][2].cget("text")
+        return text.split("\n")[0] if text else None
+    
+    def show_context_menu(self, event, icon_id):
         """Show edit menu on right-click"""
+        if icon_id is None:
+            return
         try:
-            cell, _, text_label = self.cells[row][col]
-            icon_id = text_label.cget("text").split("\n")[0]
-            
             menu = tk.Menu(self.root, tearoff=0)
-            menu.add_command(label="Edit Metadata", command=lambda: self.edit_metadata(row, col))
+            menu.add_command(label="Edit Metadata", command=lambda: self.edit_metadata(icon_id))
+            menu.add_command(label="Find similar", command=lambda: self.find_similar(icon_id))
+            menu.add_command(label="Related icons", command=lambda: self.find_related(icon_id))
             menu.tk_popup(event.x_root, event.y_root)
         except Exception:
             pass
     
-    def edit_metadata(self, row, col):
+    def edit_metadata(self, icon_id):
         """Edit metadata popup - enhanced version with category support"""
+        if icon_id is None:
+            return
         try:
-            _, _, text_label = self.cells[row][col]
-            icon_id = text_label.cget("text").split("\n")[0]
-            
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT name, category, keywords, metadata_json FROM ac_icons WHERE icon_id=?", (icon_id,))
-            result = cursor.fetchone()
+            # Version first, then the record: a save that lands in between makes ours a conflict
+            version = self.repo.versions([icon_id])[icon_id]
+            result = self.repo.get(icon_id)
             if not result:
                 messagebox.showerror("Error", f"Icon {icon_id} not found in database")
                 return
             
-            name, category, keywords, metadata_json = result
+            _, name, category, keywords, metadata_json = result
             
             # Larger edit window
             edit_win = tk.Toplevel(self.root)
@@ -212,16 +344,11 @@ class EnhancedIconViewer:
             def save_changes():
                 try:
                     # Update the database
-                    cursor.execute("""
-                        UPDATE ac_icons 
-                        SET name=?, category=?, keywords=?
-                        WHERE icon_id=?
-                    """, (name_var.get() or None, 
-                          category_var.get() or None,
-                          keywords_var.get() or None,
-                          icon_id))
-                    conn.commit()
-                    self.display_page()  # Refresh view
+                    fields = dict(name=name_var.get() or None,
+                                  category=category_var.get() or None,
+                                  keywords=keywords_var.get() or None)
+                    self.repo.update(icon_id, expected_version=version, **fields)
+                    self.apply_changes()  # patches just this icon's cell
                     edit_win.destroy()
                     messagebox.showinfo("Success", "Metadata updated successfully")
                 except Exception as e:
@@ -237,105 +364,310 @@ class EnhancedIconViewer:
         except Exception as e:
             messagebox.showerror("Error", f"Couldn't edit: {str(e)}")
     
+    def poll_changes(self):
+        self.root.after(CHANGE_POLL_MS, self.poll_changes)
+        self.apply_changes()
+    
+    def apply_changes(self):
+        """Patch the cells of icons saved anywhere (this window included) since the last check"""
+        changed, deleted = self.changes.poll()
+        if not changed and not deleted:
+            return
+        records = {r.icon_id: r for r in self.repo.get_many(changed)}
+        for icon_id in changed + deleted:
+            record = records.get(icon_id)
+            if record:
+                self.term_index.update(icon_id, record.name, record.category, record.keywords)
+            else:
+                self.term_index.remove(icon_id)
+        self.facets.refresh()
+        # Edits can move icons in or out of the result: recount and forget page
+        # boundaries and prefetched pages, but leave the page on screen in place
+        if self.live_term is not None:
+            self.pager = ListPager(self.browse_pager.columns, PAGE_SIZE, self.term_index.search(self.live_term))
+        self.pager.invalidate()
+        self.loader.reset()
+        self.total_icons = self.pager.count(self.repo.reader())
+        self.current_page = min(self.current_page, max(1, math.ceil(self.total_icons / PAGE_SIZE)))
+        self.show_page_controls()
+        if not self.page_rows:  # the page was still loading: ask again for up-to-date rows
+            return self.display_page()
+        on_page = [idx for idx, row in enumerate(self.page_rows) if row[0] in records or row[0] in deleted]
+        if not on_page:
+            return
+        if CONTACT_SHEET:  # one image per page: recomposite it (unchanged icons are cache hits)
+            return self.display_page()
+        blobs = self.repo.icon_data(self.page_rows[idx][0] for idx in on_page)
+        for idx in on_page:
+            icon_id = self.page_rows[idx][0]
+            _, icon_label, text_label = self.cells[idx // COLUMNS][idx % COLUMNS]
+            record = records.get(icon_id)
+            if record is None:
+                icon_label.config(image='', text='')
+                icon_label.image = None
+                text_label.config(text=f"{icon_id}\n[deleted]")
+                continue
+            self.page_rows[idx] = (icon_id, record.name, record.category)
+            photo = self.thumbnails.photos([blobs.get(icon_id)], (ICON_WIDTH, ICON_HEIGHT))[0]
+            icon_label.config(image=photo or '', text='' if photo else "[Image]")
+            icon_label.image = photo
+            text_label.config(text=self.cell_text(icon_id, record.name, record.category))
+    
     def load_data(self):
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM ac_icons")
-            self.total_icons = cursor.fetchone()[0]
-            self.status_var.set(f"Loaded {self.total_icons} icons | {COLUMNS}×{ROWS} grid")
+            self.live_term = None
+            self.pager = self.browse_pager
+            self.pager.set_query("", self.repo.fts_enabled)
+            self.loader.reset()
+            with span("count"):
+                self.total_icons = self.pager.count(self.repo.reader())
+            self.current_page = 1
+            shape = f"{SHEET_COLUMNS}×{SHEET_ROWS} sheet" if CONTACT_SHEET else f"{COLUMNS}×{ROWS} grid"
+            self.status_var.set(f"Loaded {self.total_icons} icons | {shape}")
             self.display_page()
         except Exception as e:
             messagebox.showerror("Error", f"Database error: {str(e)}")
             
     def display_page(self):
+        self.page_rows = []
+        if CONTACT_SHEET:
+            self.canvas.delete("all")
+            self.sheet_photo = None
         for row in self.cells:
             for cell, icon_label, text_label in row:
-                icon_label.config(image='')
+                icon_label.config(image='', text='')
                 icon_label.image = None
                 text_label.config(text='')
         
         if self.total_icons == 0:
             return
             
-        total_pages = math.ceil(self.total_icons / (COLUMNS * ROWS))
+        total_pages = self.show_page_controls()
+        
+        # Placeholders until the loader hands the page back
+        on_page = min(PAGE_SIZE, self.total_icons - (self.current_page - 1) * PAGE_SIZE)
+        for idx in range(0 if CONTACT_SHEET else on_page):
+            self.cells[idx // COLUMNS][idx % COLUMNS][1].config(text="…")
+        self.loader.request(self.current_page, self.show_page, range(1, total_pages + 1))
+        
+    def show_page_controls(self):
+        """Update the page label and Prev/Next buttons; returns the number of pages"""
+        total_pages = max(1, math.ceil(self.total_icons / PAGE_SIZE))
         self.page_label.config(text=f"Page {self.current_page}/{total_pages}")
         self.prev_btn.config(state=tk.NORMAL if self.current_page > 1 else tk.DISABLED)
         self.next_btn.config(state=tk.NORMAL if self.current_page < total_pages else tk.DISABLED)
+        return total_pages
         
-        offset = (self.current_page - 1) * (COLUMNS * ROWS)
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
+    def fetch_page(self, page):
+        """Runs on a loader thread: returns the page rows and their image blobs"""
+        items = self.repo.page(self.pager, page)
+        return items, [item[3] for item in items]
+        
+    def show_page(self, page, items, photos):
+        self.page_rows = [item[:3] for item in items]
+        if CONTACT_SHEET:
+            return self.show_sheet(photos)
+        for idx, ((icon_id, name, category, _), photo) in enumerate(zip(items, photos)):
+            row = idx // COLUMNS
+            col = idx % COLUMNS
             
-            if self.search_var.get():
-                query = """
-                SELECT icon_id, name, category, icon_data FROM ac_icons 
-                WHERE icon_id LIKE ? OR name LIKE ? OR category LIKE ? OR keywords LIKE ?
-                LIMIT ? OFFSET ?
-                """
-                params = (f"%{self.search_var.get()}%", f"%{self.search_var.get()}%", 
-                         f"%{self.search_var.get()}%", f"%{self.search_var.get()}%",
-                         COLUMNS * ROWS, offset)
-            else:
-                query = "SELECT icon_id, name, category, icon_data FROM ac_icons LIMIT ? OFFSET ?"
-                params = (COLUMNS * ROWS, offset)
+            if row >= ROWS:
+                break
                 
-            cursor.execute(query, params)
-            items = cursor.fetchall()
+            cell, icon_label, text_label = self.cells[row][col]
             
-            for idx, (icon_id, name, category, icon_data) in enumerate(items):
-                row = idx // COLUMNS
-                col = idx % COLUMNS
-                
-                if row >= ROWS:
-                    break
-                    
-                cell, icon_label, text_label = self.cells[row][col]
-                
-                try:
-                    img = Image.open(io.BytesIO(icon_data))
-                    img.thumbnail((ICON_WIDTH, ICON_HEIGHT))
-                    photo = ImageTk.PhotoImage(img)
-                    icon_label.config(image=photo)
-                    icon_label.image = photo
-                except Exception:
-                    icon_label.config(text="[Image]")
-                
-                # Enhanced text display with category
-                text_parts = [icon_id]
-                if name:
-                    text_parts.append(name)
-                if category:
-                    text_parts.append(f"[{category}]")
-                
-                text_label.config(text="\n".join(text_parts))
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load page: {str(e)}")
+            if photo is not None:
+                icon_label.config(image=photo, text='')
+                icon_label.image = photo
+            else:
+                icon_label.config(text="[Image]")
             
-    def search_icons(self):
+            text_label.config(text=self.cell_text(icon_id, name, category))
+    
+    def cell_text(self, icon_id, name, category):
+        """Enhanced text display with category"""
+        text_parts = [icon_id]
+        if name:
+            text_parts.append(name)
+        if category:
+            text_parts.append(f"[{category}]")
+        return "\n".join(text_parts)
+            
+    def show_sheet(self, photo):
+        """Draw a composited page: one image item, plus a text item per icon if captions are on"""
+        self.sheet_photo = photo
+        self.canvas.create_image(0, 0, image=photo, anchor="nw")
+        if SHEET_CAPTIONS:
+            font = (FONT_FAMILY, SHEET_CAPTION_FONT_SIZE)
+            for idx, (icon_id, _, _) in enumerate(self.page_rows):
+                x, y = self.sheet_layout.caption_anchor(idx)
+                self.canvas.create_text(x, y, text=icon_id[-4:], anchor="n", fill=FONT_COLOR, font=font)
+            
+    def show_load_error(self, page, error):
+        messagebox.showerror("Error", f"Failed to load page: {str(error)}")
+            
+    def schedule_search(self):
+        """Search as you type, once keystrokes pause for SEARCH_DEBOUNCE_MS"""
+        if self._search_after is not None:
+            self.root.after_cancel(self._search_after)
+        self._search_after = self.root.after(SEARCH_DEBOUNCE_MS, lambda: self.search_icons(typing=True))
+        
+    def search_icons(self, typing=False):
+        if self._search_after is not None:
+            self.root.after_cancel(self._search_after)
+            self._search_after = None
+        self._related_waiting = self._similar_waiting = None
         search_term = self.search_var.get().strip()
-        if not search_term:
-            self.reset_search()
+        categories = self.facets.selected()
+        if not search_term and not categories:
+            self.load_data()
+            return
+        query = parse_query(search_term)
+        if query is not None:  # ranked keyword queries ignore the category filter
+            # While typing, related: waits for a complete icon id and ~ for Enter
+            if typing and (query[0] != "related" or self.repo.get(query[1]) is None):
+                self.status_var.set("Press Enter to search")
+                return
+            if query[0] == "related":
+                self.find_related(query[1])
+            else:
+                self.find_ranked(query[1])
             return
             
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) FROM ac_icons 
-                WHERE icon_id LIKE ? OR name LIKE ? OR category LIKE ? OR keywords LIKE ?
-                """, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
-            self.total_icons = cursor.fetchone()[0]
+            # Superseded page loads are dropped by the loader reset below
+            if self.term_index.ready and not categories and not has_meta_filters(search_term):
+                self.live_term = search_term
+                self.pager = ListPager(self.browse_pager.columns, PAGE_SIZE,
+                                       self.term_index.search(search_term))
+            else:  # category or meta.* filters, or still indexing: one SQLite query does it all
+                self.live_term = None
+                self.pager = self.browse_pager
+                self.pager.set_query(search_term, self.repo.fts_enabled, categories)
+            self.loader.reset()
+            with span("count"):
+                self.total_icons = self.pager.count(self.repo.reader())
             self.current_page = 1
+            status = f"{self.total_icons} icons"
+            if search_term:
+                status += f" match '{search_term}'"
+            if categories:
+                status += f" in {len(categories)} selected categories"
+            self.status_var.set(status)
             self.display_page()
         except Exception as e:
             messagebox.showerror("Error", f"Search failed: {str(e)}")
             
     def reset_search(self):
+        self.facets.clear()
         self.search_var.set("")
-        self.load_data()
+        self.search_icons()
+        
+    def check_term_index(self):
+        """Wait for the background term index; searches use SQLite until it is ready"""
+        if not self._index_build.done():
+            self.root.after(INDEX_POLL_MS, self.check_term_index)
+        elif self._index_build.exception() is not None:
+            self.status_var.set(f"Live search unavailable: {self._index_build.exception()}")
+        
+    def find_similar(self, icon_id):
+        """Show the icon and its nearest neighbours by perceptual hash, once new icons are hashed"""
+        self._related_waiting = None
+        self._similar_waiting = icon_id  # only the latest click is answered
+        if self._similarity_build is not None:
+            return
+        try:
+            if self.similarity is None:
+                from similarity_index import SimilarityIndex  # numpy + PIL, only when asked for
+                self.similarity = SimilarityIndex(self.repo)
+        except Exception as e:
+            messagebox.showerror("Error", f"Similarity search failed: {str(e)}")
+            return
+        self.status_var.set("Updating similarity index…")
+        self._similarity_build = self.similarity.refresh_in_background()
+        self.root.after(INDEX_POLL_MS, self.check_similarity_index)
+        
+    def check_similarity_index(self):
+        """Run the waiting Find similar once the background refresh of the hashes is done"""
+        if not self._similarity_build.done():
+            self.root.after(INDEX_POLL_MS, self.check_similarity_index)
+            return
+        build, self._similarity_build = self._similarity_build, None
+        icon_id, self._similar_waiting = self._similar_waiting, None
+        try:
+            build.result()
+            if icon_id is None:
+                return
+            matches = self.similarity.similar(icon_id)
+        except Exception as e:
+            messagebox.showerror("Error", f"Similarity search failed: {str(e)}")
+            return
+        self.show_icon_list([icon_id] + [m for m, _ in matches],
+                            f"{len(matches)} icons similar to {icon_id} | Reset to go back")
+        
+    def with_related(self, run):
+        """Call run(index) with the keyword index, once it is ready if it is still being built.
+
+        Building it, and rebuilding it after many edits, happens on a worker
+        thread; a stale index keeps answering until the new one is swapped in.
+        """
+        self._similar_waiting = None
+        if self.related is None:
+            self._related_waiting = run  # only the latest query runs once it is ready
+            self.status_var.set("Indexing keywords…")
+        else:
+            run(self.related)
+        if self._related_build is None and (self.related is None or self.related.stale):
+            from related_index import RelatedIndex  # numpy, only when asked for
+            self._related_build = RelatedIndex.open_in_background(self.repo, rebuild=self.related is not None)
+            self.root.after(INDEX_POLL_MS, self.check_related_index)
+        
+    def check_related_index(self):
+        """Swap in the keyword index built in the background, then run the query waiting for it"""
+        if not self._related_build.done():
+            self.root.after(INDEX_POLL_MS, self.check_related_index)
+            return
+        build, self._related_build = self._related_build, None
+        run, self._related_waiting = self._related_waiting, None
+        if build.exception() is not None:
+            messagebox.showerror("Error", f"Keyword index failed: {build.exception()}")
+            return
+        self.related = build.result()
+        if run:
+            run(self.related)
+        
+    def find_related(self, icon_id):
+        """Show the icon and the icons sharing most of its name/category/keyword terms"""
+        def show(index):
+            try:
+                matches = index.related(icon_id)
+            except Exception as e:
+                messagebox.showerror("Error", f"Related search failed: {str(e)}")
+                return
+            self.show_icon_list([icon_id] + [m for m, _ in matches],
+                                f"{len(matches)} icons related to {icon_id} | Reset to go back")
+        self.with_related(show)
+        
+    def find_ranked(self, text):
+        """Show every icon sharing a word with `text`, best match first"""
+        def show(index):
+            try:
+                matches = index.search(text)
+            except Exception as e:
+                messagebox.showerror("Error", f"Ranked search failed: {str(e)}")
+                return
+            self.show_icon_list([m for m, _ in matches], f"{len(matches)} icons ranked for '{text}'")
+        self.with_related(show)
+        
+    def show_icon_list(self, icon_ids, status):
+        """Page through a fixed list of icons, in the given order"""
+        self.live_term = None
+        self.pager = ListPager(self.browse_pager.columns, PAGE_SIZE, icon_ids)
+        self.loader.reset()
+        self.total_icons = self.pager.count(None)
+        self.current_page = 1
+        self.status_var.set(status)
+        self.display_page()
         
     def prev_page(self):
         if self.current_page > 1:
@@ -343,9 +675,19 @@ class EnhancedIconViewer:
             self.display_page()
             
     def next_page(self):
-        if self.current_page < math.ceil(self.total_icons / (COLUMNS * ROWS)):
+        if self.current_page < math.ceil(self.total_icons / PAGE_SIZE):
             self.current_page += 1
             self.display_page()
+            
+    def jump_to_page(self):
+        try:
+            page = int(self.jump_var.get())
+        except ValueError:
+            return
+        total_pages = max(1, math.ceil(self.total_icons / PAGE_SIZE))
+        self.current_page = max(1, min(page, total_pages))
+        self.jump_var.set("")
+        self.display_page()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,77 @@
+import argparse
+import base64
+import json
+import sys
+
+from change_journal import (ensure_journal, iter_changes, iter_compacted,
+                            latest_seq, get_watermark, set_watermark)
+from icon_repository import connect
+
+# ==============================================
+# CUSTOMIZATION SETTINGS
+# ==============================================
+
+DB_PATH = "enhanced_icons.db"
+WATERMARK_NAME = "export_changes"
+
+
+def _jsonable(value):
+    if isinstance(value, bytes):
+        return {"base64": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def write_changes(changes, out, fmt):
+    """Stream change dicts to `out` as a JSON array or as NDJSON; returns (count, last seq)."""
+    count, last = 0, None
+    if fmt == "json":
+        out.write("[")
+    for change in changes:
+        change = {k: _jsonable(v) for k, v in change.items()}
+        if fmt == "json":
+            out.write(",\n  " if count else "\n  ")
+        out.write(json.dumps(change, ensure_ascii=False))
+        if fmt == "ndjson":
+            out.write("\n")
+        count += 1
+        last = change["seq"] if last is None else max(last, change["seq"])
+    if fmt == "json":
+        out.write("\n]\n" if count else "]\n")
+    return count, last
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export the edits journaled in the local icon database.")
+    parser.add_argument("--db", default=DB_PATH, help=f"icon database (default {DB_PATH})")
+    parser.add_argument("-o", "--output", help="output file (default stdout)")
+    parser.add_argument("--format", choices=("json", "ndjson"), default="json")
+    parser.add_argument("--compact", action="store_true",
+                        help="one entry per changed field, last write wins")
+    parser.add_argument("--since", type=int, help="only changes after this journal seq")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue from the watermark saved by the previous --resume run")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    ensure_journal(conn)
+    since = args.since if args.since is not None else (
+        get_watermark(conn, WATERMARK_NAME) if args.resume else 0)
+    # Pin the upper bound so edits made while exporting go to the next run
+    upto = latest_seq(conn)
+    changes = (iter_compacted if args.compact else iter_changes)(conn, since, upto)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        count, _ = write_changes(changes, out, args.format)
+    finally:
+        if args.output:
+            out.close()
+    if args.resume:
+        set_watermark(conn, WATERMARK_NAME, upto)
+    print(f"Exported {count} change(s) after seq {since} (watermark {upto})", file=sys.stderr)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import tkinter as tk
+from tkinter import ttk
+
+from category_facets import NO_CATEGORY
+
+NO_CATEGORY_LABEL = "(no category)"
+SIDEBAR_WIDTH = 24  # characters
+
+
+class FacetSidebar(ttk.Frame):
+    """Category list with icon counts; selecting entries calls on_change().
+
+    Counts come from the trigger-maintained icon_categories table, so
+    refresh() is cheap enough to call after every save.
+    """
+
+    def __init__(self, parent, repo, on_change):
+        super().__init__(parent)
+        self.repo = repo
+        self.on_change = on_change
+        self._names = []
+
+        ttk.Label(self, text="Categories").pack(anchor="w", pady=(0, 2))
+        body = ttk.Frame(self)
+        body.pack(fill=tk.BOTH, expand=True)
+        self.listbox = tk.Listbox(body, selectmode=tk.MULTIPLE, exportselection=False,
+                                  width=SIDEBAR_WIDTH, activestyle="none")
+        sb = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self.listbox.yview)
+        self.listbox.configure(yscrollcommand=sb.set)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        sb.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.bind("<<ListboxSelect>>", lambda e: self.on_change())
+        ttk.Button(self, text="Clear", command=self.clear_and_notify).pack(fill=tk.X, pady=(2, 0))
+        self.refresh()
+
+    def refresh(self):
+        """Reload names and counts, keeping the current selection."""
+        selected = {name.lower() for name in self.selected()}
+        facets = self.repo.categories()
+        self._names = [name for name, _ in facets]
+        self.listbox.delete(0, tk.END)
+        for i, (name, count) in enumerate(facets):
+            self.listbox.insert(tk.END, f"{name if name != NO_CATEGORY else NO_CATEGORY_LABEL} ({count})")
+            if name.lower() in selected:
+                self.listbox.selection_set(i)
+
+    def selected(self):
+        """The selected category names (NO_CATEGORY for uncategorized icons)."""
+        return tuple(self._names[i] for i in self.listbox.curselection())
+
+    def clear(self):
+        self.listbox.selection_clear(0, tk.END)
+
+    def clear_and_notify(self):
+        if self.listbox.curselection():
+            self.clear()
+            self.on_change()
@@ -0,0 +1,184 @@
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from icon_repository import IconRepository
+from similarity_index import HASH_TABLE, SimilarityIndex, popcount
+
+# ==============================================
+# CUSTOMIZATION SETTINGS
+# ==============================================
+
+DB_PATH = "enhanced_icons.db"
+REPORT_PATH = "duplicates_report.json"
+RELATIONS_TABLE = "icon_relations"
+# Max summed dHash + pHash Hamming distance (of 128 bits) for a near-duplicate
+NEAR_THRESHOLD = 10
+# pHash is split into this many bands; icons sharing any band are compared
+BANDS = 4
+# Buckets bigger than this (blank or solid icons) are skipped as uninformative
+MAX_BUCKET = 400
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {RELATIONS_TABLE} (
+    icon_id TEXT NOT NULL,
+    related_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    distance INTEGER NOT NULL,
+    PRIMARY KEY (icon_id, related_id, kind)
+);
+CREATE INDEX IF NOT EXISTS {RELATIONS_TABLE}_related ON {RELATIONS_TABLE}(related_id);
+"""
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = np.arange(n)
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def load_hashes(repo):
+    rows = repo.reader().execute(
+        f"SELECT icon_id, content_hash, dhash, phash, width, height FROM {HASH_TABLE} "
+        "ORDER BY icon_id").fetchall()
+    ids = [r[0] for r in rows]
+    content = [r[1] for r in rows]
+    hashes = np.array([r[2:4] for r in rows], dtype=np.int64).reshape(-1, 2).view(np.uint64)
+    sizes = [(r[4], r[5]) for r in rows]
+    return ids, content, hashes, sizes
+
+
+def exact_groups(ids, content):
+    groups = defaultdict(list)
+    for icon_id, key in zip(ids, content):
+        groups[key].append(icon_id)
+    return {key: members for key, members in groups.items() if len(members) > 1}
+
+
+def near_groups(hashes, content, threshold=NEAR_THRESHOLD):
+    """Group indices whose hashes are within `threshold` bits, via pHash band buckets.
+
+    Exact duplicates are collapsed first so each distinct image is compared once.
+    Returns ({root index: [member indices]}, {index: distance to its root}).
+    """
+    n = len(hashes)
+    uf = _UnionFind(n)
+    first_of = {}
+    for i, key in enumerate(content):
+        if key in first_of:
+            uf.union(first_of[key], i)
+        else:
+            first_of[key] = i
+    unique = np.array(sorted(first_of.values()), dtype=np.int64)
+    if len(unique):
+        phash = hashes[unique, 1]
+        band_bits = 64 // BANDS
+        for band in range(BANDS):
+            keys = (phash >> np.uint64(band * band_bits)) & np.uint64((1 << band_bits) - 1)
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            cuts = np.flatnonzero(np.diff(sorted_keys)) + 1
+            for bucket in np.split(order, cuts):
+                if len(bucket) < 2 or len(bucket) > MAX_BUCKET:
+                    continue
+                members = unique[bucket]
+                block = hashes[members]
+                dist = popcount(block[:, None, :] ^ block[None, :, :]).sum(axis=2)
+                a, b = np.nonzero(np.triu(dist <= threshold, k=1))
+                for i, j in zip(members[a], members[b]):
+                    uf.union(int(i), int(j))
+
+    groups = defaultdict(list)
+    for i in range(n):
+        groups[uf.find(i)].append(i)
+    groups = {root: members for root, members in groups.items() if len(members) > 1}
+    distances = {}
+    for root, members in groups.items():
+        d = popcount(hashes[members] ^ hashes[root]).sum(axis=1)
+        distances.update(zip(members, (int(x) for x in d)))
+    return groups, distances
+
+
+def analyze(repo, report_path=REPORT_PATH, progress=None):
+    """Hash new or changed icons, group duplicates and write the report and relations table."""
+    started = time.perf_counter()
+    index = SimilarityIndex(repo)
+    hashed = index.refresh(progress=progress)
+    ids, content, hashes, sizes = load_hashes(repo)
+
+    exact = exact_groups(ids, content)
+    near, distances = near_groups(hashes, content)
+
+    relations = []
+    for members in exact.values():
+        rep = members[0]
+        relations += [(m, rep, "exact", 0) for m in members[1:]]
+    near_report = []
+    for root, members in sorted(near.items()):
+        member_ids = [ids[i] for i in members]
+        # Groups that are nothing but one exact duplicate set are already reported
+        if len({content[i] for i in members}) < 2:
+            continue
+        group_sizes = {ids[i]: f"{sizes[i][0]}x{sizes[i][1]}" for i in members}
+        relations += [(ids[i], ids[root], "near", distances[i]) for i in members if i != root]
+        near_report.append({
+            "icon_ids": member_ids,
+            "sizes": group_sizes,
+            "scaled": len(set(group_sizes.values())) > 1,
+            "max_distance": max(distances[i] for i in members),
+        })
+
+    def store(conn):
+        conn.executescript(_SCHEMA)
+        with conn:
+            conn.execute(f"DELETE FROM {RELATIONS_TABLE}")
+            conn.executemany(f"INSERT OR REPLACE INTO {RELATIONS_TABLE} VALUES (?, ?, ?, ?)", relations)
+    repo.migrate(store)
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "icons": len(ids),
+        "hashed_this_run": hashed,
+        "near_threshold": NEAR_THRESHOLD,
+        "exact_groups": [{"content_hash": key, "icon_ids": members}
+                         for key, members in sorted(exact.items(), key=lambda kv: kv[1][0])],
+        "near_groups": near_report,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find exact and near-duplicate icons (including scaled variants).")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("-o", "--output", default=REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    report = analyze(IconRepository(args.db), args.output,
+                     progress=lambda n: print(f"\rhashed {n}", end="", file=sys.stderr))
+    print(f"\n{report['icons']} icons ({report['hashed_this_run']} hashed this run): "
+          f"{len(report['exact_groups'])} exact groups, {len(report['near_groups'])} near groups "
+          f"in {report['seconds']}s -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
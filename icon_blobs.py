@@ -0,0 +1,57 @@
+# ==============================================
+# CONTENT-ADDRESSED ICON STORAGE
+# ==============================================
+#
+# pack_icons.py moves images out of ac_icons.icon_data into icon_blobs.
+# Each distinct image is stored once, keyed by its content hash, and
+# ac_icons.icon_hash points at it. The row's icon_data is then NULL, so
+# scans over ac_icons no longer have to step over image pages. Rows written
+# since the last pack (e.g. by an import) still carry inline icon_data,
+# which takes precedence, so every reader goes through icon_data_sql()
+# and works with packed, unpacked and half-packed databases alike.
+
+BLOB_TABLE = "icon_blobs"
+HASH_COLUMN = "icon_hash"
+
+_BLOBS_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {BLOB_TABLE} (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ac_icons_{HASH_COLUMN} ON ac_icons({HASH_COLUMN});
+"""
+
+
+def icon_data_sql(table="ac_icons", blobs=True):
+    """SQL for an icon's image bytes, inline or from icon_blobs (blobs=False: there is no icon_blobs)."""
+    if not blobs:
+        return f"{table}.icon_data"
+    return (f"ifnull({table}.icon_data, "
+            f"(SELECT data FROM {BLOB_TABLE} WHERE hash = {table}.{HASH_COLUMN}))")
+
+
+def column_sql(column, table="ac_icons", blobs=True):
+    """SQL selecting an ac_icons column; icon_data is resolved through icon_blobs."""
+    return icon_data_sql(table, blobs) if column == "icon_data" else f"{table}.{column}"
+
+
+def has_blobs(conn):
+    """True if icon_blobs and ac_icons.icon_hash exist (without creating them)."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ac_icons)")}
+    return HASH_COLUMN in columns and conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (BLOB_TABLE,)).fetchone() is not None
+
+
+def ensure_blobs(conn):
+    """Add the icon_hash column and the blob table if they are missing."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ac_icons)")}
+    if HASH_COLUMN not in columns:
+        with conn:
+            conn.execute(f"ALTER TABLE ac_icons ADD COLUMN {HASH_COLUMN} TEXT")
+    conn.executescript(_BLOBS_SCHEMA)
+
+
+def is_packed(conn):
+    """True once pack_icons.py has moved images into icon_blobs."""
+    return conn.execute(
+        f"SELECT 1 FROM ac_icons WHERE {HASH_COLUMN} IS NOT NULL LIMIT 1").fetchone() is not None
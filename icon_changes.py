@@ -0,0 +1,124 @@
+from change_journal import JOURNALED_COLUMNS
+from trigger_gates import gate, install_triggers
+
+# ==============================================
+# ROW VERSIONS AND CHANGE NOTIFICATION
+# ==============================================
+#
+# ac_icons_versions holds a version per icon, bumped by triggers on every
+# insert, update and delete, plus a database-wide sequence number for the
+# latest change. It lets open views do two things without rereading
+# everything:
+#   * ChangeWatcher polls PRAGMA data_version, which changes whenever
+#     another connection (another process, or this repository's writer)
+#     commits. Only then does it read the icons changed since its last poll.
+#   * Saves can pass the versions they read, and the write is refused
+#     (EditConflict) if any row has changed since then.
+# Icons that were never changed have no row, which means version 0.
+
+VERSIONS_TABLE = "ac_icons_versions"
+
+
+def _bump(row, deleted):
+    return f"""
+    INSERT INTO {VERSIONS_TABLE}(icon_id, version, seq, deleted)
+    VALUES ({row}.icon_id, 1, (SELECT ifnull(MAX(seq), 0) + 1 FROM {VERSIONS_TABLE}), {deleted})
+    ON CONFLICT(icon_id) DO UPDATE SET version = version + 1, seq = excluded.seq, deleted = {deleted};"""
+
+
+_changed = " OR ".join(f"old.{col} IS NOT new.{col}" for col in JOURNALED_COLUMNS)
+
+_VERSIONS_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (
+    icon_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS {VERSIONS_TABLE}_seq ON {VERSIONS_TABLE}(seq);
+"""
+
+_VERSIONS_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS {VERSIONS_TABLE}_ai AFTER INSERT ON ac_icons
+WHEN {gate(VERSIONS_TABLE)} BEGIN{_bump("new", 0)}
+END;
+CREATE TRIGGER IF NOT EXISTS {VERSIONS_TABLE}_au AFTER UPDATE ON ac_icons
+WHEN {gate(VERSIONS_TABLE)} AND ({_changed}) BEGIN{_bump("new", 0)}
+END;
+CREATE TRIGGER IF NOT EXISTS {VERSIONS_TABLE}_ad AFTER DELETE ON ac_icons
+WHEN {gate(VERSIONS_TABLE)} BEGIN{_bump("old", 1)}
+END;
+"""
+
+
+class EditConflict(Exception):
+    """A save was refused because other writes changed some of its icons first."""
+
+    def __init__(self, icon_ids):
+        self.icon_ids = list(icon_ids)
+        shown = ", ".join(self.icon_ids[:5]) + (" ..." if len(self.icon_ids) > 5 else "")
+        super().__init__(f"{len(self.icon_ids)} icon(s) were changed elsewhere since they "
+                         f"were read: {shown}. Nothing was saved.")
+
+
+def ensure_versions(conn):
+    """Create the versions table and its triggers if they are missing."""
+    conn.executescript(_VERSIONS_SCHEMA)
+    install_triggers(conn, VERSIONS_TABLE, _VERSIONS_TRIGGERS)
+
+
+def read_versions(conn, icon_ids):
+    """Return {icon_id: version} for the given ids (0 for never-changed icons)."""
+    icon_ids = list(icon_ids)
+    found = {}
+    for i in range(0, len(icon_ids), 500):
+        chunk = icon_ids[i:i + 500]
+        found.update(conn.execute(
+            f"SELECT icon_id, version FROM {VERSIONS_TABLE} "
+            f"WHERE icon_id IN ({','.join('?' * len(chunk))})", chunk))
+    return {i: found.get(i, 0) for i in icon_ids}
+
+
+def check_versions(conn, expected):
+    """Raise EditConflict if any icon's version differs from `expected` ({icon_id: version})."""
+    current = read_versions(conn, expected)
+    stale = [i for i, version in expected.items() if current[i] != version]
+    if stale:
+        raise EditConflict(stale)
+
+
+def latest_change(conn):
+    return conn.execute(f"SELECT ifnull(MAX(seq), 0) FROM {VERSIONS_TABLE}").fetchone()[0]
+
+
+class ChangeWatcher:
+    """Tells an open view which icons changed since it last asked.
+
+    poll() is cheap enough to run every few hundred milliseconds: unless
+    some connection committed since the last call it is a single PRAGMA.
+    Call it from one thread only, since PRAGMA data_version is tracked per
+    connection and repo.reader() is per thread.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        conn = repo.reader()
+        self._data_version = self._current(conn)
+        self.seq = latest_change(conn)
+
+    @staticmethod
+    def _current(conn):
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def poll(self):
+        """Return (changed_ids, deleted_ids) since the last poll; both empty if nothing changed."""
+        conn = self.repo.reader()
+        data_version = self._current(conn)
+        if data_version == self._data_version:
+            return [], []
+        self._data_version = data_version
+        rows = conn.execute(f"SELECT icon_id, deleted, seq FROM {VERSIONS_TABLE} "
+                            "WHERE seq > ? ORDER BY seq", (self.seq,)).fetchall()
+        if rows:
+            self.seq = rows[-1][2]
+        return [i for i, deleted, _ in rows if not deleted], [i for i, deleted, _ in rows if deleted]
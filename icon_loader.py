@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from icon_trace import tracer, span
+
+# ==============================================
+# BACKGROUND PAGE LOADER SETTINGS
+# ==============================================
+
+LOADER_WORKERS = 3
+LOADER_POLL_MS = 15   # how often Tk checks for a finished page
+PREFETCH_PAGES = 1    # pages loaded speculatively on each side of the visible one
+
+
+class IconLoader:
+    """Loads pages of icons on worker threads and hands them back to Tk.
+
+    `fetch(page)` runs on a worker (reading through the thread's own
+    IconRepository connection) and returns (rows, blobs). The blobs are resolved through the
+    ThumbnailCache on the same worker, so the Tk thread only creates
+    PhotoImages. Finished pages are picked up with root.after() polling;
+    pages the user has already moved away from are cancelled, or skip their
+    decode step if a worker had already started on them.
+    `on_error(page, exc)` is called on the Tk thread if a load fails, and
+    `on_timings(page, {span: ms})`, if given, after each delivered page
+    while tracing is enabled.
+    """
+
+    def __init__(self, root, thumbnails, size, fetch, on_error, on_timings=None,
+                 workers=LOADER_WORKERS, prefetch=PREFETCH_PAGES):
+        self.root = root
+        self.thumbnails = thumbnails
+        self.size = size
+        self.fetch = fetch
+        self.on_error = on_error
+        self.on_timings = on_timings
+        self.prefetch = prefetch
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="icon-loader")
+        self._futures = {}
+        self._keep = frozenset()
+        self._wanted = None
+        self._callback = None
+        self._page_range = None
+        self._polling = False
+
+    def request(self, page, callback, page_range=None):
+        """Load `page` and call callback(page, rows, photos) on the Tk thread.
+
+        Supersedes any earlier request; neighbouring pages inside
+        `page_range` are prefetched.
+        """
+        self._wanted, self._callback, self._page_range = page, callback, page_range
+        keep = {page} | {page + d for d in range(-self.prefetch, self.prefetch + 1)}
+        if page_range is not None:
+            keep = {p for p in keep if p == page or p in page_range}
+        self._keep = frozenset(keep)
+        for other in list(self._futures):
+            if other not in keep:
+                self._futures.pop(other).cancel()
+        for p in sorted(keep, key=lambda p: abs(p - page)):
+            if p not in self._futures:
+                self._futures[p] = self.executor.submit(self._load, p)
+        if not self._polling:
+            self._polling = True
+            self.root.after(LOADER_POLL_MS, self._poll)
+
+    def reset(self):
+        """Drop loaded and pending pages (the query or the data changed)."""
+        for future in self._futures.values():
+            future.cancel()
+        self._futures = {}
+        self._keep = frozenset()
+
+    def close(self):
+        self.reset()
+        self.executor.shutdown(wait=False)
+
+    def _load(self, page):
+        with tracer.collect() as timings:
+            rows, blobs = self.fetch(page)
+            if page not in self._keep:
+                return rows, None, timings  # superseded while querying - don't bother decoding
+            return rows, self.thumbnails.prepare(blobs, self.size), timings
+
+    def _poll(self):
+        future = self._futures.get(self._wanted)
+        if future is None or not future.done():
+            if future is None:
+                self._polling = False
+            else:
+                self.root.after(LOADER_POLL_MS, self._poll)
+            return
+        self._polling = False
+        # Only the page for the latest request is delivered; the other
+        # finished futures stay around as prefetched pages.
+        page, callback = self._wanted, self._callback
+        try:
+            rows, prepared, worker_timings = future.result()
+        except Exception as e:
+            del self._futures[page]
+            self.on_error(page, e)
+            return
+        if prepared is None:  # was stale when it ran but is wanted again
+            del self._futures[page]
+            self.request(page, callback, self._page_range)
+            return
+        with tracer.collect() as timings:
+            photos = self.thumbnails.realize(prepared)
+            with span("tk"):
+                callback(page, rows, photos)
+        if tracer.enabled and self.on_timings:
+            timings.update(worker_timings)
+            tracer.add_sample("page", sum(timings.values()))
+            self.on_timings(page, timings)
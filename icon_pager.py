@@ -0,0 +1,138 @@
+from icon_blobs import column_sql
+from icon_search import count_matches, match_source, where_clause
+from icon_trace import span
+
+# ==============================================
+# KEYSET (CURSOR) PAGINATION
+# ==============================================
+
+
+class KeysetPager:
+    """Pages through a search result by (sort key, icon_id) instead of OFFSET.
+
+    A page start is the sort key of the last row on the previous page, so
+    loading a page from a known start is a single index seek. Page starts
+    are cached as they are discovered (a sparse boundary index); jumping to
+    an unseen page walks the key columns only from the nearest cached
+    boundary, or from the end of the result, whichever is closer.
+
+    fetch_page() may run on loader threads: invalidate() swaps in a fresh
+    boundary dict, so a page still loading for the old query can't write
+    stale boundaries into the new one.
+    """
+
+    def __init__(self, columns, page_size, blobs=True):
+        self.columns = tuple(columns)
+        self.page_size = page_size
+        self.blobs = blobs  # False: the database has no icon_blobs (see icon_blobs.icon_data_sql)
+        self.set_query("")
+
+    def set_query(self, term, fts=True, categories=(), meta_paths=None, stats=True):
+        """Point the pager at a new search (optionally within `categories`); resets count and cursors.
+
+        `meta_paths` and `stats` describe the database as in icon_search.count_matches().
+        """
+        self.from_sql, self.where_sql, self.params, self.sort_keys = match_source(term, fts, categories, meta_paths)
+        self._count_sql = count_matches(term, fts, categories, meta_paths, stats)  # a stats lookup for the unfiltered list
+        self.invalidate()
+
+    def invalidate(self):
+        """Forget the cached count and page boundaries (after edits)."""
+        self._total = None
+        self._starts = {1: None}
+
+    def count(self, conn):
+        """Number of matching rows, computed once per query."""
+        if self._total is None:
+            self._total = conn.execute(*self._count_sql).fetchone()[0]
+        return self._total
+
+    def page_count(self, conn):
+        return max(1, -(-self.count(conn) // self.page_size))
+
+    def fetch_page(self, conn, page):
+        """Return the rows (self.columns only) on 1-based `page`."""
+        starts = self._starts
+        page = max(1, min(page, self.page_count(conn)))
+        if page not in starts:
+            with span("seek"):
+                starts[page] = self._seek(conn, page, dict(starts))
+        start = starts[page]
+        cols = ", ".join(column_sql(c, blobs=self.blobs) for c in self.columns)
+        sql = (f"SELECT {cols}, {', '.join(self.sort_keys)} {self.from_sql}"
+               f"{where_clause(self.where_sql, self._after(start))} "
+               f"ORDER BY {', '.join(self.sort_keys)} LIMIT ?")
+        params = self.params + (start or ()) + (self.page_size,)
+        with span("query"):
+            cur = conn.execute(sql, params)
+        with span("fetch"):
+            rows = cur.fetchall()
+        width = len(self.columns)
+        if len(rows) == self.page_size:
+            starts[page + 1] = tuple(rows[-1][width:])
+        return [row[:width] for row in rows]
+
+    def _after(self, cursor, op=">"):
+        if cursor is None:
+            return ""
+        return f"({', '.join(self.sort_keys)}) {op} ({', '.join('?' * len(cursor))})"
+
+    def _seek(self, conn, page, starts):
+        """Find the start cursor of `page` from the closest boundary in `starts`."""
+        size = self.page_size
+        target = (page - 1) * size - 1  # index of the last row before the page
+        below = max(p for p in starts if p < page)
+        above = min((p for p in starts if p > page), default=None)
+        forward = target - (below - 1) * size
+        if above is not None:
+            backward = (above - 1) * size - 1 - target
+        else:
+            backward = self.count(conn) - 1 - target
+
+        keys = ", ".join(self.sort_keys)
+        if forward <= backward:
+            cursor, condition, order, offset = starts[below], ">", keys, forward
+        else:
+            cursor = starts[above] if above is not None else None
+            condition, offset = "<=", backward
+            order = ", ".join(f"{k} DESC" for k in self.sort_keys)
+        sql = (f"SELECT {keys} {self.from_sql}"
+               f"{where_clause(self.where_sql, self._after(cursor, condition))} "
+               f"ORDER BY {order} LIMIT 1 OFFSET ?")
+        row = conn.execute(sql, self.params + (cursor or ()) + (offset,)).fetchone()
+        return tuple(row) if row else None
+
+
+class ListPager:
+    """Pages through an explicit, already ordered list of icon ids.
+
+    Used for results that don't come from SQL (e.g. "Find similar"); it has
+    the same count/page_count/fetch_page interface as KeysetPager.
+    """
+
+    def __init__(self, columns, page_size, icon_ids):
+        self.columns = tuple(columns)
+        self.page_size = page_size
+        self.icon_ids = list(icon_ids)
+
+    def invalidate(self):
+        pass
+
+    def count(self, conn):
+        return len(self.icon_ids)
+
+    def page_count(self, conn):
+        return max(1, -(-len(self.icon_ids) // self.page_size))
+
+    def fetch_page(self, conn, page):
+        start = (max(1, page) - 1) * self.page_size
+        ids = self.icon_ids[start:start + self.page_size]
+        if not ids:
+            return []
+        cols = ", ".join(column_sql(c) for c in self.columns)
+        with span("query"):
+            cur = conn.execute(f"SELECT icon_id, {cols} FROM ac_icons "
+                               f"WHERE icon_id IN ({','.join('?' * len(ids))})", ids)
+        with span("fetch"):
+            found = {row[0]: row[1:] for row in cur.fetchall()}
+        return [found[i] for i in ids if i in found]
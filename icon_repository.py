@@ -0,0 +1,235 @@
+import sqlite3
+import threading
+from collections import defaultdict, namedtuple
+from pathlib import Path
+
+from category_facets import count_categories, ensure_facets, has_facets, list_facets
+from change_journal import ensure_journal
+from icon_blobs import column_sql, ensure_blobs, has_blobs, icon_data_sql
+from icon_changes import ensure_versions, read_versions, check_versions
+from icon_stats import ensure_stats, has_stats
+from metadata_index import ensure_metadata_columns, metadata_columns
+from icon_search import ensure_search_index, has_search_index, select_matches, count_matches
+
+# ==============================================
+# CONNECTION SETTINGS
+# ==============================================
+
+BUSY_TIMEOUT_MS = 5000            # wait this long for another writer instead of "database is locked"
+MMAP_SIZE = 256 * 1024 * 1024     # read pages straight from the OS page cache
+CACHED_STATEMENTS = 256           # prepared statements kept per connection
+
+UPDATABLE_COLUMNS = ("name", "category", "keywords", "metadata_json")
+
+IconRecord = namedtuple("IconRecord", "icon_id name category keywords metadata_json")
+
+_GET_SQL = "SELECT icon_id, name, category, keywords, metadata_json FROM ac_icons WHERE icon_id=?"
+
+
+def connect(db_path, check_same_thread=True, read_only=False):
+    """Open a connection with the settings every icon DB connection should use."""
+    if read_only:  # SQLite itself refuses any write, schema setup included
+        db_path = Path(db_path).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                           uri=read_only,
+                           cached_statements=CACHED_STATEMENTS,
+                           check_same_thread=check_same_thread)
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    return conn
+
+
+class IconRepository:
+    """The one place both apps go through to read and write ac_icons.
+
+    Each thread gets a long-lived read connection (see reader()); all writes
+    share one writer connection behind a lock. The database is switched to
+    WAL so readers never block the writer and a viewer and an editor can
+    have the same file open at once.
+    """
+
+    def __init__(self, db_path, read_only=False):
+        self.db_path = db_path
+        self.read_only = read_only
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._writer = connect(db_path, check_same_thread=False, read_only=read_only)
+        if read_only:  # use the schema as it is, however far it was migrated: no migrations, no writes
+            self.fts_enabled = has_search_index(self._writer)
+            self.metadata_fields = metadata_columns(self._writer)
+            self.has_stats = has_stats(self._writer)
+            self.has_facets = has_facets(self._writer)
+            self.has_blobs = has_blobs(self._writer)
+            return
+        self.has_stats = self.has_facets = self.has_blobs = True
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        self.fts_enabled = ensure_search_index(self._writer)
+        ensure_journal(self._writer)
+        ensure_facets(self._writer)
+        ensure_stats(self._writer)
+        ensure_versions(self._writer)
+        ensure_blobs(self._writer)
+        self.metadata_fields = ensure_metadata_columns(self._writer)
+
+    def reader(self):
+        """Return this thread's read connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path, read_only=self.read_only)
+        return conn
+
+    def writer(self):
+        """Context manager yielding the writer connection inside a transaction."""
+        return _WriteTransaction(self._writer, self._write_lock)
+
+    def migrate(self, setup):
+        """Run a schema setup function (which may use executescript) on the writer."""
+        with self._write_lock:
+            return setup(self._writer)
+
+    # -- queries ---------------------------------------------------------
+
+    def count(self, term="", categories=()):
+        """Number of icons matching `term` (all icons for an empty term)."""
+        return self.reader().execute(*count_matches(
+            term, self.fts_enabled, categories, self.metadata_fields, self.has_stats)).fetchone()[0]
+
+    def search(self, columns, term="", categories=()):
+        """Return `columns` for every icon matching `term` (and in `categories`), best match first."""
+        return self.reader().execute(
+            *select_matches(columns, term, self.fts_enabled, categories, self.metadata_fields,
+                            self.has_blobs)).fetchall()
+
+    def categories(self):
+        """Return [(category, icon_count)] from the trigger-maintained facet table."""
+        return list_facets(self.reader()) if self.has_facets else count_categories(self.reader())
+
+    def page(self, pager, number):
+        """Return page `number` of a KeysetPager's current query."""
+        return pager.fetch_page(self.reader(), number)
+
+    def page_count(self, pager):
+        return pager.page_count(self.reader())
+
+    def get(self, icon_id):
+        """Return the IconRecord for `icon_id`, or None."""
+        row = self.reader().execute(_GET_SQL, (icon_id,)).fetchone()
+        return IconRecord(*row) if row else None
+
+    def get_value(self, icon_id, column):
+        """Return a single column of one icon (None if the icon is missing)."""
+        if column not in UPDATABLE_COLUMNS:
+            raise ValueError(f"Unknown column: {column}")
+        row = self.reader().execute(
+            f"SELECT {column} FROM ac_icons WHERE icon_id=?", (icon_id,)).fetchone()
+        return row[0] if row else None
+
+    def rows_for(self, columns, icon_ids):
+        """Return `columns` for the given ids, in the order given (unknown ids are skipped)."""
+        icon_ids = list(icon_ids)
+        found = {}
+        cols = ", ".join(column_sql(c, blobs=self.has_blobs) for c in columns)
+        for i in range(0, len(icon_ids), 500):
+            chunk = icon_ids[i:i + 500]
+            for row in self.reader().execute(
+                    f"SELECT icon_id, {cols} FROM ac_icons WHERE icon_id IN ({','.join('?' * len(chunk))})",
+                    chunk):
+                found[row[0]] = row[1:]
+        return [found[i] for i in icon_ids if i in found]
+
+    def get_many(self, icon_ids):
+        """Return IconRecords for the given ids, in the order given (unknown ids are skipped)."""
+        return [IconRecord(*row) for row in self.rows_for(IconRecord._fields, icon_ids)]
+
+    def versions(self, icon_ids):
+        """Return {icon_id: row version} for the given ids; read these before the rows they guard."""
+        return read_versions(self.reader(), icon_ids)
+
+    def icon_data(self, icon_ids):
+        """Return {icon_id: icon_data} for the given ids (packed or inline, see icon_blobs)."""
+        icon_ids = list(icon_ids)
+        found = {}
+        for i in range(0, len(icon_ids), 500):
+            chunk = icon_ids[i:i + 500]
+            found.update(self.reader().execute(
+                f"SELECT icon_id, {icon_data_sql(blobs=self.has_blobs)} FROM ac_icons WHERE icon_id IN ({','.join('?' * len(chunk))})",
+                chunk).fetchall())
+        return found
+
+    # -- writes ----------------------------------------------------------
+
+    def update(self, icon_id, expected_version=None, **fields):
+        """Set the given text columns of one icon; returns True if it exists.
+
+        With `expected_version` (from versions()) the save raises
+        EditConflict instead if the icon has changed since it was read.
+        """
+        unknown = set(fields) - set(UPDATABLE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(sorted(unknown))}")
+        if not fields:
+            return False
+        columns = sorted(fields)
+        sql = f"UPDATE ac_icons SET {', '.join(c + '=?' for c in columns)} WHERE icon_id=?"
+        with self.writer() as conn:
+            if expected_version is not None:
+                check_versions(conn, {icon_id: expected_version})
+            cur = conn.execute(sql, [fields[c] for c in columns] + [icon_id])
+        return cur.rowcount > 0
+
+    def update_many(self, changes, expected=None):
+        """Apply (icon_id, column, value) changes in one transaction, one executemany per column.
+
+        `expected` ({icon_id: version}) makes the whole batch fail with
+        EditConflict if any of those icons changed since it was read.
+        Returns {icon_id: new version} for the changed icons.
+        """
+        by_column = defaultdict(list)
+        for icon_id, column, value in changes:
+            if column not in UPDATABLE_COLUMNS:
+                raise ValueError(f"Unknown column: {column}")
+            by_column[column].append((value, icon_id))
+        if not by_column:
+            return {}
+        with self.writer() as conn:
+            if expected:
+                check_versions(conn, expected)
+            for column, params in by_column.items():
+                conn.executemany(f"UPDATE ac_icons SET {column}=? WHERE icon_id=?", params)
+            return read_versions(conn, {i for params in by_column.values() for _, i in params})
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        with self._write_lock:
+            self._writer.close()
+
+
+class _WriteTransaction:
+    """Hold the write lock for one transaction on the writer connection."""
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.lock.release()
+        return False
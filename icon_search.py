@@ -0,0 +1,151 @@
+import re
+import sqlite3
+
+from category_facets import category_condition
+from icon_blobs import column_sql
+from icon_stats import COUNT_SQL
+from metadata_index import split_meta_filters
+from trigger_gates import gate, install_triggers
+
+# ==============================================
+# FULL-TEXT SEARCH (FTS5) OVER ac_icons
+# ==============================================
+
+FTS_TABLE = "ac_icons_fts"
+FTS_COLUMNS = ("icon_id", "name", "category", "keywords")
+# bm25() weights, one per FTS_COLUMNS entry - an id or name hit outranks a keyword hit
+BM25_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+_FTS_SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    {", ".join(FTS_COLUMNS)},
+    content='ac_icons', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+"""
+
+_FTS_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON ac_icons WHEN {gate(FTS_TABLE)} BEGIN
+    INSERT INTO {FTS_TABLE}(rowid, {", ".join(FTS_COLUMNS)})
+    VALUES (new.rowid, {", ".join("new." + c for c in FTS_COLUMNS)});
+END;
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON ac_icons WHEN {gate(FTS_TABLE)} BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {", ".join(FTS_COLUMNS)})
+    VALUES ('delete', old.rowid, {", ".join("old." + c for c in FTS_COLUMNS)});
+END;
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {", ".join(FTS_COLUMNS)} ON ac_icons
+WHEN {gate(FTS_TABLE)} BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {", ".join(FTS_COLUMNS)})
+    VALUES ('delete', old.rowid, {", ".join("old." + c for c in FTS_COLUMNS)});
+    INSERT INTO {FTS_TABLE}(rowid, {", ".join(FTS_COLUMNS)})
+    VALUES (new.rowid, {", ".join("new." + c for c in FTS_COLUMNS)});
+END;
+"""
+
+
+def ensure_search_index(conn):
+    """Create and populate the FTS5 index if it is missing.
+
+    Returns True when full-text search is available, False if this SQLite
+    build has no FTS5 and callers should fall back to LIKE scans.
+    """
+    if has_search_index(conn):
+        install_triggers(conn, FTS_TABLE, _FTS_TRIGGERS)
+        return True
+    try:
+        conn.executescript(_FTS_SCHEMA)
+        install_triggers(conn, FTS_TABLE, _FTS_TRIGGERS)
+        with conn:
+            conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            conn.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', ?)",
+                (f"bm25({', '.join(str(w) for w in BM25_WEIGHTS)})",),
+            )
+    except sqlite3.OperationalError as e:
+        if "fts5" in str(e).lower():
+            return False
+        raise
+    return True
+
+
+def has_search_index(conn):
+    """True if the FTS index exists (without creating it)."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (FTS_TABLE,)
+    ).fetchone() is not None
+
+
+def rebuild_search_index(conn):
+    """Re-read every row of ac_icons into the FTS index (after bulk imports)."""
+    with conn:
+        conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(term):
+    """Turn free text into an FTS5 query: every word must match, each as a prefix."""
+    tokens = _TOKEN_RE.findall(term or "")
+    return " AND ".join('"{}"*'.format(t.replace('"', '""')) for t in tokens)
+
+
+def match_source(term, fts=True, categories=(), meta_paths=None):
+    """Describe the rows matching `term` as (from_sql, where_sql, params, sort_keys).
+
+    `from_sql` exposes the ac_icons columns, `where_sql` is a condition (or
+    "" for every row) and `sort_keys` the unique ordering - best match first
+    for FTS, icon_id for the LIKE fallback and for an empty term.
+    `categories`, if given, restricts the rows to those facets, and
+    meta.<field>:<value> parts of the term to indexed metadata values, all
+    in the same query. `meta_paths` are the meta.* fields the database has
+    columns for (default: METADATA_PATHS).
+    """
+    text, meta_sql, meta_params = split_meta_filters((term or "").strip(), meta_paths)
+    expr = match_expression(text) if fts else ""
+    if expr and meta_sql:
+        # Let the MATCH drive: probing FTS once per row of a broad metadata index is far slower
+        _, meta_sql, meta_params = split_meta_filters(term.strip(), meta_paths, use_index=False)
+    term = text
+    category_sql, category_params = category_condition(categories)
+    filter_sql = " AND ".join(filter(None, (category_sql, meta_sql)))
+    filter_params = category_params + meta_params
+    if expr:
+        from_sql = f"FROM {FTS_TABLE} JOIN ac_icons ON ac_icons.rowid = {FTS_TABLE}.rowid"
+        where_sql = " AND ".join(filter(None, (f"{FTS_TABLE} MATCH ?", filter_sql)))
+        return (from_sql, where_sql, (expr,) + filter_params,
+                (f"{FTS_TABLE}.rank", "ac_icons.icon_id"))
+    if term:
+        where_sql = ("(ac_icons.icon_id LIKE ? OR ac_icons.name LIKE ? "
+                     "OR ac_icons.category LIKE ? OR ac_icons.keywords LIKE ?)")
+        where_sql = " AND ".join(filter(None, (where_sql, filter_sql)))
+        return "FROM ac_icons", where_sql, (f"%{term}%",) * 4 + filter_params, ("ac_icons.icon_id",)
+    return "FROM ac_icons", filter_sql, filter_params, ("ac_icons.icon_id",)
+
+
+def where_clause(*conditions):
+    """Join the non-empty SQL conditions into a WHERE clause ("" if none)."""
+    conditions = [c for c in conditions if c]
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def select_matches(columns, term, fts=True, categories=(), meta_paths=None, blobs=True):
+    """Return (sql, params) selecting ac_icons `columns` for rows matching `term`."""
+    from_sql, where_sql, params, sort_keys = match_source(term, fts, categories, meta_paths)
+    cols = ", ".join(column_sql(c, blobs=blobs) for c in columns)
+    sql = f"SELECT {cols} {from_sql}{where_clause(where_sql)} ORDER BY {', '.join(sort_keys)}"
+    return sql, params
+
+
+def count_matches(term, fts=True, categories=(), meta_paths=None, stats=True):
+    """Return (sql, params) counting the rows select_matches() would return.
+
+    stats=False: there is no ac_icons_stats table to read the full count from.
+    """
+    text, meta_sql, _ = split_meta_filters(term, meta_paths)
+    if not text and not meta_sql and not categories and stats:
+        return COUNT_SQL, ()  # every icon: the trigger-maintained count, no scan
+    expr = match_expression(text) if fts else ""
+    if expr and not categories and not meta_sql:
+        return f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?", (expr,)
+    from_sql, where_sql, params, _ = match_source(term, fts, categories, meta_paths)
+    return f"SELECT COUNT(*) {from_sql}{where_clause(where_sql)}", params
@@ -0,0 +1,332 @@
+import argparse
+import io
+import json
+import re
+import select
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from icon_pager import KeysetPager
+from icon_repository import IconRepository
+from thumbnail_cache import content_hash
+
+# ==============================================
+# CUSTOMIZATION SETTINGS
+# ==============================================
+
+DB_PATH = "enhanced_icons.db"
+HOST = "127.0.0.1"           # local tools only; this server has no authentication
+PORT = 8765
+SERVER_WORKERS = 16          # request threads, each with its own SQLite read connection
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+MAX_ICON_SIZE = 512          # largest ?size= a resized PNG may be requested at
+RESIZE_CACHE_SIZE = 4096     # resized PNGs kept in memory
+KEEP_ALIVE_TIMEOUT = 5       # seconds an idle keep-alive connection may hold a worker...
+IDLE_POLL = 0.05             # ...unless another connection is waiting for one; checked this often
+
+SEARCH_COLUMNS = ("icon_id", "name", "category", "keywords")
+
+ENDPOINTS = (
+    "GET /search?q=&category=&page=&per_page=  same matching as the apps' search box",
+    "GET /categories                           [{name, icon_count}]",
+    "GET /icons/<icon_id>                      name, category, keywords, metadata_json",
+    "GET /icons/<icon_id>.png[?size=N]         the icon, raw or scaled to fit N x N",
+)
+
+_ICON_PATH_RE = re.compile(r"^/icons/([^/]+?)(\.png)?$")
+
+
+class ResizeCache:
+    """Thread-safe LRU of resized PNG bytes keyed by (content hash, size)."""
+
+    def __init__(self, max_entries=RESIZE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, blob):
+        with self._lock:
+            png = self._items.get(key)
+            if png is not None:
+                self._items.move_to_end(key)
+                return png
+        png = resize_png(blob, key[1])  # outside the lock; a duplicate resize is harmless
+        with self._lock:
+            self._items[key] = png
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return png
+
+
+def resize_png(blob, size):
+    """Scale a PNG to fit `size` x `size`; pixel art is enlarged without smoothing."""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(blob))
+    scale = min(size / img.width, size / img.height)
+    target = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    if img.mode not in ("RGBA", "RGB", "L", "LA"):
+        img = img.convert("RGBA")
+    resample = Image.Resampling.NEAREST if scale >= 1 else Image.Resampling.LANCZOS
+    out = io.BytesIO()
+    img.resize(target, resample).save(out, "PNG")
+    return out.getvalue()
+
+
+def _etag_matches(header, etag):
+    """If-None-Match uses weak comparison: W/"x" matches "x"."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+class IconRequestHandler(BaseHTTPRequestHandler):
+    """Read-only JSON/PNG endpoints over ac_icons (see ENDPOINTS).
+
+    Every 200 response carries a strong ETag derived from the content
+    hash, and a matching If-None-Match gets a 304 without a body.
+    """
+
+    protocol_version = "HTTP/1.1"
+    timeout = KEEP_ALIVE_TIMEOUT
+    server_version = "ACIcons/1.0"
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def handle(self):
+        """Serve requests on this connection until it closes or gives its worker up"""
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self.await_request():
+            self.handle_one_request()
+
+    def await_request(self):
+        """Wait for the client's next keep-alive request.
+
+        False (close the connection) after KEEP_ALIVE_TIMEOUT idle seconds,
+        or as soon as another connection is queued for a worker, so idle
+        keep-alive clients never starve new ones.
+        """
+        sock = self.connection
+        sock.settimeout(0)
+        try:
+            pipelined = self.rfile.peek(1)
+        finally:
+            sock.settimeout(self.timeout)
+        if pipelined:
+            return True
+        deadline = time.monotonic() + self.timeout
+        while not self.server.saturated():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if select.select([sock], [], [], min(IDLE_POLL, remaining))[0]:
+                return True
+        return False
+
+    def do_GET(self):
+        self._head_only = False
+        self.route()
+
+    def do_HEAD(self):
+        self._head_only = True
+        self.route()
+
+    def route(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path == "/search":
+                self.send_search(query)
+            elif url.path == "/categories":
+                self.send_json([{"name": n, "icon_count": c} for n, c in self.server.repo.categories()])
+            elif url.path == "/":
+                self.send_json({"endpoints": ENDPOINTS})
+            else:
+                match = _ICON_PATH_RE.match(url.path)
+                if not match:
+                    self.send_error_json(HTTPStatus.NOT_FOUND, "no such endpoint")
+                elif match.group(2):
+                    self.send_icon(unquote(match.group(1)), query)
+                else:
+                    self.send_record(unquote(match.group(1)))
+        except ValueError as e:  # bad parameters, unknown meta.<field> filters
+            self.send_error_json(HTTPStatus.BAD_REQUEST, str(e))
+        except sqlite3.Error as e:
+            self.log_error("%s: %s", url.path, e)
+            self.send_error_json(HTTPStatus.INTERNAL_SERVER_ERROR, f"database error: {e}")
+
+    # -- endpoints -----------------------------------------------------------
+
+    def send_search(self, query):
+        term = query.get("q", [""])[0].strip()
+        categories = tuple(query.get("category", ()))
+        page = _int_param(query, "page", 1, 1)
+        per_page = _int_param(query, "per_page", DEFAULT_PER_PAGE, 1, MAX_PER_PAGE)
+        repo = self.server.repo
+        pager = KeysetPager(SEARCH_COLUMNS, per_page, repo.has_blobs)
+        pager.set_query(term, repo.fts_enabled, categories, repo.metadata_fields, repo.has_stats)
+        reader = repo.reader()
+        total = pager.count(reader)
+        rows = pager.fetch_page(reader, page) if total and page <= pager.page_count(reader) else []
+        self.send_json({
+            "q": term, "categories": list(categories), "total": total, "page": page,
+            "pages": pager.page_count(reader) if total else 0, "per_page": per_page,
+            "icons": [dict(zip(SEARCH_COLUMNS, row), png=f"/icons/{quote(row[0])}.png") for row in rows],
+        })
+
+    def send_record(self, icon_id):
+        record = self.server.repo.get(icon_id)
+        if record is None:
+            return self.send_error_json(HTTPStatus.NOT_FOUND, f"icon {icon_id} not found")
+        try:
+            metadata = json.loads(record.metadata_json) if record.metadata_json else None
+        except json.JSONDecodeError:
+            metadata = record.metadata_json
+        self.send_json(dict(record._asdict(), metadata_json=metadata, png=f"/icons/{quote(icon_id)}.png"))
+
+    def send_icon(self, icon_id, query):
+        blob = self.server.repo.icon_data([icon_id]).get(icon_id)
+        if blob is None:
+            return self.send_error_json(HTTPStatus.NOT_FOUND, f"no image for icon {icon_id}")
+        digest = content_hash(blob)
+        if "size" not in query:
+            return self.send_body(blob, "image/png", f'"{digest}"')
+        size = _int_param(query, "size", None, 1, MAX_ICON_SIZE)
+        etag = f'"{digest}-{size}"'
+        if _etag_matches(self.headers.get("If-None-Match"), etag):  # skip the resize
+            return self.send_body(b"", "image/png", etag)
+        self.send_body(self.server.resized.get((digest, size), blob), "image/png", etag)
+
+    # -- responses -----------------------------------------------------------
+
+    def send_json(self, data, status=HTTPStatus.OK):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        etag = f'"{content_hash(body)}"' if status == HTTPStatus.OK else None
+        self.send_body(body, "application/json; charset=utf-8", etag, status)
+
+    def send_error_json(self, status, message):
+        self.send_json({"error": message}, status)
+
+    def send_body(self, body, content_type, etag=None, status=HTTPStatus.OK):
+        if etag and _etag_matches(self.headers.get("If-None-Match"), etag):
+            status, body = HTTPStatus.NOT_MODIFIED, b""
+        self.send_response(status)
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")  # always revalidate; 304s are cheap
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if self.server.saturated():  # let the queued connections have this worker
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and not self._head_only:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def _int_param(query, name, default, low, high=None):
+    values = query.get(name)
+    if not values:
+        if default is None:
+            raise ValueError(f"{name} is required")
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if value < low or (high is not None and value > high):
+        raise ValueError(f"{name} must be between {low} and {high}" if high else f"{name} must be >= {low}")
+    return value
+
+
+class IconHTTPServer(HTTPServer):
+    """HTTPServer whose connections run on a fixed thread pool.
+
+    Each pool thread reads through its own IconRepository.reader()
+    connection, so requests never share a SQLite connection, and WAL
+    lets them run alongside the apps' writes. A keep-alive connection
+    keeps its thread only while no other connection is waiting for one.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, repo, workers=SERVER_WORKERS, verbose=False):
+        super().__init__(address, IconRequestHandler)
+        self.repo = repo
+        self.verbose = verbose
+        self.resized = ResizeCache()
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="icon-http")
+        self._queued = 0
+        self._queued_lock = threading.Lock()
+
+    def saturated(self):
+        """True while accepted connections are waiting for a free worker."""
+        return self._queued > 0
+
+    def process_request(self, request, client_address):
+        with self._queued_lock:
+            self._queued += 1
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        with self._queued_lock:
+            self._queued -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def make_server(db_path=DB_PATH, host=HOST, port=PORT, workers=SERVER_WORKERS, verbose=False):
+    """Create (but don't start) a server for `db_path`; port 0 picks a free port.
+
+    The database is opened read-only, so serving it never migrates or writes it.
+    """
+    return IconHTTPServer((host, port), IconRepository(db_path, read_only=True), workers, verbose)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the icon database read-only over HTTP.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.db, args.host, args.port, args.workers, args.verbose)
+    print(f"Serving {args.db} on http://{server.server_address[0]}:{server.server_address[1]}/",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+from trigger_gates import gate, install_triggers
+
+# ==============================================
+# CACHED TABLE STATISTICS
+# ==============================================
+#
+# ac_icons_stats holds counters that would otherwise need a full scan,
+# such as the number of icons the apps show on startup. Triggers on
+# ac_icons keep them current, so reading one is a single primary-key lookup.
+
+STATS_TABLE = "ac_icons_stats"
+ICON_COUNT = "icons"
+
+_STATS_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+_STATS_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS {STATS_TABLE}_ai AFTER INSERT ON ac_icons WHEN {gate(STATS_TABLE)} BEGIN
+    UPDATE {STATS_TABLE} SET value = value + 1 WHERE name = '{ICON_COUNT}';
+END;
+CREATE TRIGGER IF NOT EXISTS {STATS_TABLE}_ad AFTER DELETE ON ac_icons WHEN {gate(STATS_TABLE)} BEGIN
+    UPDATE {STATS_TABLE} SET value = value - 1 WHERE name = '{ICON_COUNT}';
+END;
+"""
+
+# Reads the cached icon count; same shape as a SELECT COUNT(*) over ac_icons
+COUNT_SQL = f"SELECT value FROM {STATS_TABLE} WHERE name = '{ICON_COUNT}'"
+
+
+def ensure_stats(conn):
+    """Create the stats table and triggers, counting existing rows once."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (STATS_TABLE,)
+    ).fetchone()
+    conn.executescript(_STATS_SCHEMA)
+    install_triggers(conn, STATS_TABLE, _STATS_TRIGGERS)
+    if not exists:
+        rebuild_stats(conn)
+
+
+def has_stats(conn):
+    """True if the stats table exists (without creating it)."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (STATS_TABLE,)).fetchone() is not None
+
+
+def rebuild_stats(conn):
+    """Recount from scratch (after bulk imports with triggers off)."""
+    with conn:
+        conn.execute(f"INSERT OR REPLACE INTO {STATS_TABLE}(name, value) "
+                     f"SELECT '{ICON_COUNT}', COUNT(*) FROM ac_icons")
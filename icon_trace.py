@@ -0,0 +1,158 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# ==============================================
+# HOT-PATH TRACING
+# ==============================================
+#
+# Set AC_ICONS_TRACE=trace.json to record every span and write a Chrome
+# trace (open it in chrome://tracing or Perfetto) when the app exits.
+# With tracing off, span() hands back one shared no-op object.
+
+TRACE_ENV = "AC_ICONS_TRACE"
+STATS_WINDOW = 200        # samples per span name kept for p50/p95
+MAX_TRACE_EVENTS = 200_000
+
+# How span names roll up into the status-bar readout
+READOUT_GROUPS = (
+    ("sql", ("seek", "query", "fetch")),
+    ("decode", ("atlas", "sidecar", "decode", "composite")),
+    ("photo", ("photo",)),
+    ("tk", ("tk",)),
+)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Tracer:
+    """Collects span timings, rolling percentiles and optional trace events."""
+
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.enabled = bool(trace_path)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._events = deque(maxlen=MAX_TRACE_EVENTS)
+        self._samples = defaultdict(lambda: deque(maxlen=STATS_WINDOW))
+        if trace_path:
+            atexit.register(self.write_trace)
+
+    def set_enabled(self, enabled):
+        """Turn span collection on or off (always on while writing a trace file)."""
+        self.enabled = enabled or bool(self.trace_path)
+
+    def span(self, name):
+        """Context manager timing one step; free when tracing is off."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    @contextmanager
+    def collect(self):
+        """Sum the spans this thread records inside the block into a {name: ms} dict."""
+        frame = {}
+        outer = getattr(self._local, "frame", None)
+        self._local.frame = frame
+        try:
+            yield frame
+        finally:
+            self._local.frame = outer
+            if outer is not None:
+                for name, ms in frame.items():
+                    outer[name] = outer.get(name, 0.0) + ms
+
+    def record(self, name, start, end):
+        ms = (end - start) * 1000
+        frame = getattr(self._local, "frame", None)
+        if frame is not None:
+            frame[name] = frame.get(name, 0.0) + ms
+        with self._lock:
+            self._samples[name].append(ms)
+            if self.trace_path:
+                self._events.append((name, start, end, threading.get_ident()))
+
+    def add_sample(self, name, ms):
+        """Feed a derived value (e.g. a whole page) into the rolling stats."""
+        with self._lock:
+            self._samples[name].append(ms)
+
+    def percentiles(self, name):
+        """Return (p50, p95) in ms over the last STATS_WINDOW samples, or None."""
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if not samples:
+            return None
+        pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+        return pick(0.50), pick(0.95)
+
+    def write_trace(self):
+        """Write the recorded spans as Chrome trace JSON."""
+        if not self.trace_path:
+            return
+        with self._lock:
+            events = list(self._events)
+        pid = os.getpid()
+        with open(self.trace_path, "w") as f:
+            json.dump({"traceEvents": [
+                {"name": name, "ph": "X", "pid": pid, "tid": tid,
+                 "ts": round(start * 1e6, 1), "dur": round((end - start) * 1e6, 1)}
+                for name, start, end, tid in events
+            ], "displayTimeUnit": "ms"}, f)
+
+
+def format_readout(label, frame):
+    """'page 12: sql 4ms, decode 31ms, tk 9ms | p50/p95 40/62ms' for the status bar."""
+    parts = []
+    for group, names in READOUT_GROUPS:
+        ms = sum(frame.get(n, 0.0) for n in names)
+        if ms:
+            parts.append(f"{group} {ms:.0f}ms")
+    text = f"{label}: {', '.join(parts) or 'cached'}"
+    stats = tracer.percentiles("page")
+    if stats:
+        text += f" | p50/p95 {stats[0]:.0f}/{stats[1]:.0f}ms"
+    return text
+
+
+tracer = Tracer(os.environ.get(TRACE_ENV) or None)
+span = tracer.span
+
+
+def report_first_paint(started):
+    """Record the time from `started` (a perf_counter() value) to now as a
+    'first_paint' span and return it in ms."""
+    end = time.perf_counter()
+    tracer.record("first_paint", started, end)
+    return (end - started) * 1000
@@ -0,0 +1,369 @@
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache
+
+from category_facets import FACET_TABLE, rebuild_facets
+from change_journal import JOURNAL_TABLE
+from icon_blobs import is_packed
+from icon_repository import IconRepository
+from icon_search import FTS_TABLE, rebuild_search_index
+from icon_stats import STATS_TABLE, rebuild_stats
+from thumbnail_cache import content_hash
+from trigger_gates import suspended
+
+# ==============================================
+# CUSTOMIZATION SETTINGS
+# ==============================================
+
+DB_PATH = "enhanced_icons.db"
+CSV_PATH = os.path.join("source", "weenies_all_icons_hex_latest.csv")
+IMAGE_EXTENSIONS = (".png", ".bmp", ".gif", ".tga")
+MAX_ICON_SIZE = 256          # larger images are rejected as not being icons
+IMPORT_BATCH = 1000          # icons per write transaction
+PARALLEL_THRESHOLD = 200     # below this many changed icons in a batch, normalize in-process
+STATE_TABLE = "ac_icons_import"            # per icon: hashes of what was last imported
+SOURCES_TABLE = "ac_icons_import_sources"  # hash of the last imported CSV
+REBUILD_PENDING = "rebuild"  # SOURCES_TABLE row present while derived tables are out of date
+
+# Accepted CSV header names (compared lowercased, without spaces/underscores)
+CSV_ICON_COLUMNS = ("icon", "iconid", "iconhex", "icondid")
+CSV_NAME_COLUMNS = ("name", "weeniename")
+CSV_WCID_COLUMNS = ("wcid", "weenieclassid", "classid", "id")
+CSV_TYPE_COLUMNS = ("weenietype", "type", "weenieclass")
+
+# Derived data that is rebuilt after an import instead of being maintained row
+# by row. The journal is paused too: imported icons are not local edits.
+# Only the importer's own writes skip these triggers (see trigger_gates).
+SUSPENDED_TRIGGERS = (FTS_TABLE, JOURNAL_TABLE, FACET_TABLE, STATS_TABLE)
+
+ICONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ac_icons (
+    icon_id TEXT PRIMARY KEY,
+    name TEXT,
+    category TEXT,
+    keywords TEXT,
+    metadata_json TEXT,
+    icon_data BLOB
+)
+"""
+
+_STATE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+    icon_id TEXT PRIMARY KEY,
+    source_hash TEXT,
+    meta_hash TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS {SOURCES_TABLE} (
+    name TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Curated names are kept; imported metadata keys are merged into the existing object
+_UPSERT_SQL = """
+INSERT INTO ac_icons(icon_id, name, metadata_json, icon_data) VALUES (?, ?, ?, ?)
+ON CONFLICT(icon_id) DO UPDATE SET
+    name = coalesce(nullif(trim(ac_icons.name), ''), excluded.name),
+    metadata_json = CASE WHEN json_valid(ac_icons.metadata_json)
+                         THEN json_patch(ac_icons.metadata_json, excluded.metadata_json)
+                         ELSE excluded.metadata_json END,
+    icon_data = coalesce(excluded.icon_data, ac_icons.icon_data)
+"""
+
+_ICON_ID_RE = re.compile(r"(?:0x)?([0-9a-f]{8})(?![0-9a-f])", re.IGNORECASE)
+
+# One icon to write: blob is None when only the CSV side changed
+_Change = namedtuple("_Change", "icon_id source_hash meta_hash name meta blob")
+
+
+def icon_id_from(value):
+    """'0x06001234', '06001234', '0x1234' -> '0x06001234' (None if not hex)."""
+    text = (value or "").strip().lower()
+    try:
+        number = int(text[2:] if text.startswith("0x") else text, 16)
+    except ValueError:
+        return None
+    if number < 0x01000000:  # bare index into the 0x06 icon range
+        number |= 0x06000000
+    return f"0x{number:08X}"
+
+
+def _column(header, candidates):
+    wanted = {c.lower() for c in candidates}
+    for name in header:
+        if re.sub(r"[\s_]", "", name.lower()) in wanted:
+            return name
+    return None
+
+
+def read_weenies(path):
+    """Return {icon_id: (name, sorted wcids, weenie type)} from the weenie CSV.
+
+    Icons used by several weenies get the most common name and type among them.
+    """
+    names, wcids, types = defaultdict(Counter), defaultdict(set), defaultdict(Counter)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        header = reader.fieldnames or []
+        icon_col = _column(header, CSV_ICON_COLUMNS)
+        if icon_col is None:
+            raise ValueError(f"{path}: no icon column (expected one of {', '.join(CSV_ICON_COLUMNS)})")
+        name_col = _column(header, CSV_NAME_COLUMNS)
+        wcid_col = _column(header, CSV_WCID_COLUMNS)
+        type_col = _column(header, CSV_TYPE_COLUMNS)
+        for row in reader:
+            icon_id = icon_id_from(row.get(icon_col))
+            if icon_id is None:
+                continue
+            if name_col and (row.get(name_col) or "").strip():
+                names[icon_id][row[name_col].strip()] += 1
+            if wcid_col and (row.get(wcid_col) or "").strip().isdigit():
+                wcids[icon_id].add(int(row[wcid_col]))
+            if type_col and (row.get(type_col) or "").strip().isdigit():
+                types[icon_id][int(row[type_col])] += 1
+    icons = set(names) | set(wcids) | set(types)
+    return {icon_id: (names[icon_id].most_common(1)[0][0] if names[icon_id] else None,
+                      sorted(wcids[icon_id]),
+                      types[icon_id].most_common(1)[0][0] if types[icon_id] else None)
+            for icon_id in icons}
+
+
+def scan_images(folder):
+    """Yield (icon_id, path) for every icon image under `folder`, in a stable order."""
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            stem, ext = os.path.splitext(name)
+            match = _ICON_ID_RE.search(stem)
+            if ext.lower() in IMAGE_EXTENSIONS and match:
+                yield icon_id_from(match.group(1)), os.path.join(root, name)
+
+
+def normalize_icon(blob):
+    """Validate an exported image and re-encode it as a plain PNG.
+
+    Returns (png, width, height, error); blob None (nothing to decode) gives all Nones.
+    """
+    if blob is None:
+        return None, None, None, None
+    from PIL import Image
+    try:
+        img = Image.open(io.BytesIO(blob))
+        img.load()
+    except Exception as e:
+        return None, None, None, f"not a readable image ({type(e).__name__})"
+    if not (0 < img.width <= MAX_ICON_SIZE and 0 < img.height <= MAX_ICON_SIZE):
+        return None, None, None, f"{img.width}x{img.height} is not an icon size"
+    if img.mode not in ("RGBA", "RGB", "L", "LA", "P") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+    out = io.BytesIO()
+    img.save(out, "PNG", optimize=True)  # drops text chunks and other ancillary data
+    return out.getvalue(), img.width, img.height, None
+
+
+def _weenie_meta(weenie):
+    """(name, metadata dict) taken from a read_weenies() entry."""
+    if weenie is None:
+        return None, {}
+    name, wcids, weenie_type = weenie
+    meta = {"wcids": wcids} if wcids else {}
+    if weenie_type is not None:
+        meta["weenie_class"] = weenie_type
+    return name, meta
+
+
+def _meta_hash(name, meta):
+    return content_hash(json.dumps([name, meta], sort_keys=True).encode())
+
+
+def find_changes(repo, folder, weenies, csv_changed, rejected):
+    """Yield a _Change for every icon whose image or CSV data differs from the last import.
+
+    `weenies()` returns the read_weenies() dict; it is only called when an
+    image or the CSV changed. Unchanged icons cost one file read and a
+    SHA-1. Files that can't be read are added to `rejected` as (path, reason).
+    """
+    reader = repo.reader()
+    state = {icon_id: (source, meta) for icon_id, source, meta in
+             reader.execute(f"SELECT icon_id, source_hash, meta_hash FROM {STATE_TABLE}")}
+    seen = set()
+    for icon_id, path in scan_images(folder):
+        if icon_id in seen:
+            rejected.append((path, f"duplicate image for {icon_id}"))
+            continue
+        seen.add(icon_id)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+        except OSError as e:
+            rejected.append((path, str(e)))
+            continue
+        source = content_hash(blob)
+        old = state.get(icon_id)
+        if old is not None and old[0] == source and not csv_changed:
+            continue
+        name, meta = _weenie_meta(weenies().get(icon_id))
+        meta_hash = _meta_hash(name, meta)
+        if old == (source, meta_hash):
+            continue
+        yield _Change(icon_id, source, meta_hash, name, meta,
+                      blob if old is None or old[0] != source else None)
+    if not csv_changed:
+        return
+    # CSV rows for icons that are in the DB but not in this export
+    existing = {row[0] for row in reader.execute("SELECT icon_id FROM ac_icons")}
+    for icon_id in sorted(set(weenies()) - seen):
+        if icon_id not in existing:
+            continue
+        name, meta = _weenie_meta(weenies()[icon_id])
+        meta_hash = _meta_hash(name, meta)
+        old = state.get(icon_id)
+        if old is None or old[1] != meta_hash:
+            yield _Change(icon_id, old[0] if old else None, meta_hash, name, meta, None)
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write(repo, batch, results, rejected):
+    """Upsert one batch and record what was imported; returns the number of icons written."""
+    rows, state = [], []
+    for change, (png, width, height, error) in zip(batch, results):
+        if error:
+            rejected.append((change.icon_id, error))
+            continue
+        meta = dict(change.meta)
+        if png is not None:
+            meta["size"] = max(width, height)
+        rows.append((change.icon_id, change.name, json.dumps(meta), png))
+        state.append((change.icon_id, change.source_hash, change.meta_hash))
+    if not rows:  # every icon rejected: nothing for the derived tables to catch up on
+        return 0
+    with repo.writer() as conn, suspended(conn, SUSPENDED_TRIGGERS):
+        conn.executemany(_UPSERT_SQL, rows)
+        conn.executemany(f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?, ?)", state)
+        # Committed with the rows, so an interrupted import is repaired by the next run
+        conn.execute(f"INSERT OR REPLACE INTO {SOURCES_TABLE} VALUES (?, '')", (REBUILD_PENDING,))
+    return len(rows)
+
+
+def rebuild_pending(repo):
+    return repo.reader().execute(
+        f"SELECT 1 FROM {SOURCES_TABLE} WHERE name = ?", (REBUILD_PENDING,)).fetchone() is not None
+
+
+def rebuild_derived(repo, workers=None):
+    """Rebuild what the import's triggers skipped, then clear the pending marker."""
+    for rebuild in (rebuild_search_index, rebuild_facets, rebuild_stats):
+        repo.migrate(rebuild)
+    if is_packed(repo.reader()):
+        from pack_icons import pack  # imports this module
+        pack(repo, workers)
+    with repo.writer() as conn:
+        conn.execute(f"DELETE FROM {SOURCES_TABLE} WHERE name = ?", (REBUILD_PENDING,))
+
+
+def run_import(repo, folder, csv_path=None, workers=None, progress=None):
+    """Import an exported icon folder (and the weenie CSV) into `repo`.
+
+    Images are validated and normalized in a process pool while the
+    previous batch is being written. The search index, facet counts and
+    icon count are rebuilt once at the end if any batch was committed
+    (including by an earlier run that was interrupted), and new images are
+    moved into icon_blobs if the database has been packed.
+    Returns a summary dict.
+    """
+    start = time.perf_counter()
+    repo.migrate(lambda conn: conn.executescript(_STATE_SCHEMA))
+    csv_hash = None
+    if csv_path:
+        with open(csv_path, "rb") as f:
+            csv_hash = content_hash(f.read())
+    last = repo.reader().execute(
+        f"SELECT content_hash FROM {SOURCES_TABLE} WHERE name='csv'").fetchone()
+    csv_changed = csv_hash is not None and (last is None or last[0] != csv_hash)
+    weenies = lru_cache(maxsize=None)(lambda: read_weenies(csv_path) if csv_path else {})
+    rejected = []
+    written = 0
+    try:
+        changes = find_changes(repo, folder, weenies, csv_changed, rejected)
+        written = _import_batches(repo, changes, workers, rejected, progress)
+        if csv_changed:
+            with repo.writer() as conn:
+                conn.execute(f"INSERT OR REPLACE INTO {SOURCES_TABLE} VALUES ('csv', ?)", (csv_hash,))
+    finally:
+        if rebuild_pending(repo):
+            rebuild_derived(repo, workers)
+    return {"written": written, "rejected": rejected, "csv_changed": csv_changed,
+            "seconds": round(time.perf_counter() - start, 2)}
+
+
+def _import_batches(repo, changes, workers, rejected, progress):
+    written = 0
+    with ExitStack() as stack:
+        pool = None
+        pending = None
+        for batch in _batches(changes, IMPORT_BATCH):
+            blobs = [change.blob for change in batch]
+            if pool is None and sum(b is not None for b in blobs) >= PARALLEL_THRESHOLD:
+                pool = stack.enter_context(ProcessPoolExecutor(workers))
+            results = pool.map(normalize_icon, blobs, chunksize=32) if pool else map(normalize_icon, blobs)
+            if pending:
+                written += _write(repo, *pending, rejected)
+                if progress:
+                    progress(written)
+            pending = (batch, results)
+        if pending:
+            written += _write(repo, *pending, rejected)
+            if progress:
+                progress(written)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Import exported icon images and the weenie CSV into the icon database.")
+    parser.add_argument("images", help="folder of exported icons (file names contain the hex icon id)")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--csv", default=CSV_PATH, help="weenie CSV ('' to skip)")
+    parser.add_argument("--workers", type=int, help="normalizing processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    csv_path = args.csv if args.csv and os.path.exists(args.csv) else None
+    if args.csv and not csv_path:
+        print(f"{args.csv} not found, importing images only", file=sys.stderr)
+    conn = sqlite3.connect(args.db)  # a new database starts from the bare table
+    conn.execute(ICONS_SCHEMA)
+    conn.close()
+    repo = IconRepository(args.db)
+    try:
+        summary = run_import(repo, args.images, csv_path, args.workers,
+                             progress=lambda n: print(f"\rwritten {n}", end="", file=sys.stderr))
+    finally:
+        repo.close()
+    for what, reason in summary["rejected"]:
+        print(f"\nskipped {what}: {reason}", end="", file=sys.stderr)
+    print(f"\n{summary['written']} icon(s) imported or updated, {len(summary['rejected'])} skipped "
+          f"in {summary['seconds']}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
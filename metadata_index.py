@@ -0,0 +1,107 @@
+import re
+
+# ==============================================
+# INDEXED metadata_json FIELDS
+# ==============================================
+#
+# Each entry becomes a virtual generated column meta_<name> on ac_icons
+# (computed from metadata_json by JSON1, nothing extra stored per row)
+# with an index on it. Add, change or remove entries here and the next
+# start migrates the database. Search with e.g. "meta.size:32",
+# "meta.weenie_class>=10" or "sword meta.size<64".
+
+METADATA_PATHS = {
+    "size": "$.size",
+    "weenie_class": "$.weenie_class",
+}
+
+COLUMN_PREFIX = "meta_"
+PATHS_TABLE = "ac_icons_meta_paths"  # what is currently built, to detect changed declarations
+
+_NAME_RE = re.compile(r"^\w+$")
+_FILTER_RE = re.compile(r'(?<!\S)meta\.(\w+)(!=|>=|<=|:|=|>|<)("[^"]*"|\S+)')
+_OPERATORS = {":": "=", "=": "=", "!=": "!=", ">=": ">=", "<=": "<=", ">": ">", "<": "<"}
+
+
+def column_name(name):
+    return COLUMN_PREFIX + name
+
+
+def _index_name(name):
+    return f"ac_icons_{column_name(name)}"
+
+
+def ensure_metadata_columns(conn, paths=None):
+    """Bring the generated meta_* columns and their indexes in line with `paths`.
+
+    Returns the {name: path} dict now available for meta.<name> filters.
+    """
+    paths = METADATA_PATHS if paths is None else paths
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {PATHS_TABLE} (name TEXT PRIMARY KEY, path TEXT NOT NULL)")
+    built = dict(conn.execute(f"SELECT name, path FROM {PATHS_TABLE}"))
+    columns = {row[1] for row in conn.execute("PRAGMA table_xinfo(ac_icons)")}
+    with conn:
+        for name in set(built) - set(paths) | {n for n in built if n in paths and built[n] != paths[n]}:
+            conn.execute(f"DROP INDEX IF EXISTS {_index_name(name)}")
+            if column_name(name) in columns:
+                conn.execute(f"ALTER TABLE ac_icons DROP COLUMN {column_name(name)}")
+                columns.discard(column_name(name))
+            conn.execute(f"DELETE FROM {PATHS_TABLE} WHERE name=?", (name,))
+        for name, path in paths.items():
+            if not _NAME_RE.match(name):
+                raise ValueError(f"Bad metadata field name: {name!r}")
+            if column_name(name) not in columns:
+                conn.execute(
+                    f"ALTER TABLE ac_icons ADD COLUMN {column_name(name)} GENERATED ALWAYS AS "
+                    f"(CASE WHEN json_valid(metadata_json) THEN json_extract(metadata_json, "
+                    f"'{path.replace(chr(39), chr(39) * 2)}') END) VIRTUAL")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {_index_name(name)} "
+                         f"ON ac_icons({column_name(name)}, icon_id)")
+            conn.execute(f"INSERT OR REPLACE INTO {PATHS_TABLE}(name, path) VALUES (?, ?)", (name, path))
+    return dict(paths)
+
+
+def metadata_columns(conn):
+    """The {name: path} meta_* columns already built (without migrating anything)."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (PATHS_TABLE,)).fetchone():
+        return {}
+    return dict(conn.execute(f"SELECT name, path FROM {PATHS_TABLE}"))
+
+
+def has_meta_filters(term):
+    return bool(_FILTER_RE.search(term or ""))
+
+
+def _value(text):
+    if text.startswith('"') and text.endswith('"') and len(text) >= 2:
+        return text[1:-1]
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def split_meta_filters(term, paths=None, use_index=True):
+    """Pull meta.<name><op><value> filters out of a search term.
+
+    Returns (remaining_text, where_sql, params); where_sql is "" when the
+    term has no filters. Raises ValueError for a field not in `paths`.
+    With use_index=False the columns are written as +column so SQLite
+    won't drive the query from their index (when FTS should drive it).
+    """
+    paths = METADATA_PATHS if paths is None else paths
+    conditions, params = [], []
+
+    def take(match):
+        name, op, value = match.groups()
+        if name not in paths:
+            known = ", ".join(sorted(paths)) or "none"
+            raise ValueError(f"Unknown metadata field '{name}' (indexed fields: {known})")
+        conditions.append(f"{'' if use_index else '+'}ac_icons.{column_name(name)} {_OPERATORS[op]} ?")
+        params.append(_value(value))
+        return " "
+
+    text = _FILTER_RE.sub(take, term or "")
+    return " ".join(text.split()), " AND ".join(conditions), tuple(params)
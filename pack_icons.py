@@ -0,0 +1,270 @@
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from change_journal import JOURNAL_TABLE
+from icon_blobs import BLOB_TABLE, HASH_COLUMN, icon_data_sql
+from icon_changes import VERSIONS_TABLE
+from icon_repository import IconRepository
+from similarity_index import HASH_TABLE, ensure_hash_table
+from thumbnail_cache import content_hash
+from trigger_gates import suspended
+
+# ==============================================
+# CUSTOMIZATION SETTINGS
+# ==============================================
+
+DB_PATH = "enhanced_icons.db"
+PACK_BATCH = 1000            # icons per write transaction
+PARALLEL_THRESHOLD = 200     # below this many icons in a batch, recompress in-process
+SCAN_REPEAT = 3              # timed runs per scan in the report (the median is shown)
+
+# Packing keeps every pixel, so nothing that watches icon_data should fire:
+# it is not an edit to journal, open views have nothing to redraw, and the
+# perceptual hashes stay valid (their content_hash is updated in place).
+# Edits saved meanwhile by open apps still fire them (see trigger_gates).
+SUSPENDED_TRIGGERS = (JOURNAL_TABLE, VERSIONS_TABLE, HASH_TABLE)
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_LOSSLESS_MODES = ("1", "L", "LA", "P", "RGB", "RGBA")
+
+
+def _encode(img, **params):
+    out = io.BytesIO()
+    img.save(out, "PNG", optimize=True, **params)
+    return out.getvalue()
+
+
+def _exact_palette(rgba):
+    """An exact "P" image (palette plus per-entry alpha) for <= 256 colours, else None."""
+    import numpy as np
+    from PIL import Image
+
+    flat = np.ascontiguousarray(np.asarray(rgba)).view(np.uint32).reshape(-1)
+    colors, index = np.unique(flat, return_inverse=True)
+    if len(colors) > 256:
+        return None, None
+    entries = colors.view(np.uint8).reshape(-1, 4)
+    # Translucent entries first, so the tRNS chunk can stop at the last of them
+    order = np.argsort(entries[:, 3] == 255, kind="stable")
+    entries = entries[order]
+    index = np.argsort(order)[index].astype(np.uint8)
+    img = Image.fromarray(index.reshape(rgba.height, rgba.width), "P")
+    img.putpalette(entries[:, :3].tobytes())
+    translucent = int((entries[:, 3] < 255).sum())
+    return img, bytes(entries[:translucent, 3]) if translucent else None
+
+
+def smallest_png(blob):
+    """Return the smallest lossless PNG encoding of `blob` (the blob itself if nothing beats it).
+
+    Tries an optimized re-encode, RGB when every pixel is opaque, L/LA when
+    the image is grey, and an exact palette when it has at most 256 colours.
+    A candidate is only used if it decodes to exactly the same RGBA pixels.
+    Non-PNG and 16-bit images are returned unchanged.
+    """
+    if not blob or not blob.startswith(_PNG_SIGNATURE) or blob[24] == 16:
+        return blob
+    import numpy as np
+    from PIL import Image
+
+    try:
+        img = Image.open(io.BytesIO(blob))
+        img.load()
+    except Exception:
+        return blob
+    if img.mode not in _LOSSLESS_MODES:
+        return blob
+    rgba = img.convert("RGBA")
+    pixels = np.asarray(rgba)
+    candidates = [lambda: _encode(img, **({"transparency": img.info["transparency"]}
+                                          if "transparency" in img.info else {}))]
+    opaque = bool((pixels[..., 3] == 255).all())
+    grey = bool((pixels[..., 0] == pixels[..., 1]).all() and (pixels[..., 1] == pixels[..., 2]).all())
+    candidates.append(lambda: _encode(rgba.convert("RGB") if opaque else rgba))
+    if grey:
+        candidates.append(lambda: _encode(rgba.convert("L") if opaque else rgba.convert("LA")))
+    palette, alpha = _exact_palette(rgba)
+    if palette is not None:
+        candidates.append(lambda: _encode(palette, **({"transparency": alpha} if alpha else {})))
+    best = blob
+    for candidate in candidates:
+        try:
+            png = candidate()
+        except Exception:
+            continue
+        if len(png) < len(best) and _same_pixels(png, rgba):
+            best = png
+    return best
+
+
+def _same_pixels(png, rgba):
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(png)).convert("RGBA")
+    return img.size == rgba.size and img.tobytes() == rgba.tobytes()
+
+
+def _pack_one(blob):
+    """Runs in the pool: the stored bytes for one distinct image and their hash."""
+    png = smallest_png(blob)
+    return content_hash(png), png
+
+
+def pack(repo, workers=None, recompress=True, progress=None):
+    """Move inline icon_data into icon_blobs, re-encoding each image losslessly first.
+
+    Only rows that still hold inline data are read, so running it again
+    after an import is cheap. Blobs no longer referenced are deleted.
+    Returns {"icons", "blobs_added", "bytes_before", "bytes_after"}.
+    """
+    reader = repo.reader()
+    has_hashes = reader.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (HASH_TABLE,)).fetchone()
+    if has_hashes:
+        repo.migrate(ensure_hash_table)  # so its triggers can be suspended
+    summary = {"icons": 0, "blobs_added": 0, "bytes_before": 0, "bytes_after": 0}
+    packed = {}  # original content hash -> (stored hash, stored size); duplicates are re-encoded once
+    pool = None
+    last = ""
+    try:
+        while True:
+            # One short read per batch (by icon_id), so the WAL can be checkpointed as we go
+            batch = reader.execute(
+                "SELECT icon_id, icon_data FROM ac_icons WHERE icon_id > ? AND icon_data IS NOT NULL "
+                "ORDER BY icon_id LIMIT ?", (last, PACK_BATCH)).fetchall()
+            if not batch:
+                break
+            last = batch[-1][0]
+            originals = [content_hash(blob) for _, blob in batch]
+            todo = {h: blob for h, (_, blob) in zip(originals, batch) if h not in packed}
+            if not recompress:
+                results = [(h, blob) for h, blob in todo.items()]
+            else:
+                if pool is None and len(todo) >= PARALLEL_THRESHOLD:
+                    pool = ProcessPoolExecutor(workers)
+                results = list(pool.map(_pack_one, todo.values(), chunksize=32) if pool
+                               else map(_pack_one, todo.values()))
+            for original, (h, png) in zip(todo, results):
+                packed[original] = (h, len(png))
+            rows = [(packed[h][0], icon_id) for h, (icon_id, _) in zip(originals, batch)]
+            with repo.writer() as conn, suspended(conn, SUSPENDED_TRIGGERS):
+                before = conn.total_changes
+                conn.executemany(f"INSERT OR IGNORE INTO {BLOB_TABLE}(hash, data) VALUES (?, ?)", results)
+                summary["blobs_added"] += conn.total_changes - before
+                conn.executemany(f"UPDATE ac_icons SET {HASH_COLUMN}=?, icon_data=NULL WHERE icon_id=?", rows)
+                if has_hashes:
+                    conn.executemany(f"UPDATE {HASH_TABLE} SET content_hash=? WHERE icon_id=?", rows)
+            summary["icons"] += len(batch)
+            summary["bytes_before"] += sum(len(blob) for _, blob in batch)
+            summary["bytes_after"] += sum(packed[h][1] for h in originals)
+            if progress:
+                progress(summary["icons"])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    with repo.writer() as conn:
+        conn.execute(f"DELETE FROM {BLOB_TABLE} WHERE hash NOT IN "
+                     f"(SELECT {HASH_COLUMN} FROM ac_icons WHERE {HASH_COLUMN} IS NOT NULL)")
+    return summary
+
+
+def unpack(repo):
+    """Copy every image back into ac_icons.icon_data and empty icon_blobs."""
+    with repo.writer() as conn, suspended(conn, SUSPENDED_TRIGGERS):
+        cur = conn.execute(f"UPDATE ac_icons SET icon_data = {icon_data_sql()}, {HASH_COLUMN} = NULL "
+                           f"WHERE {HASH_COLUMN} IS NOT NULL")
+        conn.execute(f"DELETE FROM {BLOB_TABLE}")
+    return cur.rowcount
+
+
+def vacuum(repo):
+    def run(conn):
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    repo.migrate(run)
+
+
+def _median_ms(conn, sql):
+    times = []
+    for _ in range(SCAN_REPEAT):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def measure(repo):
+    """File size, image bytes and scan timings for the before/after report."""
+    repo.migrate(lambda conn: conn.execute("PRAGMA wal_checkpoint(TRUNCATE)"))
+    conn = repo.reader()
+    inline, packed = conn.execute(
+        f"SELECT (SELECT ifnull(SUM(length(icon_data)), 0) FROM ac_icons), "
+        f"(SELECT ifnull(SUM(length(data)), 0) FROM {BLOB_TABLE})").fetchone()
+    icons, blobs = conn.execute(
+        f"SELECT (SELECT COUNT(*) FROM ac_icons), (SELECT COUNT(*) FROM {BLOB_TABLE})").fetchone()
+    return {
+        "file_bytes": os.path.getsize(repo.db_path),
+        "image_bytes": inline + packed,
+        "icons": icons,
+        "stored_images": conn.execute(
+            "SELECT COUNT(*) FROM ac_icons WHERE icon_data IS NOT NULL").fetchone()[0] + blobs,
+        # what the LIKE search and the editor's row list do: read every row's text
+        "text_scan_ms": _median_ms(conn, "SELECT COUNT(*) FROM ac_icons WHERE keywords LIKE '%zzz%'"),
+        "image_scan_ms": _median_ms(conn, f"SELECT length({icon_data_sql()}) FROM ac_icons"),
+    }
+
+
+def format_report(before, after):
+    def mb(n):
+        return f"{n / (1024 * 1024):.1f} MB"
+
+    rows = [
+        ("database file", mb(before["file_bytes"]), mb(after["file_bytes"])),
+        ("image bytes", mb(before["image_bytes"]), mb(after["image_bytes"])),
+        ("stored images", f"{before['stored_images']}", f"{after['stored_images']}"),
+        ("text scan", f"{before['text_scan_ms']:.1f} ms", f"{after['text_scan_ms']:.1f} ms"),
+        ("read all images", f"{before['image_scan_ms']:.1f} ms", f"{after['image_scan_ms']:.1f} ms"),
+    ]
+    width = max(len(r[0]) for r in rows)
+    lines = [f"{after['icons']} icons", f"{'':{width}}  {'before':>10}  {'after':>10}"]
+    lines += [f"{name:{width}}  {b:>10}  {a:>10}" for name, b, a in rows]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Store icon images once per distinct image, losslessly recompressed.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--workers", type=int, help="recompressing processes (default: one per CPU)")
+    parser.add_argument("--no-recompress", action="store_true", help="move images without re-encoding")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip VACUUM (the file keeps its size)")
+    parser.add_argument("--unpack", action="store_true", help="move images back into ac_icons")
+    args = parser.parse_args(argv)
+
+    repo = IconRepository(args.db)
+    try:
+        before = measure(repo)
+        start = time.perf_counter()
+        if args.unpack:
+            print(f"unpacked {unpack(repo)} icon(s)", file=sys.stderr)
+        else:
+            summary = pack(repo, args.workers, not args.no_recompress,
+                           progress=lambda n: print(f"\rpacked {n}", end="", file=sys.stderr))
+            saved = summary["bytes_before"] - summary["bytes_after"]
+            print(f"\rpacked {summary['icons']} icon(s) into {summary['blobs_added']} new blob(s); "
+                  f"re-encoding saved {saved / 1024:.0f} KB", file=sys.stderr)
+        if not args.no_vacuum:
+            vacuum(repo)
+        print(f"done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        print(format_report(before, measure(repo)))
+    finally:
+        repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+import argparse
+import math
+import os
+import sys
+import threading
+from bisect import bisect_left
+from concurrent.futures import Future
+
+from icon_changes import VERSIONS_TABLE, latest_change
+from icon_stats import COUNT_SQL
+from icon_trace import span
+from term_index import BUILD_BATCH, _prefix_end, tokenize
+
+# ==============================================
+# KEYWORD RELATEDNESS (BM25 TERM MATRIX)
+# ==============================================
+
+TOP_K = 50                 # related icons listed by "Related icons"
+FIELD_WEIGHTS = {"name": 2.0, "category": 1.0, "keywords": 1.0}  # term-frequency multiplier per column
+BM25_K1 = 1.2              # term-frequency saturation
+BM25_B = 0.75              # document-length normalisation
+MIN_TOKEN_LENGTH = 2       # shorter tokens (and pure numbers) carry no meaning here
+REBUILD_FRACTION = 0.05    # rebuild once this share of icons has been edited since the last build
+REBUILD_MIN_EDITS = 500
+SIDECAR_SUFFIX = ".related.npz"
+
+# Search box syntax for the two kinds of query this index answers
+RANKED_PREFIX = "~"           # "~fire sword": every icon sharing a term, best match first
+RELATED_PREFIX = "related:"   # "related:0x06001234": icons with the most similar terms
+
+_FORMAT = 1
+_PARAMS = f"{_FORMAT}|{sorted(FIELD_WEIGHTS.items())}|{BM25_K1}|{BM25_B}|{MIN_TOKEN_LENGTH}"
+_COLUMNS = tuple(FIELD_WEIGHTS)
+
+
+def parse_query(term):
+    """("related", icon_id), ("ranked", text), or None for an ordinary search."""
+    if term.lower().startswith(RELATED_PREFIX):
+        return "related", term[len(RELATED_PREFIX):].strip()
+    if term.startswith(RANKED_PREFIX):
+        return "ranked", term[len(RANKED_PREFIX):].strip()
+    return None
+
+
+def term_counts(name, category, keywords):
+    """{term: weighted count} for one icon, with FIELD_WEIGHTS applied."""
+    counts = {}
+    for text, weight in zip((name, category, keywords), FIELD_WEIGHTS.values()):
+        for token in tokenize(text):
+            if len(token) >= MIN_TOKEN_LENGTH and not token.isdigit():
+                counts[token] = counts.get(token, 0.0) + weight
+    return counts
+
+
+class RelatedIndex:
+    """Ranks icons by shared name/category/keyword terms.
+
+    Each icon is a sparse vector of BM25 term weights; the matrix is held
+    twice in CSR-style NumPy arrays: by term (the postings of each term,
+    for queries) and by icon (the terms of each icon, for "related to").
+    A query is then a handful of slice gathers and one np.bincount over
+    every icon, whatever the size of the table.
+
+    The arrays are saved to a sidecar file next to the database together
+    with the ac_icons_versions sequence they were built at. Opening the
+    index replays only the icons changed since then, and every query
+    first picks up new commits the same way. Re-indexed icons live in an
+    overlay that replaces their base row at query time (IDF and average
+    length stay those of the last build) until enough of them pile up to
+    make a rebuild worthwhile. With defer_rebuilds, queries never rebuild
+    in place; they set `stale` and the caller builds a new index off the
+    UI thread (see open_in_background()) while this one keeps answering.
+    """
+
+    def __init__(self, repo, path=None, rebuild=False, defer_rebuilds=False):
+        self.repo = repo
+        self.path = path or os.path.splitext(repo.db_path)[0] + SIDECAR_SUFFIX
+        self.defer_rebuilds = defer_rebuilds
+        self.stale = False
+        self._overlay = {}  # icon_id -> {term: weight} (None once deleted)
+        if rebuild or not self._load():
+            self.build()
+            self.save()
+        self.refresh(rebuild=True)
+
+    @classmethod
+    def open_in_background(cls, repo, rebuild=False):
+        """Open (or build) an index with deferred rebuilds on a daemon thread.
+
+        Returns a Future resolving to the index; the Tk side should poll
+        future.done() rather than be called back from the worker thread.
+        """
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(cls(repo, rebuild=rebuild, defer_rebuilds=True))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="related-index", daemon=True).start()
+        return future
+
+    # -- building and persistence -------------------------------------------
+
+    def build(self):
+        """Rebuild every array from ac_icons (a second or two per 100k icons)."""
+        import numpy as np
+
+        conn = self.repo.reader()
+        seq = latest_change(conn)  # read first: a commit racing the scan is replayed, never lost
+        cur = conn.execute(f"SELECT icon_id, {', '.join(_COLUMNS)} FROM ac_icons ORDER BY icon_id")
+        ids, docs, vocab = [], [], {}
+        with span("related_index"):
+            while True:
+                batch = cur.fetchmany(BUILD_BATCH)
+                if not batch:
+                    break
+                for row in batch:
+                    counts = term_counts(*row[1:])
+                    ids.append(row[0])
+                    docs.append(counts)
+                    for term in counts:
+                        vocab[term] = vocab.get(term, 0) + 1
+            terms = sorted(vocab)
+            column = {t: i for i, t in enumerate(terms)}
+            row_ptr = np.zeros(len(docs) + 1, dtype=np.int64)
+            np.cumsum([len(d) for d in docs], out=row_ptr[1:])
+            row_terms = np.fromiter((column[t] for d in docs for t in d), dtype=np.int32, count=int(row_ptr[-1]))
+            tf = np.fromiter((c for d in docs for c in d.values()), dtype=np.float32, count=int(row_ptr[-1]))
+            lengths = np.array([sum(d.values()) for d in docs], dtype=np.float32)
+            df = np.fromiter((vocab[t] for t in terms), dtype=np.float32, count=len(terms))
+            self._ids = ids
+            self._terms = terms
+            self._set_stats(len(ids), float(lengths.mean()) if len(ids) else 1.0)
+            self._idf = self._inverse_frequency(df)
+            doc_length = np.repeat(lengths, np.diff(row_ptr))
+            weights = self._bm25(tf, doc_length, self._idf[row_terms])
+            self._set_matrix(row_ptr, row_terms, weights)
+        self._overlay = {}
+        self.seq = seq
+        self.stale = False
+
+    def _set_stats(self, count, avg_length):
+        self._count = count
+        self._avg_length = avg_length
+
+    def _inverse_frequency(self, df):
+        import numpy as np
+        return np.log1p((self._count - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    def _bm25(self, tf, length, idf):
+        return idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / self._avg_length))
+
+    def _set_matrix(self, row_ptr, row_terms, row_weights):
+        """Keep the by-icon arrays and derive the by-term (transposed) ones."""
+        import numpy as np
+
+        self._row_ptr, self._row_terms, self._row_weights = row_ptr, row_terms, row_weights
+        docs = np.repeat(np.arange(len(row_ptr) - 1, dtype=np.int32), np.diff(row_ptr))
+        order = np.argsort(row_terms, kind="stable")
+        self._col_docs = docs[order]
+        self._col_weights = row_weights[order]
+        self._col_ptr = np.zeros(len(self._terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_terms, minlength=len(self._terms)), out=self._col_ptr[1:])
+        self._norms = np.sqrt(np.bincount(docs, weights=row_weights.astype(np.float64) ** 2,
+                                          minlength=len(row_ptr) - 1)).astype(np.float32)
+        self._id_array = np.array(self._ids, dtype=object)
+
+    def save(self):
+        """Write the arrays to the sidecar file (atomically, via a temporary file)."""
+        import numpy as np
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, params=np.array(_PARAMS), seq=np.array(self.seq, dtype=np.int64),
+                     stats=np.array([self._count, self._avg_length], dtype=np.float64),
+                     ids=np.array(self._ids, dtype=str), terms=np.array(self._terms, dtype=str),
+                     idf=self._idf, row_ptr=self._row_ptr, row_terms=self._row_terms,
+                     row_weights=self._row_weights)
+        os.replace(tmp, self.path)
+
+    def _load(self):
+        """Read the sidecar file; False if it is missing, unreadable or built with other settings."""
+        import numpy as np
+
+        try:
+            with np.load(self.path) as data:
+                if str(data["params"]) != _PARAMS:
+                    return False
+                count, avg_length = data["stats"]
+                self._set_stats(int(count), float(avg_length))
+                self._ids = data["ids"].tolist()
+                self._terms = data["terms"].tolist()
+                self._idf = data["idf"]
+                self.seq = int(data["seq"])
+                self._set_matrix(data["row_ptr"], data["row_terms"], data["row_weights"])
+        except (OSError, KeyError, ValueError):
+            return False
+        return True
+
+    # -- incremental updates -------------------------------------------------
+
+    def refresh(self, rebuild=None):
+        """Re-index the icons committed since the last build or refresh; returns how many.
+
+        Rebuilds (and saves) instead once REBUILD_FRACTION of the icons are
+        in the overlay, or if the database no longer matches the file at all
+        (e.g. it was replaced by another copy). If `rebuild` is false
+        (default: not defer_rebuilds) that only sets `stale`.
+        """
+        if rebuild is None:
+            rebuild = not self.defer_rebuilds
+        conn = self.repo.reader()
+        rows = conn.execute(
+            f"SELECT v.icon_id, v.seq, v.deleted, {', '.join('a.' + c for c in _COLUMNS)} "
+            f"FROM {VERSIONS_TABLE} v LEFT JOIN ac_icons a ON a.icon_id = v.icon_id "
+            f"WHERE v.seq > ? ORDER BY v.seq", (self.seq,)).fetchall()
+        replaced = latest_change(conn) < self.seq
+        for icon_id, seq, deleted, *text in rows:
+            self._overlay[icon_id] = None if deleted else self._weights(term_counts(*text))
+            self.seq = seq
+        # The trigger-kept icon count is one lookup, where COUNT(*) would scan the table per query
+        if replaced or len(self._overlay) > max(REBUILD_MIN_EDITS, REBUILD_FRACTION * len(self._ids)) \
+                or (rows and self.repo.has_stats and len(self) != conn.execute(COUNT_SQL).fetchone()[0]):
+            if rebuild:
+                self.build()
+                self.save()
+            else:
+                self.stale = True
+        return len(rows)
+
+    def _weights(self, counts):
+        """BM25 weights of an edited icon against the statistics of the last build."""
+        length = sum(counts.values())
+        weights = {}
+        for term, tf in counts.items():
+            i = self._column(term)
+            idf = float(self._idf[i]) if i is not None else math.log1p((self._count + 0.5) / 1.5)
+            weights[term] = float(self._bm25(tf, length, idf))
+        return weights
+
+    def _column(self, term):
+        i = bisect_left(self._terms, term)
+        return i if i < len(self._terms) and self._terms[i] == term else None
+
+    def _row(self, icon_id):
+        i = bisect_left(self._ids, icon_id)
+        return i if i < len(self._ids) and self._ids[i] == icon_id else None
+
+    def __len__(self):
+        base = sum(1 for i in self._overlay if self._row(i) is not None)
+        return len(self._ids) - base + sum(1 for w in self._overlay.values() if w is not None)
+
+    # -- queries -------------------------------------------------------------
+
+    def related(self, icon_id, k=TOP_K):
+        """Return [(icon_id, score)] for the k icons whose terms are most like `icon_id`'s.
+
+        Scores are cosine similarities of the BM25 vectors (0-1].
+        """
+        import numpy as np
+
+        self.refresh()
+        if icon_id in self._overlay:
+            weights = self._overlay[icon_id]
+            if weights is None:
+                return []
+        else:
+            i = self._row(icon_id)
+            if i is None:
+                return []
+            lo, hi = self._row_ptr[i], self._row_ptr[i + 1]
+            weights = dict(zip((self._terms[t] for t in self._row_terms[lo:hi]),
+                               self._row_weights[lo:hi].tolist()))
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        if not norm:
+            return []
+        with span("related_query"):
+            known = [(self._column(t), w) for t, w in weights.items()]
+            scores = self._scores([c for c, _ in known if c is not None],
+                                  [w for c, w in known if c is not None])
+            scores /= np.maximum(self._norms, 1e-12) * norm
+            extra = {}
+            for other, vector in self._overlay.items():
+                score = 0.0
+                if vector:
+                    dot = sum(w * vector.get(t, 0.0) for t, w in weights.items())
+                    score = dot / (math.sqrt(sum(w * w for w in vector.values())) * norm)
+                self._put(scores, extra, other, score)
+            self._put(scores, extra, icon_id, 0.0)
+            extra.pop(icon_id, None)  # an icon added since the build is not related to itself
+            return self._top(scores, extra, k)
+
+    def search(self, text, k=None):
+        """Return [(icon_id, score)] for every icon sharing a term with `text`, best first.
+
+        Each word of `text` matches as a prefix, like the search box, and an
+        icon's score is the sum of its BM25 weights for the matched terms:
+        icons matching more (and rarer) words rank higher.
+        """
+        self.refresh()
+        words = tokenize(text)
+        if not words:
+            return []
+        with span("related_query"):
+            columns = set()  # a term matched by two words still counts once
+            for word in words:
+                lo = bisect_left(self._terms, word)
+                columns.update(range(lo, bisect_left(self._terms, _prefix_end(word), lo)))
+            scores = self._scores(sorted(columns), [1.0] * len(columns))
+            extra = {}
+            for other, vector in self._overlay.items():
+                score = sum(w for t, w in (vector or {}).items() if any(t.startswith(p) for p in words))
+                self._put(scores, extra, other, score)
+            return self._top(scores, extra, k)
+
+    def _scores(self, columns, weights):
+        """Per-icon sum of query weight x matrix weight over `columns` (a sparse dot product)."""
+        import numpy as np
+
+        scores = np.zeros(len(self._ids), dtype=np.float64)
+        if not columns:
+            return scores
+        columns = np.asarray(columns, dtype=np.int64)
+        starts, ends = self._col_ptr[columns], self._col_ptr[columns + 1]
+        sizes = ends - starts
+        if not sizes.sum():
+            return scores
+        # One index array covering every column's slice, built without a Python loop
+        offsets = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+        values = self._col_weights[offsets] * np.repeat(np.asarray(weights, dtype=np.float32), sizes)
+        scores += np.bincount(self._col_docs[offsets], weights=values, minlength=len(self._ids))
+        return scores
+
+    def _put(self, scores, extra, icon_id, score):
+        """Override a base icon's score (or record one for an icon added since the build)."""
+        i = self._row(icon_id)
+        if i is not None:
+            scores[i] = score
+        elif score > 0:
+            extra[icon_id] = score
+
+    def _top(self, scores, extra, k):
+        import numpy as np
+
+        hits = np.flatnonzero(scores > 0)
+        if k is not None and len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        result = list(zip(self._id_array[hits].tolist(), scores[hits].tolist())) + list(extra.items())
+        result.sort(key=lambda item: (-item[1], item[0]))
+        return result[:k] if k is not None else result
+
+
+def main(argv=None):
+    from icon_repository import IconRepository
+
+    parser = argparse.ArgumentParser(description="Build the keyword relatedness index or query it.")
+    parser.add_argument("--db", default="enhanced_icons.db")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild even if the saved index is current")
+    parser.add_argument("--related", metavar="ICON_ID", help="print the icons whose keywords are closest")
+    parser.add_argument("--search", metavar="TEXT", help="print icons ranked by these words")
+    parser.add_argument("-k", type=int, default=TOP_K)
+    args = parser.parse_args(argv)
+
+    repo = IconRepository(args.db)
+    try:
+        index = RelatedIndex(repo)
+        if args.rebuild:
+            index.build()
+            index.save()
+        print(f"{len(index)} icon(s), {len(index._terms)} term(s) in {index.path}", file=sys.stderr)
+        matches = (index.related(args.related, args.k) if args.related
+                   else index.search(args.search, args.k) if args.search else [])
+        for icon_id, score in matches:
+            print(f"{icon_id}\t{score:.3f}")
+    finally:
+        repo.close()
+
+
+if __name__ == "__main__":
+    main()
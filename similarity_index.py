@@ -0,0 +1,247 @@
+import argparse
+import io
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from icon_blobs import icon_data_sql
+from thumbnail_cache import content_hash
+from trigger_gates import gate, install_triggers
+
+# ==============================================
+# PERCEPTUAL-HASH SIMILARITY INDEX
+# ==============================================
+
+HASH_TABLE = "icon_hashes"
+FAILED_TABLE = "icon_hashes_failed"  # icons with no image, or one PIL can't decode
+BUILD_BATCH = 2000
+PARALLEL_THRESHOLD = 2000    # below this many icons, hashing in-process is faster
+TOP_K = 32
+BACKGROUND = (128, 128, 128)  # transparent pixels are flattened onto this before hashing
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {HASH_TABLE} (
+    icon_id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    ahash INTEGER NOT NULL,
+    dhash INTEGER NOT NULL,
+    phash INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER
+);
+CREATE TABLE IF NOT EXISTS {FAILED_TABLE} (
+    icon_id TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS {HASH_TABLE}_au AFTER UPDATE OF icon_id, icon_data ON ac_icons
+WHEN {gate(HASH_TABLE)} BEGIN
+    DELETE FROM {HASH_TABLE} WHERE icon_id = old.icon_id;
+END;
+CREATE TRIGGER IF NOT EXISTS {HASH_TABLE}_ad AFTER DELETE ON ac_icons WHEN {gate(HASH_TABLE)} BEGIN
+    DELETE FROM {HASH_TABLE} WHERE icon_id = old.icon_id;
+END;
+CREATE TRIGGER IF NOT EXISTS {FAILED_TABLE}_au AFTER UPDATE OF icon_id, icon_data ON ac_icons
+WHEN {gate(HASH_TABLE)} BEGIN
+    DELETE FROM {FAILED_TABLE} WHERE icon_id = old.icon_id;
+END;
+CREATE TRIGGER IF NOT EXISTS {FAILED_TABLE}_ad AFTER DELETE ON ac_icons WHEN {gate(HASH_TABLE)} BEGIN
+    DELETE FROM {FAILED_TABLE} WHERE icon_id = old.icon_id;
+END;
+"""
+
+_DCT = np.cos(np.pi / 32 * (np.arange(32)[:, None]) * (np.arange(32)[None, :] + 0.5))
+
+
+def _bits_to_int(bits):
+    """Pack 64 booleans into a signed 64-bit int (what SQLite can store)."""
+    value = 0
+    for bit in bits.ravel():
+        value = (value << 1) | int(bit)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _grayscale(img):
+    img = img.convert("RGBA")
+    flat = Image.new("RGBA", img.size, BACKGROUND + (255,))
+    flat.alpha_composite(img)
+    return flat.convert("L")
+
+
+def perceptual_hashes(img):
+    """Return (ahash, dhash, phash) for an icon image as signed 64-bit ints.
+
+    Every hash is computed on a fixed-size downscale, so the same icon
+    drawn at 16, 32 or 64 px lands on (nearly) the same bits.
+    """
+    gray = _grayscale(img)
+    small = np.asarray(gray.resize((8, 8), Image.Resampling.BOX), dtype=np.float32)
+    ahash = small > small.mean()
+    wide = np.asarray(gray.resize((9, 8), Image.Resampling.BOX), dtype=np.float32)
+    dhash = wide[:, 1:] > wide[:, :-1]
+    big = np.asarray(gray.resize((32, 32), Image.Resampling.LANCZOS), dtype=np.float64)
+    low = (_DCT @ big @ _DCT.T)[:8, :8].ravel()
+    phash = low > np.median(low[1:])
+    return _bits_to_int(ahash), _bits_to_int(dhash), _bits_to_int(phash)
+
+
+def hash_row(row):
+    """(icon_id, blob) -> table row, or None if there is no blob or it can't be decoded."""
+    icon_id, blob = row
+    try:
+        img = Image.open(io.BytesIO(blob))
+        return (icon_id, content_hash(blob), *perceptual_hashes(img), img.width, img.height)
+    except Exception:
+        return None
+
+
+def ensure_hash_table(conn):
+    conn.executescript(_SCHEMA)
+    install_triggers(conn, HASH_TABLE, _TRIGGERS)
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({HASH_TABLE})")}
+    for column in ("width", "height"):  # tables built before sizes were recorded
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {HASH_TABLE} ADD COLUMN {column} INTEGER")
+    conn.commit()
+
+
+if hasattr(np, "bitwise_count"):
+    popcount = np.bitwise_count
+else:
+    _POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(values):
+        return _POP8[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+class SimilarityIndex:
+    """Top-k "looks like this" queries over perceptual hashes of every icon.
+
+    Hashes live in the icon_hashes table; triggers drop a row when its
+    icon_data changes, and refresh() hashes whatever is missing. Icons
+    that can't be hashed are listed in icon_hashes_failed instead (until
+    their icon_data changes), so they aren't retried on every query.
+    refresh() also (re)loads the NumPy arrays of all hashes that similar()
+    queries, so call it (on a worker thread in the apps, see
+    refresh_in_background()) before querying.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        repo.migrate(ensure_hash_table)
+        self._ids = None
+        self._stale = True
+
+    def missing_count(self):
+        """How many icons refresh() has yet to hash (or find unhashable)."""
+        return self.repo.reader().execute(
+            f"SELECT (SELECT COUNT(*) FROM ac_icons) - (SELECT COUNT(*) FROM {HASH_TABLE}) "
+            f"- (SELECT COUNT(*) FROM {FAILED_TABLE})").fetchone()[0]
+
+    def refresh(self, progress=None):
+        """Hash every icon that has no hash row yet; returns how many were added."""
+        cur = self.repo.reader().execute(
+            f"SELECT a.icon_id, {icon_data_sql('a')} FROM ac_icons a "
+            f"LEFT JOIN {HASH_TABLE} h ON h.icon_id = a.icon_id "
+            f"WHERE (h.icon_id IS NULL OR h.width IS NULL) "
+            f"AND a.icon_id NOT IN (SELECT icon_id FROM {FAILED_TABLE})")
+        added = 0
+        pool = None
+        try:
+            while True:
+                batch = cur.fetchmany(BUILD_BATCH)
+                if not batch:
+                    break
+                if pool is None and len(batch) >= PARALLEL_THRESHOLD:
+                    pool = ProcessPoolExecutor()
+                hashed = list(pool.map(hash_row, batch, chunksize=64) if pool else map(hash_row, batch))
+                rows = [r for r in hashed if r]
+                failed = [(icon_id,) for (icon_id, _), r in zip(batch, hashed) if r is None]
+                with self.repo.writer() as conn:
+                    conn.executemany(f"INSERT OR REPLACE INTO {HASH_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                    conn.executemany(f"INSERT OR IGNORE INTO {FAILED_TABLE} VALUES (?)", failed)
+                added += len(rows)
+                if progress:
+                    progress(added)
+        finally:
+            if pool:
+                pool.shutdown()
+        if added or self._stale:
+            self._load()
+        return added
+
+    def refresh_in_background(self, progress=None):
+        """Run refresh() on a daemon thread; returns a Future resolving to self.
+
+        The Tk side should poll future.done() rather than be called back
+        from the worker thread, and not query until it is done.
+        """
+        future = Future()
+
+        def run():
+            try:
+                self.refresh(progress)
+                future.set_result(self)
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="similarity-index", daemon=True).start()
+        return future
+
+    def _load(self):
+        rows = self.repo.reader().execute(
+            f"SELECT icon_id, ahash, dhash, phash FROM {HASH_TABLE} ORDER BY icon_id").fetchall()
+        ids = np.array([r[0] for r in rows], dtype=object)
+        self._hashes = np.array([r[1:] for r in rows], dtype=np.int64).reshape(-1, 3).view(np.uint64)
+        self._index = {icon_id: i for i, icon_id in enumerate(ids)}
+        self._ids = ids
+        self._stale = False
+
+    def invalidate(self):
+        """Reload the hash arrays on the next refresh(), even if it hashes nothing."""
+        self._stale = True
+
+    def similar(self, icon_id, k=TOP_K):
+        """Return [(icon_id, distance)] for the k icons closest to `icon_id`.
+
+        Distance is the summed Hamming distance of the three hashes (0-192),
+        over the hashes loaded by the last refresh().
+        """
+        if self._ids is None:
+            raise RuntimeError("refresh() the similarity index before querying it")
+        i = self._index.get(icon_id)
+        if i is None:
+            return []
+        distances = popcount(self._hashes ^ self._hashes[i]).sum(axis=1).astype(np.int32)
+        distances[i] = np.iinfo(np.int32).max
+        k = min(k, len(distances) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.lexsort((self._ids[top].astype(str), distances[top]))]
+        return [(self._ids[j], int(distances[j])) for j in top]
+
+
+def main(argv=None):
+    from icon_repository import IconRepository
+
+    parser = argparse.ArgumentParser(description="Build the perceptual-hash index or query it.")
+    parser.add_argument("--db", default="enhanced_icons.db")
+    parser.add_argument("--similar", metavar="ICON_ID", help="print the icons closest to this one")
+    parser.add_argument("-k", type=int, default=TOP_K)
+    args = parser.parse_args(argv)
+
+    index = SimilarityIndex(IconRepository(args.db))
+    added = index.refresh(progress=lambda n: print(f"\rhashed {n}", end="", file=sys.stderr))
+    print(f"\n{added} icon(s) hashed", file=sys.stderr)
+    if args.similar:
+        for icon_id, distance in index.similar(args.similar, args.k):
+            print(f"{icon_id}\t{distance}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+import argparse
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from icon_repository import IconRepository
+from thumbnail_cache import ATLAS_SUFFIX, content_hash, decode_thumbnail
+
+# ==============================================
+# CUSTOMIZATION SETTINGS
+# ==============================================
+
+DB_PATH = "enhanced_icons.db"
+ATLAS_SIZES = (32, 64)       # sprite box sizes (px): the editor and contact sheet, and the viewer grid
+MAX_SHEET_SIZE = 4096        # largest sheet edge (px), a safe texture size for most GPUs
+SPRITE_PADDING = 1           # transparent pixels between sprites on a sheet
+EXPORT_BATCH = 2000          # icons read from the database at a time
+PARALLEL_THRESHOLD = 200     # below this many new images in a batch, decode in-process
+
+MANIFEST_NAME = "manifest.json"
+TILES_NAME = "tiles.json"    # just what AtlasReader needs, so the apps don't parse the manifest
+_FORMAT = 1
+_SHEET_RE = re.compile(r"^atlas_\d+_\d+\.png$")
+
+# ==============================================
+# ATLAS FORMAT
+# ==============================================
+#
+# An atlas directory holds, per size S:
+#   atlas_<S>.rgba     every distinct image as one fixed-size tile of S*S*4
+#                      bytes: w*h RGBA pixels row by row from the start of
+#                      the tile, the rest zero. Tile i starts at i*S*S*4, so
+#                      a reader can mmap the file and hand each tile's bytes
+#                      to Image.frombuffer without copying them.
+#   atlas_<S>_<n>.png  the same tiles laid out on sprite sheets.
+# manifest.json maps each icon_id to its tile, the content hash of its
+# icon_data and, per size, [sheet, x, y, w, h] on the sheets. Icons with
+# identical images share a tile. tiles.json lists each tile's content hash
+# and per-size (w, h) for AtlasReader. Both are written last, and removed
+# first when an export starts, so a reader never pairs them with
+# half-written tiles.
+
+
+def render_tiles(blob, sizes):
+    """Runs in the pool: [(w, h, rgba bytes)] per size, or None if the blob can't be decoded.
+
+    Uses the apps' own decode_thumbnail(), so a tile is pixel for pixel
+    what the viewer and editor would have decoded.
+    """
+    try:
+        tiles = []
+        for size in sizes:
+            img = decode_thumbnail(blob, (size, size))
+            if img.mode != "RGBA":
+                img = img.convert("RGBA")
+            tiles.append((img.width, img.height, img.tobytes()))
+        return tiles
+    except Exception:
+        return None
+
+
+class SheetLayout:
+    """Where tile i of a size lands: sheets of `columns` x `rows` cells, filled row by row."""
+
+    def __init__(self, size, sheet_size=MAX_SHEET_SIZE, padding=SPRITE_PADDING):
+        self.size = size
+        self.padding = padding
+        self.cell = size + padding
+        self.columns = self.rows = max(1, (sheet_size + padding) // self.cell)
+        self.per_sheet = self.columns * self.rows
+
+    def place(self, tile):
+        """(sheet, x, y) of a tile's top-left corner."""
+        sheet, cell = divmod(tile, self.per_sheet)
+        row, column = divmod(cell, self.columns)
+        return sheet, column * self.cell, row * self.cell
+
+    def sheet_count(self, tiles):
+        return math.ceil(tiles / self.per_sheet)
+
+    def sheet_dimensions(self, tiles_on_sheet):
+        rows = math.ceil(tiles_on_sheet / self.columns)
+        columns = min(tiles_on_sheet, self.columns)
+        return columns * self.cell - self.padding, rows * self.cell - self.padding
+
+
+def tile_image(buffer, offset, width, height):
+    """An RGBA image over a tile's bytes (zero-copy when `buffer` is an mmap)."""
+    from PIL import Image
+    view = memoryview(buffer)[offset:offset + width * height * 4]
+    return Image.frombuffer("RGBA", (width, height), view, "raw", "RGBA", 0, 1)
+
+
+def render_sheet(raw_path, layout, first, dimensions, out_path):
+    """Runs in the pool: paste tiles first.. (their (w, h) in `dimensions`) onto one PNG sheet."""
+    from PIL import Image
+
+    tile_bytes = layout.size * layout.size * 4
+    sheet = Image.new("RGBA", layout.sheet_dimensions(len(dimensions)), (0, 0, 0, 0))
+    with open(raw_path, "rb") as f:
+        raw = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)  # closed when the last tile image goes
+    for tile, (width, height) in enumerate(dimensions, first):
+        if width and height:
+            _, x, y = layout.place(tile)
+            sheet.paste(tile_image(raw, tile * tile_bytes, width, height), (x, y))
+    sheet.save(out_path, "PNG")
+    return out_path
+
+
+def _raw_name(size):
+    return f"atlas_{size}.rgba"
+
+
+def _sheet_name(size, sheet):
+    return f"atlas_{size}_{sheet}.png"
+
+
+def export_atlas(repo, out_dir, sizes=ATLAS_SIZES, term="", categories=(), workers=None,
+                 sheet_size=MAX_SHEET_SIZE, padding=SPRITE_PADDING, progress=None):
+    """Render the icons matching `term`/`categories` (all icons by default) into an atlas in `out_dir`.
+
+    Images are decoded and scaled in a process pool and streamed into the
+    raw tile files batch by batch; the PNG sheets are then drawn from
+    those files in the pool, one sheet per task.
+    Returns {"icons", "tiles", "skipped", "sheets"}.
+    """
+    sizes = sorted(set(sizes))
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    index_path = os.path.join(out_dir, TILES_NAME)
+    for path in (index_path, manifest_path):
+        if os.path.exists(path):
+            os.remove(path)
+    for name in os.listdir(out_dir):  # an earlier export may have had more sheets, or other sizes
+        if _SHEET_RE.match(name):
+            os.remove(os.path.join(out_dir, name))
+    icon_ids = sorted(row[0] for row in repo.search(("icon_id",), term, categories))
+    tiles = {}          # content hash -> tile index (None if the image could not be decoded)
+    icons = {}          # icon_id -> content hash
+    dimensions = {size: [] for size in sizes}
+    raw_paths = {size: os.path.join(out_dir, _raw_name(size)) for size in sizes}
+    raw_files = {size: open(raw_paths[size] + ".tmp", "wb") for size in sizes}
+    render = partial(render_tiles, sizes=sizes)
+    pool = None
+    try:
+        for start in range(0, len(icon_ids), EXPORT_BATCH):
+            batch = repo.icon_data(icon_ids[start:start + EXPORT_BATCH])
+            todo = {}
+            for icon_id, blob in batch.items():
+                if blob:
+                    key = content_hash(blob)
+                    icons[icon_id] = key
+                    if key not in tiles:
+                        todo.setdefault(key, blob)
+            if pool is None and len(todo) >= PARALLEL_THRESHOLD:
+                pool = ProcessPoolExecutor(workers)
+            results = pool.map(render, todo.values(), chunksize=64) if pool else map(render, todo.values())
+            for key, rendered in zip(todo, results):
+                if rendered is None:
+                    tiles[key] = None
+                    continue
+                tiles[key] = len(dimensions[sizes[0]])
+                for size, (width, height, pixels) in zip(sizes, rendered):
+                    dimensions[size].append((width, height))
+                    raw_files[size].write(pixels.ljust(size * size * 4, b"\0"))
+            if progress:
+                progress(min(start + EXPORT_BATCH, len(icon_ids)))
+        for size in sizes:
+            raw_files[size].close()
+            os.replace(raw_paths[size] + ".tmp", raw_paths[size])
+
+        sheets = {}
+        jobs = []
+        if pool is None and len(tiles) >= PARALLEL_THRESHOLD:
+            pool = ProcessPoolExecutor(workers)
+        for size in sizes:
+            layout = SheetLayout(size, sheet_size, padding)
+            sheets[size] = [_sheet_name(size, n) for n in range(layout.sheet_count(len(dimensions[size])))]
+            for n, name in enumerate(sheets[size]):
+                first = n * layout.per_sheet
+                args = (raw_paths[size], layout, first, dimensions[size][first:first + layout.per_sheet],
+                        os.path.join(out_dir, name))
+                jobs.append(pool.submit(render_sheet, *args) if pool else render_sheet(*args))
+        for job in jobs:
+            if pool:
+                job.result()
+    finally:
+        for f in raw_files.values():
+            f.close()
+        if pool is not None:
+            pool.shutdown()
+
+    layouts = {size: SheetLayout(size, sheet_size, padding) for size in sizes}
+    entries = {}
+    for icon_id, key in icons.items():
+        tile = tiles[key]
+        if tile is None:
+            continue
+        sprites = {str(size): [*layouts[size].place(tile), *dimensions[size][tile]] for size in sizes}
+        entries[icon_id] = {"hash": key, "tile": tile, "sprites": sprites}
+    manifest = {
+        "format": _FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "database": os.path.basename(repo.db_path),
+        "query": term,
+        "categories": list(categories),
+        "padding": padding,
+        "sizes": {str(size): {"raw": _raw_name(size), "tile_bytes": size * size * 4, "sheets": sheets[size]}
+                  for size in sizes},
+        "icons": entries,
+    }
+    hashes = [None] * len(dimensions[sizes[0]])
+    for key, tile in tiles.items():
+        if tile is not None:
+            hashes[tile] = key
+    index = {
+        "format": _FORMAT,
+        "sizes": {str(size): {"raw": _raw_name(size), "tile_bytes": size * size * 4, "dimensions": dimensions[size]}
+                  for size in sizes},
+        "hashes": hashes,
+    }
+    for path, data in ((manifest_path, manifest), (index_path, index)):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+    return {"icons": len(entries), "tiles": len(dimensions[sizes[0]]),
+            "skipped": len(icon_ids) - len(entries), "sheets": sum(len(s) for s in sheets.values())}
+
+
+class AtlasReader:
+    """Read-only view of an atlas directory for the apps' thumbnail path.
+
+    Each size's raw tile file is mapped into memory once; get_many() wraps
+    tiles in PIL images that point straight into the mapping, so serving a
+    page neither decodes a PNG nor copies pixels. Tiles are found by the
+    content hash of icon_data, so icons edited after the export just miss
+    and are decoded as usual.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, TILES_NAME), encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("format") != _FORMAT:
+            raise ValueError(f"unsupported atlas format {index.get('format')!r}")
+        self.directory = directory
+        self._maps = {}
+        self._tiles = {}  # size -> {content hash: (offset, w, h)}
+        hashes = index["hashes"]
+        for name, info in index["sizes"].items():
+            if not hashes:
+                continue
+            with open(os.path.join(directory, info["raw"]), "rb") as f:
+                raw = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(raw) < len(hashes) * info["tile_bytes"]:
+                raise ValueError(f"{info['raw']} is shorter than {TILES_NAME} says")
+            step = info["tile_bytes"]
+            self._maps[int(name)] = raw
+            self._tiles[int(name)] = {key: (tile * step, width, height) for tile, (key, (width, height))
+                                      in enumerate(zip(hashes, info["dimensions"]))}
+
+    @property
+    def sizes(self):
+        return sorted(self._tiles)
+
+    def get_many(self, hashes, size):
+        """Return {hash: Image} for the hashes in the atlas at box `size` (same as ThumbnailStore)."""
+        if size[0] != size[1] or size[0] not in self._tiles:
+            return {}
+        tiles, raw = self._tiles[size[0]], self._maps[size[0]]
+        found = {}
+        for key in set(hashes):
+            tile = tiles.get(key)
+            if tile is not None and tile[1] and tile[2]:
+                found[key] = tile_image(raw, *tile)
+        return found
+
+
+def open_atlas(directory):
+    """An AtlasReader for `directory`, or None if it has no (readable) atlas."""
+    if not os.path.exists(os.path.join(directory, TILES_NAME)):
+        return None
+    try:
+        return AtlasReader(directory)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring sprite atlas in {directory}: {e}", file=sys.stderr)
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render icons into sprite sheets with a JSON manifest.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("-o", "--out", help=f"output directory (default: <db>{ATLAS_SUFFIX}, read by the apps)")
+    parser.add_argument("--sizes", default=",".join(map(str, ATLAS_SIZES)), help="comma-separated sprite sizes")
+    parser.add_argument("-q", "--query", default="", help="only icons matching this search (as in the search box)")
+    parser.add_argument("--category", action="append", default=[], help="only icons in this category (repeatable)")
+    parser.add_argument("--workers", type=int, help="decoding processes (default: one per CPU)")
+    parser.add_argument("--sheet-size", type=int, default=MAX_SHEET_SIZE)
+    parser.add_argument("--padding", type=int, default=SPRITE_PADDING)
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    if not sizes or min(sizes) < 1 or max(sizes) > args.sheet_size:
+        parser.error("--sizes must be between 1 and --sheet-size")
+    out_dir = args.out or os.path.splitext(args.db)[0] + ATLAS_SUFFIX
+    repo = IconRepository(args.db)
+    try:
+        start = time.perf_counter()
+        summary = export_atlas(repo, out_dir, sizes, args.query, tuple(args.category), args.workers,
+                               args.sheet_size, args.padding,
+                               progress=lambda n: print(f"\rrendered {n}", end="", file=sys.stderr))
+        print(f"\r{summary['icons']} icon(s) in {summary['tiles']} tile(s) and {summary['sheets']} sheet(s) "
+              f"in {out_dir} ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+        if summary["skipped"]:
+            print(f"{summary['skipped']} icon(s) without a readable image were left out", file=sys.stderr)
+    finally:
+        repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import io
+import json
+import random
+import sqlite3
+
+from PIL import Image, ImageDraw
+
+# ==============================================
+# SYNTHETIC ac_icons DATABASES FOR BENCHMARKS
+# ==============================================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ac_icons (
+    icon_id TEXT PRIMARY KEY,
+    name TEXT,
+    category TEXT,
+    keywords TEXT,
+    metadata_json TEXT,
+    icon_data BLOB
+)
+"""
+
+# Distinct images drawn per database; rows reuse them the way the real
+# corpus reuses icons across weenies.
+IMAGE_POOL_SIZE = 2000
+ICON_SIZES = (16, 32, 32, 32, 64)
+BATCH_SIZE = 5000
+
+CATEGORIES = ["Weapons", "Armor", "Jewelry", "Clothing", "Magic", "Scrolls", "Food",
+              "Gems", "Keys", "Trade Notes", "Creatures", "UI", "Spell Components",
+              "Housing", "Salvage", None]
+WORDS = ("sword axe mace spear dagger staff wand bow crossbow shield helm gauntlets "
+         "boots breastplate robe cloak ring amulet necklace bracelet gem ruby sapphire "
+         "emerald diamond scroll potion elixir food bread key coin note salvage rune "
+         "fire frost lightning acid blade ancient shadow golden silver iron bronze "
+         "olthoi drudge mosswart tusker banderling virindi lugian gromnie").split()
+
+
+def _draw_icon(rng, size):
+    """A small RGBA icon with a few shapes - compresses like real icon art."""
+    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(2, 6)):
+        color = tuple(rng.randrange(256) for _ in range(3)) + (rng.randint(160, 255),)
+        x0, y0 = rng.randrange(size), rng.randrange(size)
+        x1, y1 = min(size - 1, x0 + rng.randint(2, size)), min(size - 1, y0 + rng.randint(2, size))
+        if rng.random() < 0.5:
+            draw.ellipse((x0, y0, x1, y1), fill=color)
+        else:
+            draw.rectangle((x0, y0, x1, y1), fill=color, outline=(0, 0, 0, 255))
+    for _ in range(size * 2):  # a little texture noise
+        img.putpixel((rng.randrange(size), rng.randrange(size)),
+                     tuple(rng.randrange(256) for _ in range(3)) + (255,))
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _row(rng, index, pool):
+    name_words = rng.sample(WORDS, rng.randint(1, 3))
+    keywords = ", ".join(rng.sample(WORDS, rng.randint(4, 10)))
+    size, blob = pool[index % len(pool)]
+    metadata = {
+        "size": size,
+        "weenie_class": rng.randrange(1, 60),
+        "wcids": [rng.randrange(1, 90000) for _ in range(rng.randint(0, 6))],
+        "source": "synthetic",
+    }
+    return (f"0x{0x06000000 + index:08X}", " ".join(w.title() for w in name_words),
+            rng.choice(CATEGORIES), keywords, json.dumps(metadata), blob)
+
+
+def generate(path, rows, seed=0, pool_size=IMAGE_POOL_SIZE):
+    """Create (or extend) `path` with `rows` synthetic ac_icons rows."""
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(min(pool_size, rows)):
+        size = rng.choice(ICON_SIZES)
+        pool.append((size, _draw_icon(rng, size)))
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    start = conn.execute("SELECT COUNT(*) FROM ac_icons").fetchone()[0]
+    for lo in range(start, rows, BATCH_SIZE):
+        with conn:
+            conn.executemany("INSERT INTO ac_icons (icon_id, name, category, keywords, metadata_json, icon_data) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             [_row(rng, i, pool) for i in range(lo, min(rows, lo + BATCH_SIZE))])
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a synthetic ac_icons database.")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(args.path, args.rows, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from concurrent.futures import Future
+
+from icon_search import BM25_WEIGHTS, FTS_COLUMNS
+from icon_trace import span
+
+# ==============================================
+# IN-MEMORY PREFIX TERM INDEX
+# ==============================================
+
+# Same token rules as the FTS table (unicode61, diacritics removed), so
+# live results match what Enter would have found.
+_TOKEN_RE = re.compile(r"[^\W_]+")
+BUILD_BATCH = 5000
+# FTS5's bm25() constants, so live hits come back in the order Enter would give
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    """Lowercased word tokens of `text`, with accents stripped."""
+    if not text:
+        return []
+    text = text.lower()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(text)
+
+
+def _prefix_end(prefix):
+    """The smallest string sorting after every string that starts with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class TermIndex:
+    """Ranked prefix search over icon_id/name/category/keywords without touching SQLite.
+
+    Terms are kept in one sorted list, and each term's matching icons are a
+    slice of a single int32 postings array (CSR layout), with a parallel
+    array holding the term's BM25_WEIGHTS-weighted count in that icon. A
+    prefix is therefore two bisects plus a few vectorised operations,
+    however many terms it covers. Hits are scored the way FTS5's bm25()
+    scores the same query, best first, icon_id breaking ties.
+
+    Edits made after the build go into a small overlay that is checked
+    at query time, so update() is O(1) and never rebuilds the arrays.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._overlay = {}  # icon_id -> (weighted term counts, token count), None once deleted
+
+    def load(self, rows):
+        """Build from (icon_id, name, category, keywords) rows sorted by icon_id."""
+        import numpy as np  # not needed (or loaded) until the first build, off the startup path
+        ids = []
+        lengths = []
+        vocab = {}
+        for doc, row in enumerate(rows):
+            ids.append(row[0])
+            counts, length = _weighted_counts(row)
+            lengths.append(length)
+            for token, freq in counts.items():
+                postings = vocab.get(token)
+                if postings is None:
+                    vocab[token] = postings = ([], [])
+                postings[0].append(doc)
+                postings[1].append(freq)
+        terms = sorted(vocab)
+        sizes = np.fromiter((len(vocab[t][0]) for t in terms), dtype=np.int64, count=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        postings = np.empty(int(offsets[-1]), dtype=np.int32)
+        freqs = np.empty(int(offsets[-1]), dtype=np.float32)
+        for i, term in enumerate(terms):
+            postings[offsets[i]:offsets[i + 1]], freqs[offsets[i]:offsets[i + 1]] = vocab[term]
+        self._ids = ids
+        self._id_array = np.array(ids, dtype=object)
+        self._terms = terms
+        self._offsets = offsets
+        self._postings = postings
+        self._freqs = freqs
+        self._lengths = np.array(lengths, dtype=np.float64)
+        self._total_length = float(self._lengths.sum())
+        self.ready = True
+        return self
+
+    def load_from(self, repo):
+        """Stream the text columns out of `repo` and build (call from a worker thread)."""
+        cur = repo.reader().execute(
+            f"SELECT {', '.join(FTS_COLUMNS)} FROM ac_icons ORDER BY icon_id")
+
+        def rows():
+            while True:
+                batch = cur.fetchmany(BUILD_BATCH)
+                if not batch:
+                    return
+                yield from batch
+
+        with span("term_index"):
+            return self.load(rows())
+
+    def load_in_background(self, repo):
+        """Run load_from() on a daemon thread; returns a Future resolving to self.
+
+        The Tk side should poll future.done() rather than be called back from
+        the worker thread. Edits made meanwhile land in the overlay and are kept.
+        """
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(self.load_from(repo))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="term-index", daemon=True).start()
+        return future
+
+    def __len__(self):
+        return len(self._ids) if self.ready else 0
+
+    def update(self, icon_id, name=None, category=None, keywords=None):
+        """Re-index one icon after it was saved (or added)."""
+        self._overlay[icon_id] = _weighted_counts((icon_id, name, category, keywords))
+
+    def remove(self, icon_id):
+        self._overlay[icon_id] = None
+
+    def search(self, term):
+        """Return the icon_ids matching every token of `term` as a prefix, best match first.
+
+        With no tokens at all, every icon is returned in icon_id order.
+        """
+        import numpy as np
+        prefixes = tokenize(term)
+        with span("term_query"):
+            if not prefixes:
+                return self._all_ids()
+            slices = [self._prefix_range(p) for p in prefixes]
+            masks = [self._prefix_mask(lo, hi) for lo, hi in slices]
+            # Overlaid icons are scored separately below, and their stale postings ignored
+            stale, live = [], {}
+            for icon_id, entry in self._overlay.items():
+                i = bisect_left(self._ids, icon_id)
+                if i < len(self._ids) and self._ids[i] == icon_id:
+                    stale.append(i)
+                if entry is not None:
+                    live[icon_id] = entry
+            for hits in masks:
+                hits[stale] = False
+            mask = masks[0].copy()
+            for other in masks[1:]:
+                mask &= other
+            overlay = {icon_id: entry for icon_id, entry in live.items()
+                       if all(any(t.startswith(p) for t in entry[0]) for p in prefixes)}
+            docs = np.flatnonzero(mask)
+            # FTS5 takes N and the average length over the table as it is now
+            total = len(self._ids) - len(stale) + len(live)
+            avg_length = (self._total_length - float(self._lengths[stale].sum())
+                          + sum(length for _, length in live.values())) / total if total else 1.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[docs] / avg_length)
+            scores = np.zeros(len(docs))
+            extra = dict.fromkeys(overlay, 0.0)
+            for prefix, (lo, hi), hits in zip(prefixes, slices, masks):
+                # idf counts the rows containing the prefix at all, as FTS5 does
+                matched = sum(any(t.startswith(prefix) for t in counts) for counts, _ in live.values())
+                idf = _idf(total, int(np.count_nonzero(hits)) + matched)
+                start, end = self._offsets[lo], self._offsets[hi]
+                freq = np.bincount(self._postings[start:end], weights=self._freqs[start:end],
+                                   minlength=len(self._ids))[docs]
+                scores += idf * freq * (BM25_K1 + 1) / (freq + norm)
+                for icon_id, (counts, length) in overlay.items():
+                    freq = sum(f for t, f in counts.items() if t.startswith(prefix))
+                    doc_norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    extra[icon_id] += idf * freq * (BM25_K1 + 1) / (freq + doc_norm)
+            # Stable sort keeps icon_id order among equal scores
+            order = np.argsort(-scores, kind="stable")
+            result = self._id_array[docs[order]].tolist()
+            if extra:
+                ranked = list(zip(scores[order].tolist(), result)) + [(v, k) for k, v in extra.items()]
+                result = [icon_id for _, icon_id in sorted(ranked, key=lambda hit: (-hit[0], hit[1]))]
+        return result
+
+    def _all_ids(self):
+        removed = {icon_id for icon_id, entry in self._overlay.items() if entry is None}
+        added = [icon_id for icon_id, entry in self._overlay.items() if entry is not None]
+        ids = [icon_id for icon_id in self._ids if icon_id not in removed] if removed else list(self._ids)
+        return sorted(set(ids).union(added)) if added else ids
+
+    def _prefix_range(self, prefix):
+        lo = bisect_left(self._terms, prefix)
+        return lo, bisect_left(self._terms, _prefix_end(prefix), lo)
+
+    def _prefix_mask(self, lo, hi):
+        import numpy as np
+        mask = np.zeros(len(self._ids), dtype=bool)
+        mask[self._postings[self._offsets[lo]:self._offsets[hi]]] = True
+        return mask
+
+
+def _weighted_counts(row):
+    """({token: BM25_WEIGHTS-weighted count}, token count) for one (icon_id, name, category, keywords) row."""
+    counts = {}
+    length = 0
+    for weight, text in zip(BM25_WEIGHTS, row):
+        tokens = tokenize(text)
+        length += len(tokens)
+        for token in tokens:
+            counts[token] = counts.get(token, 0.0) + weight
+    return counts, length
+
+
+def _idf(rows, hits):
+    """FTS5's bm25() idf, floored the same way."""
+    idf = math.log((rows - hits + 0.5) / (hits + 0.5))
+    return idf if idf > 0 else 1e-6
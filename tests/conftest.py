@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_db import generate  # noqa: E402
+
+# ==============================================
+# SHARED FIXTURES
+# ==============================================
+
+ROWS = 120         # small enough to build in well under a second
+IMAGE_POOL = 12    # distinct images, so rows share them like the real corpus
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    """A plain ac_icons database, as it was before any app opened it."""
+    path = str(tmp_path / "icons.db")
+    generate(path, ROWS, pool_size=IMAGE_POOL)
+    return path
+
+
+@pytest.fixture
+def repo(baseline_db):
+    """An IconRepository on baseline_db (so every migration has run)."""
+    from icon_repository import IconRepository
+
+    repo = IconRepository(baseline_db)
+    yield repo
+    repo.close()
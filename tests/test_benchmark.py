@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+import benchmark
+from benchmark import _child, run_scenarios
+
+
+def test_scenarios_run_on_a_small_database(repo, baseline_db):
+    results = run_scenarios(baseline_db)
+    assert {"viewer.load_data", "viewer.contact_sheet", "editor.display_page",
+            "legacy.search_count"} <= set(results)
+    assert all(r["median_ms"] >= 0 for r in results.values())
+
+
+def test_startup_probes_run_in_a_fresh_interpreter(repo, baseline_db):
+    assert _child(["--startup"], baseline_db)["first_page_ms"] > 0
+    assert _child(["--before-paint"], baseline_db)["before_paint_ms"] > 0
+
+
+def test_before_paint_path_stays_light(repo, baseline_db):
+    """The apps paint before PIL, NumPy or Tk have been imported."""
+    code = ("import sys, benchmark; benchmark._before_paint_probe(sys.argv[1]); "
+            "print(sorted(m for m in ('tkinter', 'PIL', 'numpy') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code, baseline_db], check=True, capture_output=True,
+                         text=True, cwd=os.path.dirname(os.path.abspath(benchmark.__file__))).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,47 @@
+import json
+
+from change_journal import ROW_DELETED, ROW_INSERTED, iter_changes, iter_compacted, latest_seq
+from export_changes import main as export_main
+
+
+def test_journal_records_each_field_and_row_event(repo):
+    conn = repo.reader()
+    start = latest_seq(conn)
+    icon_id = repo.search(("icon_id",))[0][0]
+    old_name, old_keywords = repo.get_value(icon_id, "name"), repo.get_value(icon_id, "keywords")
+    repo.update(icon_id, name="First")
+    repo.update(icon_id, name="Second", keywords="k")
+    with repo.writer() as w:
+        w.execute("INSERT INTO ac_icons(icon_id, name) VALUES ('0x06FFFFFF', 'New')")
+        w.execute("DELETE FROM ac_icons WHERE icon_id='0x06FFFFFF'")
+    events = [(c["icon_id"], c["column"], c["old"], c["new"]) for c in iter_changes(conn, start)]
+    assert events[0] == (icon_id, "name", old_name, "First")
+    assert set(events[1:3]) == {(icon_id, "name", "First", "Second"), (icon_id, "keywords", old_keywords, "k")}
+    assert ("0x06FFFFFF", ROW_INSERTED, None, "0x06FFFFFF") in events
+    assert ("0x06FFFFFF", "name", None, "New") in events
+    assert events[-1] == ("0x06FFFFFF", ROW_DELETED, "0x06FFFFFF", None)
+
+    compact = {(c["icon_id"], c["column"]): (c["old"], c["new"]) for c in iter_compacted(conn, start)}
+    assert compact[(icon_id, "name")] == (old_name, "Second")
+
+
+def test_changed_back_fields_are_compacted_away(repo):
+    conn = repo.reader()
+    start = latest_seq(conn)
+    icon_id = repo.search(("icon_id",))[0][0]
+    name = repo.get_value(icon_id, "name")
+    repo.update(icon_id, name="Temporary")
+    repo.update(icon_id, name=name)
+    assert list(iter_compacted(conn, start)) == []
+
+
+def test_export_resumes_from_its_watermark(repo, baseline_db, tmp_path):
+    out = tmp_path / "changes.ndjson"
+    export_main(["--db", baseline_db, "-o", str(out), "--format", "ndjson", "--resume"])
+    icon_id = repo.search(("icon_id",))[0][0]
+    repo.update(icon_id, name="Exported")
+    export_main(["--db", baseline_db, "-o", str(out), "--format", "ndjson", "--resume"])
+    changes = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [(c["icon_id"], c["column"], c["new"]) for c in changes] == [(icon_id, "name", "Exported")]
+    export_main(["--db", baseline_db, "-o", str(out), "--resume"])
+    assert json.loads(out.read_text()) == []
@@ -0,0 +1,35 @@
+import io
+
+from PIL import Image
+
+from contact_sheet import ContactSheet, SheetLayout
+from thumbnail_cache import ThumbnailCache
+
+
+def test_layout_hit_testing():
+    layout = SheetLayout(4, 3, (32, 32), captions=True, padding=2)
+    assert (layout.width, layout.height, len(layout)) == (144, 3 * 48, 12)
+    assert layout.index_at(0, 0) == 0
+    assert layout.index_at(36 * 3 + 5, 48 + 1) == 7
+    assert layout.index_at(144, 0) is None and layout.index_at(-1, 5) is None
+    assert layout.icon_origin(5, (16, 16)) == (36 + 10, 48 + 2)
+
+
+def test_sheet_composites_every_icon_in_its_cell(repo):
+    ids = [row[0] for row in repo.search(("icon_id",))][:6]
+    data = repo.icon_data(ids)
+    blobs = [data[i] for i in ids] + [None]
+    layout = SheetLayout(3, 3, (16, 16))
+    sheet = ContactSheet(ThumbnailCache(repo.db_path), layout, "#000000").prepare(blobs, (16, 16))
+    assert sheet.size == (layout.width, layout.height)
+    for index, blob in enumerate(blobs[:6]):
+        thumb = Image.open(io.BytesIO(blob)).convert("RGBA")
+        thumb.thumbnail((16, 16))
+        x, y = layout.icon_origin(index, thumb.size)
+        cell = sheet.crop((x, y, x + thumb.width, y + thumb.height))
+        expected = Image.new("RGBA", thumb.size, (0, 0, 0, 255))
+        expected.alpha_composite(thumb)
+        assert cell.tobytes() == expected.tobytes(), index
+    x, y = layout.cell_origin(6)  # the missing image leaves its cell empty
+    assert sheet.crop((x, y, x + layout.cell_width, y + layout.cell_height)).getcolors() == [
+        (layout.cell_width * layout.cell_height, (0, 0, 0, 255))]
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+from PIL import ImageTk
+
+from icon_loader import IconLoader
+from thumbnail_cache import ThumbnailCache
+
+
+class FakeRoot:
+    """Runs root.after() callbacks when pump() is called, like a Tk event loop."""
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, callback):
+        self.pending.append(callback)
+
+    def pump(self, until, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not until():
+            assert time.monotonic() < deadline, "loader never delivered"
+            callbacks, self.pending = self.pending, []
+            for callback in callbacks:
+                callback()
+            time.sleep(0.005)
+
+
+@pytest.fixture
+def loader(repo, monkeypatch):
+    monkeypatch.setattr(ImageTk, "PhotoImage", lambda img: img.size)
+    ids = [row[0] for row in repo.search(("icon_id",))]
+    calls = []
+
+    def fetch(page):
+        calls.append((page, threading.current_thread().name))
+        chunk = ids[(page - 1) * 10:page * 10]
+        data = repo.icon_data(chunk)
+        return chunk, [data[i] for i in chunk]
+
+    errors = []
+    loader = IconLoader(FakeRoot(), ThumbnailCache(repo.db_path), (16, 16), fetch,
+                        lambda page, e: errors.append((page, e)))
+    loader.calls, loader.errors = calls, errors
+    yield loader
+    loader.close()
+
+
+def test_pages_load_off_the_tk_thread_with_prefetch(loader):
+    delivered = []
+    loader.request(3, lambda page, rows, photos: delivered.append((page, rows, photos)), range(1, 13))
+    loader.root.pump(lambda: delivered)
+    page, rows, photos = delivered[0]
+    assert page == 3 and len(rows) == len(photos) == 10
+    assert all(photo and max(photo) <= 16 for photo in photos)
+    assert all(name.startswith("icon-loader") for _, name in loader.calls)
+    time.sleep(0.2)
+    assert {p for p, _ in loader.calls} == {2, 3, 4}
+
+
+def test_only_the_latest_request_is_delivered(loader):
+    delivered = []
+    callback = lambda page, rows, photos: delivered.append(page)  # noqa: E731
+    loader.request(1, callback, range(1, 13))
+    loader.request(7, callback, range(1, 13))
+    loader.root.pump(lambda: delivered)
+    assert delivered == [7]
+
+
+def test_errors_reach_the_tk_thread(repo, monkeypatch):
+    def fetch(page):
+        raise RuntimeError("boom")
+
+    errors = []
+    loader = IconLoader(FakeRoot(), ThumbnailCache(repo.db_path), (16, 16), fetch,
+                        lambda page, e: errors.append((page, str(e))), prefetch=0)
+    try:
+        loader.request(2, lambda *a: None)
+        loader.root.pump(lambda: errors)
+    finally:
+        loader.close()
+    assert errors == [(2, "boom")]
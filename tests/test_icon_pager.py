@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from icon_pager import KeysetPager, ListPager
+
+PAGE = 7
+
+
+def _walk(repo, pager, pages):
+    return [row for page in pages for row in repo.page(pager, page)]
+
+
+@pytest.mark.parametrize("term", ["", "s", "fire", "meta.size>=32"])
+def test_pages_concatenate_to_the_search_result(repo, term):
+    pager = KeysetPager(("icon_id", "name"), PAGE)
+    pager.set_query(term, repo.fts_enabled, (), repo.metadata_fields)
+    expected = repo.search(("icon_id", "name"), term)
+    assert repo.page_count(pager) == max(1, -(-len(expected) // PAGE))
+    assert _walk(repo, pager, range(1, repo.page_count(pager) + 1)) == expected
+
+
+def test_jumping_to_unseen_pages_finds_the_same_rows(repo):
+    pager = KeysetPager(("icon_id",), PAGE)
+    pager.set_query("", repo.fts_enabled)
+    expected = repo.search(("icon_id",))
+    pages = list(range(1, repo.page_count(pager) + 1))
+    random.Random(1).shuffle(pages)
+    for page in pages:  # every jump seeks from whichever cached boundary is nearest
+        assert repo.page(pager, page) == expected[(page - 1) * PAGE:page * PAGE], page
+
+
+def test_out_of_range_pages_are_clamped(repo):
+    pager = KeysetPager(("icon_id",), PAGE)
+    last = repo.page_count(pager)
+    assert repo.page(pager, 0) == repo.page(pager, 1)
+    assert repo.page(pager, last + 5) == repo.page(pager, last)
+
+
+def test_invalidate_picks_up_inserts(repo):
+    pager = KeysetPager(("icon_id",), PAGE)
+    before = repo.page_count(pager)
+    with repo.writer() as conn:
+        conn.executemany("INSERT INTO ac_icons(icon_id) VALUES (?)",
+                         [(f"0x06FF{i:04X}",) for i in range(PAGE)])
+    pager.invalidate()
+    assert repo.page_count(pager) == before + 1
+    assert _walk(repo, pager, range(1, before + 2)) == repo.search(("icon_id",))
+
+
+def test_list_pager_keeps_the_given_order(repo):
+    ids = [row[0] for row in repo.search(("icon_id",))][::-3]
+    pager = ListPager(("icon_id", "name"), PAGE, ids + ["0x0DEADBEE"])
+    rows = _walk(repo, pager, range(1, pager.page_count(None) + 1))
+    assert [row[0] for row in rows] == ids
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from bulk_edit import BulkEdit, EditHistory
+from icon_changes import ChangeWatcher, EditConflict
+from icon_repository import IconRepository
+
+
+def _ids(repo):
+    return [row[0] for row in repo.search(("icon_id",))]
+
+
+def test_update_and_get(repo):
+    icon_id = _ids(repo)[0]
+    assert repo.update(icon_id, name="Renamed", category="Gems")
+    record = repo.get(icon_id)
+    assert (record.name, record.category) == ("Renamed", "Gems")
+    assert not repo.update("0x0DEADBEE", name="x")
+    with pytest.raises(ValueError):
+        repo.update(icon_id, icon_data=b"")
+
+
+def test_versions_bump_and_guard_saves(repo):
+    icon_id = _ids(repo)[0]
+    assert repo.versions([icon_id]) == {icon_id: 0}
+    repo.update(icon_id, name="One")
+    version = repo.versions([icon_id])[icon_id]
+    assert version == 1
+    repo.update(icon_id, name="Two", expected_version=version)
+    with pytest.raises(EditConflict) as info:
+        repo.update(icon_id, name="Three", expected_version=version)
+    assert info.value.icon_ids == [icon_id]
+    assert repo.get_value(icon_id, "name") == "Two"
+
+
+def test_update_many_is_all_or_nothing(repo):
+    a, b = _ids(repo)[:2]
+    expected = repo.versions([a, b])
+    repo.update(b, keywords="changed elsewhere")
+    with pytest.raises(EditConflict):
+        repo.update_many([(a, "name", "A"), (b, "name", "B")], expected)
+    assert repo.get_value(a, "name") != "A"
+    versions = repo.update_many([(a, "name", "A"), (b, "name", "B")], repo.versions([a, b]))
+    assert versions == repo.versions([a, b])
+
+
+def test_watcher_sees_commits_from_other_connections(repo, baseline_db):
+    watcher = ChangeWatcher(repo)
+    assert watcher.poll() == ([], [])
+    ids = _ids(repo)
+    other = IconRepository(baseline_db)
+    try:
+        other.update(ids[0], name="Elsewhere")
+        with other.writer() as conn:
+            conn.execute("DELETE FROM ac_icons WHERE icon_id=?", (ids[1],))
+    finally:
+        other.close()
+    assert watcher.poll() == ([ids[0]], [ids[1]])
+    assert watcher.poll() == ([], [])
+
+
+def test_readers_are_per_thread(repo):
+    conns = []
+    thread = threading.Thread(target=lambda: conns.append(repo.reader()))
+    thread.start()
+    thread.join()
+    assert conns[0] is not repo.reader() and repo.reader() is repo.reader()
+
+
+def test_bulk_edit_plan():
+    from icon_repository import IconRecord
+    record = IconRecord("0x06000001", "n", "Gems", "Ruby, gem", '{"size": 32}')
+    edit = BulkEdit(category="Jewelry", add_keywords=["GEM", "red"], remove_keywords=["ruby"],
+                    set_metadata={"tier": 2}, remove_metadata=["size"])
+    assert edit.apply(record) == {"category": "Jewelry", "keywords": "gem, red", "metadata_json": '{"tier": 2}'}
+    assert BulkEdit(category="Gems").plan([record]) == []
+    with pytest.raises(ValueError):
+        BulkEdit(set_metadata={"a": 1}).apply(record._replace(metadata_json="[1]"))
+
+
+def test_undo_redo_round_trip_and_conflicts(repo):
+    ids = _ids(repo)[:3]
+    before = repo.get_many(ids)
+    history = EditHistory(repo)
+    changes = BulkEdit(category="Undoable").plan(before)
+    history.apply(changes, "Set category", repo.versions(ids))
+    assert {r.category for r in repo.get_many(ids)} == {"Undoable"}
+    assert history.undo() == ("Set category", ids)
+    assert repo.get_many(ids) == before
+    assert history.redo_label() == "Set category"
+    history.redo()
+    repo.update(ids[0], category="Someone Else")
+    with pytest.raises(EditConflict):
+        history.undo()
+    assert history.undo_label() == "Set category"  # still there to retry
+    assert repo.get_value(ids[1], "category") == "Undoable"
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from category_facets import count_categories
+from icon_search import count_matches, match_expression, select_matches
+
+
+def _ids(repo, term="", categories=(), fts=True):
+    sql, params = select_matches(("icon_id",), term, fts, categories, repo.metadata_fields)
+    return [row[0] for row in repo.reader().execute(sql, params)]
+
+
+def _count(repo, term="", categories=(), fts=True):
+    return repo.reader().execute(*count_matches(term, fts, categories, repo.metadata_fields)).fetchone()[0]
+
+
+def test_match_expression_prefixes_every_word():
+    assert match_expression('fire "sword"') == '"fire"* AND "sword"*'
+    assert match_expression("  ") == ""
+
+
+@pytest.mark.parametrize("term", ["sword", "fire blade", "gem", "weap"])
+def test_fts_finds_every_row_a_word_starts_in(repo, term):
+    words = term.split()
+    expected = {icon_id for icon_id, *text in repo.search(("icon_id", "name", "category", "keywords"))
+                if all(any(w.startswith(p) for t in text for w in (t or "").lower().replace(",", " ").split())
+                       for p in words)}
+    assert set(_ids(repo, term)) == expected
+    assert _count(repo, term) == len(expected)
+    # Prefix matches are substrings, so the LIKE fallback finds them too
+    if len(words) == 1:
+        assert expected <= set(_ids(repo, term, fts=False))
+
+
+def test_fts_ranks_names_above_keywords(repo):
+    icon_id = _ids(repo)[7]
+    repo.update(icon_id, name="Zyxqor", keywords=None)
+    other = _ids(repo)[8]
+    repo.update(other, keywords="zyxqor, things")
+    assert _ids(repo, "zyxqor") == [icon_id, other]
+
+
+def test_counts_match_searches(repo):
+    categories = [name for name, _ in count_categories(repo.reader()) if name][:2]
+    for term, cats in [("", ()), ("", categories), ("sword", categories), ("s", ()),
+                       ("meta.size>=32", ()), ("sword meta.weenie_class<30", categories)]:
+        assert _count(repo, term, cats) == len(_ids(repo, term, cats)), (term, cats)
+    assert repo.count() == len(repo.search(("icon_id",)))
+
+
+def test_metadata_filters(repo):
+    rows = repo.search(("icon_id", "metadata_json"))
+    sizes = {icon_id: json.loads(meta)["size"] for icon_id, meta in rows}
+    assert set(_ids(repo, "meta.size:32")) == {i for i, s in sizes.items() if s == 32}
+    assert set(_ids(repo, "meta.size>32")) == {i for i, s in sizes.items() if s > 32}
+    with pytest.raises(ValueError, match="Unknown metadata field"):
+        _ids(repo, "meta.colour:red")
+
+
+def test_category_filter_ignores_case_and_padding(repo):
+    icon_id = _ids(repo)[0]
+    repo.update(icon_id, category="  zyx Category ")
+    assert _ids(repo, categories=["ZYX CATEGORY"]) == [icon_id]
+    assert ("zyx Category", 1) in repo.categories()
+
+
+def test_facets_and_stats_follow_writes(repo):
+    def facets():
+        return sorted((name.lower(), count) for name, count in repo.categories())
+
+    assert facets() == sorted((name.lower(), count) for name, count in count_categories(repo.reader()))
+    ids = _ids(repo)
+    repo.update(ids[0], category="Brand New")
+    with repo.writer() as conn:
+        conn.execute("DELETE FROM ac_icons WHERE icon_id=?", (ids[1],))
+        conn.execute("INSERT INTO ac_icons(icon_id, category) VALUES ('0x06FFFFFF', 'brand new')")
+    assert facets() == sorted((name.lower(), count) for name, count in count_categories(repo.reader()))
+    assert ("brand new", 2) in facets()
+    assert repo.count() == len(ids)
@@ -0,0 +1,112 @@
+import json
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from icon_repository import IconRepository
+from icon_server import make_server
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(db_path):
+        server = make_server(db_path, port=0, workers=2)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+        server.repo.close()
+
+
+def _get(url, headers=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as r:
+            return r.status, dict(r.headers), r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def _schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(conn.execute("SELECT type, name FROM sqlite_master"))
+    finally:
+        conn.close()
+
+
+def test_baseline_db_is_served_without_migrating_it(baseline_db, serve):
+    before = _schema(baseline_db)
+    url = serve(baseline_db)
+
+    status, _, body = _get(url + "/categories")
+    assert status == 200
+    categories = json.loads(body)
+    assert sum(c["icon_count"] for c in categories) == 120
+    assert len({c["name"].lower() for c in categories}) == len(categories)
+
+    status, headers, body = _get(url + "/icons/0x06000001.png")
+    assert status == 200 and body.startswith(b"\x89PNG") and headers["Content-Type"] == "image/png"
+    assert _get(url + "/icons/0x06000001.png?size=8")[0] == 200
+
+    status, _, body = _get(url + "/search?q=")
+    assert status == 200 and json.loads(body)["total"] == 120
+    # No meta_* columns yet: an unknown field, not a database error
+    status, _, body = _get(url + "/search?q=meta.size:32")
+    assert status == 400 and "size" in json.loads(body)["error"]
+
+    assert _schema(baseline_db) == before
+
+
+def test_search_matches_repository(repo, serve):
+    url = serve(repo.db_path)
+    status, _, body = _get(url + "/search?q=sword&per_page=500")
+    data = json.loads(body)
+    assert status == 200
+    assert [icon["icon_id"] for icon in data["icons"]] == [row[0] for row in repo.search(("icon_id",), "sword")]
+    assert data["total"] == repo.count("sword")
+
+    status, _, body = _get(url + "/search?q=meta.size:32&per_page=500")
+    assert status == 200 and json.loads(body)["total"] == repo.count("meta.size:32") > 0
+
+
+def test_etag_round_trip(repo, serve):
+    url = serve(repo.db_path)
+    for path in ("/icons/0x06000002", "/icons/0x06000002.png", "/icons/0x06000002.png?size=16", "/categories"):
+        status, headers, body = _get(url + path)
+        assert status == 200 and body
+        etag = headers["ETag"]
+        status, _, body = _get(url + path, {"If-None-Match": etag})
+        assert (status, body) == (304, b"")
+        assert _get(url + path, {"If-None-Match": f"W/{etag}"})[0] == 304
+        assert _get(url + path, {"If-None-Match": '"other"'})[0] == 200
+
+
+def test_errors_are_json(repo, serve, tmp_path):
+    url = serve(repo.db_path)
+    assert _get(url + "/icons/nope")[0] == 404
+    assert _get(url + "/icons/nope.png")[0] == 404
+    assert _get(url + "/search?page=0")[0] == 400
+    assert _get(url + "/icons/0x06000001.png?size=9999")[0] == 400
+
+    empty = str(tmp_path / "empty.db")
+    sqlite3.connect(empty).close()
+    status, _, body = _get(serve(empty) + "/icons/0x06000001")
+    assert status == 500 and "error" in json.loads(body)
+
+
+def test_read_only_repository_refuses_writes(baseline_db):
+    repo = IconRepository(baseline_db, read_only=True)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            repo.update("0x06000001", name="changed")
+    finally:
+        repo.close()
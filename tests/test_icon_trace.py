@@ -0,0 +1,47 @@
+import atexit
+import json
+
+import icon_trace
+from icon_trace import Tracer, format_readout
+
+
+def test_disabled_spans_record_nothing():
+    tracer = Tracer()
+    with tracer.collect() as frame, tracer.span("query"):
+        pass
+    assert frame == {} and tracer.percentiles("query") is None
+
+
+def test_collect_sums_spans_into_enclosing_frames():
+    tracer = Tracer()
+    tracer.set_enabled(True)
+    with tracer.collect() as outer:
+        tracer.record("query", 0.0, 0.002)
+        with tracer.collect() as inner:
+            tracer.record("decode", 0.0, 0.003)
+            tracer.record("decode", 0.0, 0.001)
+    assert round(inner["decode"], 6) == 4.0
+    assert round(outer["query"], 6) == 2.0 and round(outer["decode"], 6) == 4.0
+    assert tracer.percentiles("decode") == (3.0, 3.0)
+
+
+def test_readout_rolls_spans_up_into_groups(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(icon_trace, "tracer", tracer)
+    frame = {"seek": 1.0, "query": 2.0, "fetch": 1.0, "atlas": 3.0, "decode": 4.0, "tk": 9.0}
+    assert format_readout("page 3", frame) == "page 3: sql 4ms, decode 7ms, tk 9ms"
+    assert format_readout("page 3", {}) == "page 3: cached"
+    for ms in (10, 20, 30):
+        tracer.add_sample("page", ms)
+    assert format_readout("page 3", {"photo": 2.0}).endswith("photo 2ms | p50/p95 20/30ms")
+
+
+def test_trace_file_is_chrome_json(tmp_path):
+    path = tmp_path / "trace.json"
+    tracer = Tracer(str(path))
+    atexit.unregister(tracer.write_trace)
+    with tracer.span("query"):
+        pass
+    tracer.write_trace()
+    events = json.loads(path.read_text())["traceEvents"]
+    assert [(e["name"], e["ph"]) for e in events] == [("query", "X")]
@@ -0,0 +1,74 @@
+import io
+
+import pytest
+from PIL import Image
+
+import import_icons
+from change_journal import latest_seq
+from import_icons import REBUILD_PENDING, SOURCES_TABLE, rebuild_pending, run_import
+
+
+def _png(color, size=16):
+    out = io.BytesIO()
+    Image.new("RGBA", (size, size), color).save(out, "PNG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def export(tmp_path):
+    folder = tmp_path / "export"
+    (folder / "sub").mkdir(parents=True)
+    for i in range(5):
+        (folder / f"{0x06100000 + i:08X}.png").write_bytes(_png((i * 40, 0, 0, 255)))
+    (folder / "sub" / "0x06100000 copy.png").write_bytes(_png((0, 0, 255, 255)))
+    (folder / "06100009.png").write_bytes(b"not an image")
+    csv_path = tmp_path / "weenies.csv"
+    csv_path.write_text("Icon,Name,WCID,Weenie Type\n"
+                        "0x06100001,Zyxblade,101,6\n0x06100001,Zyxblade,102,6\n"
+                        "06100002,Qwerhelm,200,2\n")
+    return str(folder), str(csv_path)
+
+
+def test_import_adds_icons_and_rebuilds_derived_tables(repo, export):
+    before = repo.count()
+    seq = latest_seq(repo.reader())
+    summary = run_import(repo, *export)
+    assert summary["written"] == 5 and summary["csv_changed"]
+    reasons = dict(summary["rejected"])
+    assert "duplicate image for 0x06100000" in reasons.values()
+    assert any("not a readable image" in r for r in reasons.values())
+    assert repo.count() == before + 5
+    assert [r[0] for r in repo.search(("icon_id",), "zyxblade")] == ["0x06100001"]
+    assert [r[0] for r in repo.search(("icon_id",), "meta.size:16 meta.weenie_class:6")] == ["0x06100001"]
+    assert not rebuild_pending(repo)
+    assert latest_seq(repo.reader()) == seq  # imports are not journalled as local edits
+
+
+def test_unchanged_export_writes_nothing(repo, export):
+    run_import(repo, *export)
+    again = run_import(repo, *export)
+    assert again["written"] == 0 and not again["csv_changed"]
+
+
+def test_curated_names_survive_a_reimport(repo, export):
+    run_import(repo, *export)
+    repo.update("0x06100002", name="My Helm")
+    folder, csv_path = export
+    with open(csv_path, "a") as f:
+        f.write("0x06100002,Qwerhelm,201,2\n")
+    assert run_import(repo, folder, csv_path)["written"] == 1
+    assert repo.get_value("0x06100002", "name") == "My Helm"
+    assert [r[0] for r in repo.search(("icon_id",), "my helm")] == ["0x06100002"]
+
+
+def test_rejected_batch_leaves_no_rebuild_marker(repo, tmp_path, monkeypatch):
+    folder = tmp_path / "bad"
+    folder.mkdir()
+    (folder / "06100001.png").write_bytes(b"junk")
+    rebuilds = []
+    monkeypatch.setattr(import_icons, "rebuild_derived", lambda *a: rebuilds.append(a))
+    summary = run_import(repo, str(folder))
+    assert summary["written"] == 0 and len(summary["rejected"]) == 1
+    assert not rebuild_pending(repo) and not rebuilds
+    assert repo.reader().execute(f"SELECT COUNT(*) FROM {SOURCES_TABLE} WHERE name = ?",
+                                 (REBUILD_PENDING,)).fetchone()[0] == 0
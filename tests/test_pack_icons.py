@@ -0,0 +1,62 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from change_journal import latest_seq
+from icon_blobs import BLOB_TABLE, is_packed
+from icon_changes import latest_change
+from pack_icons import pack, smallest_png, unpack
+
+
+def _pixels(blob):
+    return np.asarray(Image.open(io.BytesIO(blob)).convert("RGBA"))
+
+
+def _images(repo):
+    ids = [row[0] for row in repo.search(("icon_id",))]
+    return repo.icon_data(ids)
+
+
+def test_smallest_png_is_lossless():
+    img = Image.new("RGBA", (24, 24), (0, 0, 0, 0))
+    img.paste((200, 10, 10, 255), (4, 4, 20, 20))
+    img.paste((10, 10, 200, 128), (8, 8, 12, 12))
+    out = io.BytesIO()
+    img.save(out, "PNG", compress_level=0)
+    blob = out.getvalue()
+    packed = smallest_png(blob)
+    assert len(packed) < len(blob)
+    assert (_pixels(packed) == _pixels(blob)).all()
+    assert smallest_png(b"GIF89a...") == b"GIF89a..."
+
+
+def test_pack_unpack_round_trip(repo):
+    before = _images(repo)
+    journal, versions = latest_seq(repo.reader()), latest_change(repo.reader())
+    summary = pack(repo)
+    assert summary["icons"] == len(before) and is_packed(repo.reader())
+    # Rows share a small pool of images, each stored once
+    distinct = repo.reader().execute(f"SELECT COUNT(*) FROM {BLOB_TABLE}").fetchone()[0]
+    assert distinct == len(set(before.values()))
+    assert repo.reader().execute("SELECT COUNT(*) FROM ac_icons WHERE icon_data IS NOT NULL").fetchone()[0] == 0
+    packed = _images(repo)
+    assert packed.keys() == before.keys()
+    assert all((_pixels(packed[i]) == _pixels(before[i])).all() for i in before)
+    # Not an edit: nothing journalled, no versions bumped
+    assert (latest_seq(repo.reader()), latest_change(repo.reader())) == (journal, versions)
+    assert pack(repo)["icons"] == 0  # nothing inline is left to pack
+
+    assert unpack(repo) == len(before)
+    assert not is_packed(repo.reader())
+    assert _images(repo) == packed
+    assert repo.reader().execute(f"SELECT COUNT(*) FROM {BLOB_TABLE}").fetchone()[0] == 0
+
+
+def test_inline_data_written_after_a_pack_wins(repo):
+    pack(repo)
+    icon_id = repo.search(("icon_id",))[0][0]
+    replacement = _images(repo)[repo.search(("icon_id",))[1][0]]
+    with repo.writer() as conn:
+        conn.execute("UPDATE ac_icons SET icon_data=? WHERE icon_id=?", (replacement, icon_id))
+    assert repo.icon_data([icon_id])[icon_id] == replacement
@@ -0,0 +1,56 @@
+import pytest
+
+from related_index import RelatedIndex, parse_query
+
+
+@pytest.fixture
+def index(repo, tmp_path):
+    return RelatedIndex(repo, path=str(tmp_path / "icons.related.npz"))
+
+
+def _ids(repo):
+    return [row[0] for row in repo.search(("icon_id",))]
+
+
+def test_parse_query():
+    assert parse_query("related: 0x06000001") == ("related", "0x06000001")
+    assert parse_query("~fire sword") == ("ranked", "fire sword")
+    assert parse_query("fire") is None
+
+
+def test_related_icons_share_terms(repo, index):
+    first = _ids(repo)[0]
+    hits = index.related(first, k=10)
+    assert hits and first not in [icon_id for icon_id, _ in hits]
+    assert all(0 < score <= 1.0001 for _, score in hits)
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+
+
+def test_ranked_search_only_returns_matching_icons(repo, index):
+    hits = {icon_id for icon_id, _ in index.search("sword")}
+    assert hits == {row[0] for row in repo.search(("icon_id",), "sword")}
+
+
+def test_edits_are_picked_up_without_counting_the_table(repo, index):
+    ids = _ids(repo)
+    repo.update(ids[0], name="Zyxqor", keywords="zyxqor")
+    with repo.writer() as conn:
+        conn.execute("DELETE FROM ac_icons WHERE icon_id=?", (ids[1],))
+        conn.execute("INSERT INTO ac_icons(icon_id, name, keywords) VALUES ('0x06FFFFFF', 'Zyxqor Two', 'zyxqor')")
+    statements = []
+    repo.reader().set_trace_callback(statements.append)
+    try:
+        assert [i for i, _ in index.search("zyxqor")] == [ids[0], "0x06FFFFFF"]
+    finally:
+        repo.reader().set_trace_callback(None)
+    assert not any("COUNT(*)" in sql.upper() for sql in statements)
+    assert len(index) == repo.count() and not index.stale
+    assert index.related(ids[1]) == []
+    assert [i for i, _ in index.related("0x06FFFFFF", k=1)] == [ids[0]]
+
+
+def test_sidecar_is_reused_and_replays_later_commits(repo, index):
+    ids = _ids(repo)
+    repo.update(ids[5], keywords="zyxqor")
+    reopened = RelatedIndex(repo, path=index.path)
+    assert [i for i, _ in reopened.search("zyxqor")] == [ids[5]]
@@ -0,0 +1,69 @@
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from find_duplicates import analyze
+from similarity_index import FAILED_TABLE, HASH_TABLE, SimilarityIndex
+
+
+def _ids(repo):
+    return [row[0] for row in repo.search(("icon_id",))]
+
+
+def _count(repo, table):
+    return repo.reader().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_query_needs_a_refresh_first(repo):
+    with pytest.raises(RuntimeError):
+        SimilarityIndex(repo).similar(_ids(repo)[0])
+
+
+def test_rows_sharing_an_image_are_nearest(repo):
+    index = SimilarityIndex(repo)
+    assert index.refresh() == len(_ids(repo))
+    data = repo.icon_data(_ids(repo))
+    icon_id = _ids(repo)[0]
+    twins = {i for i, blob in data.items() if blob == data[icon_id] and i != icon_id}
+    hits = index.similar(icon_id, k=len(twins))
+    assert {i for i, _ in hits} == twins and {d for _, d in hits} == {0}
+    assert index.refresh() == 0 and index.missing_count() == 0
+
+
+def test_undecodable_icons_are_not_retried_until_their_image_changes(repo):
+    icon_id = _ids(repo)[0]
+    with repo.writer() as conn:
+        conn.execute("UPDATE ac_icons SET icon_data = x'00' WHERE icon_id = ?", (icon_id,))
+    index = SimilarityIndex(repo)
+    index.refresh()
+    assert _count(repo, FAILED_TABLE) == 1 and index.missing_count() == 0
+    assert index.similar(icon_id) == []
+    good = repo.icon_data([_ids(repo)[1]])[_ids(repo)[1]]
+    with repo.writer() as conn:
+        conn.execute("UPDATE ac_icons SET icon_data = ? WHERE icon_id = ?", (good, icon_id))
+    assert _count(repo, FAILED_TABLE) == 0 and index.missing_count() == 1
+    assert index.refresh() == 1
+    assert index.similar(icon_id, k=1)[0][1] == 0
+
+
+def test_background_refresh(repo):
+    index = SimilarityIndex(repo)
+    assert index.refresh_in_background().result(timeout=30) is index
+    assert _count(repo, HASH_TABLE) == len(_ids(repo))
+
+
+def test_find_duplicates_groups_shared_and_rescaled_images(repo, tmp_path):
+    ids = _ids(repo)
+    img = Image.open(io.BytesIO(repo.icon_data([ids[0]])[ids[0]])).convert("RGBA")
+    out = io.BytesIO()
+    img.resize((img.width * 2, img.height * 2), Image.Resampling.NEAREST).save(out, "PNG")
+    with repo.writer() as conn:
+        conn.execute("INSERT INTO ac_icons(icon_id, icon_data) VALUES ('0x06FFFFFF', ?)", (out.getvalue(),))
+    report = analyze(repo, str(tmp_path / "report.json"))
+    assert json.loads((tmp_path / "report.json").read_text())["icons"] == len(ids) + 1
+    exact = [set(g["icon_ids"]) for g in report["exact_groups"]]
+    assert any(ids[0] in group for group in exact)
+    scaled = [g for g in report["near_groups"] if "0x06FFFFFF" in g["icon_ids"]]
+    assert scaled and scaled[0]["scaled"] and ids[0] in scaled[0]["icon_ids"]
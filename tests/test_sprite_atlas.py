@@ -0,0 +1,53 @@
+import json
+import os
+
+from PIL import Image
+
+from sprite_atlas import MANIFEST_NAME, export_atlas, open_atlas
+from thumbnail_cache import content_hash, decode_thumbnail
+
+
+def _data(repo):
+    return repo.icon_data([row[0] for row in repo.search(("icon_id",))])
+
+
+def test_atlas_tiles_match_the_decoded_thumbnails(repo, tmp_path):
+    out = str(tmp_path / "atlas")
+    data = _data(repo)
+    summary = export_atlas(repo, out, sizes=(16, 32), sheet_size=64)
+    assert summary["icons"] == len(data) and summary["tiles"] == len(set(data.values()))
+    reader = open_atlas(out)
+    assert reader.sizes == [16, 32]
+    hashes = {content_hash(blob): blob for blob in data.values()}
+    tiles = reader.get_many(list(hashes), (32, 32))
+    assert tiles.keys() == hashes.keys()
+    for key, img in tiles.items():
+        assert img.tobytes() == decode_thumbnail(hashes[key], (32, 32)).convert("RGBA").tobytes()
+    assert reader.get_many(["not a hash"], (32, 32)) == {} and reader.get_many(list(hashes), (24, 24)) == {}
+
+
+def test_sheets_hold_every_sprite(repo, tmp_path):
+    out = str(tmp_path / "atlas")
+    export_atlas(repo, out, sizes=(16,), sheet_size=40, padding=1)
+    with open(os.path.join(out, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    sheets = manifest["sizes"]["16"]["sheets"]
+    assert len(sheets) > 1
+    data = _data(repo)
+    for icon_id, entry in manifest["icons"].items():
+        sheet, x, y, w, h = entry["sprites"]["16"]
+        sprite = Image.open(os.path.join(out, sheets[sheet])).crop((x, y, x + w, y + h))
+        assert sprite.tobytes() == decode_thumbnail(data[icon_id], (16, 16)).convert("RGBA").tobytes()
+
+
+def test_a_smaller_export_removes_stale_sheets(repo, tmp_path):
+    out = str(tmp_path / "atlas")
+    export_atlas(repo, out, sizes=(16, 32), sheet_size=40)
+    export_atlas(repo, out, sizes=(16,), term="zzzz-no-match")
+    sheets = sorted(name for name in os.listdir(out) if name.endswith(".png"))
+    assert sheets == []
+    assert open_atlas(out).get_many([content_hash(b) for b in _data(repo).values()], (16, 16)) == {}
+
+
+def test_missing_atlas_is_none(tmp_path):
+    assert open_atlas(str(tmp_path)) is None
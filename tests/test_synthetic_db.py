@@ -0,0 +1,28 @@
+from icon_repository import IconRepository
+from synthetic_db import generate
+
+from tests.conftest import ROWS
+
+
+def test_extends_a_database_the_apps_have_migrated(baseline_db):
+    repo = IconRepository(baseline_db)  # adds the generated meta_* columns among others
+    repo.close()
+    generate(baseline_db, ROWS + 30)
+    repo = IconRepository(baseline_db)
+    try:
+        assert repo.count() == ROWS + 30
+        assert repo.count("meta.size>0") == ROWS + 30
+    finally:
+        repo.close()
+
+
+def test_same_seed_same_rows(tmp_path):
+    a, b = str(tmp_path / "a.db"), str(tmp_path / "b.db")
+    generate(a, 20, pool_size=4)
+    generate(b, 20, pool_size=4)
+    rows = []
+    for path in (a, b):
+        repo = IconRepository(path)
+        rows.append(repo.search(("icon_id", "name", "keywords", "icon_data")))
+        repo.close()
+    assert rows[0] == rows[1] and len(rows[0]) == 20
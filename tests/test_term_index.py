@@ -0,0 +1,45 @@
+import pytest
+
+from icon_search import FTS_COLUMNS
+from term_index import TermIndex, tokenize
+
+TERMS = ["sword", "s", "fire blade", "gem r", "weapons", "olthoi", "0x0600000", "b s"]
+
+
+@pytest.fixture
+def index(repo):
+    return TermIndex().load_from(repo)
+
+
+def _fts(repo, term):
+    return [row[0] for row in repo.search(("icon_id",), term)]
+
+
+def test_tokenize_matches_unicode61():
+    assert tokenize("Éclair d'Épée_2") == ["eclair", "d", "epee", "2"]
+    assert tokenize(None) == []
+
+
+@pytest.mark.parametrize("term", TERMS)
+def test_order_matches_fts_bm25(repo, index, term):
+    assert repo.fts_enabled
+    assert index.search(term) == _fts(repo, term)
+
+
+def test_order_matches_fts_after_edits_and_deletes(repo, index):
+    ids = [row[0] for row in repo.search(("icon_id",))]
+    edits = {ids[3]: dict(name="Sword Of Fire", keywords="sword, fire, blade"),
+             ids[42]: dict(keywords="gem, ruby, sword, sword")}
+    # Enough edits that stale postings would visibly skew the idf of their old terms
+    edits.update((icon_id, dict(name="Plain", keywords="nothing")) for icon_id in ids[60:100])
+    for icon_id, fields in edits.items():
+        repo.update(icon_id, **fields)
+        index.update(*repo.rows_for(FTS_COLUMNS, [icon_id])[0])
+    with repo.writer() as conn:
+        for icon_id in ids[50:60]:
+            conn.execute("DELETE FROM ac_icons WHERE icon_id=?", (icon_id,))
+    for icon_id in ids[50:60]:
+        index.remove(icon_id)
+    assert len(index.search("")) == len(ids) - 10
+    for term in TERMS:
+        assert index.search(term) == _fts(repo, term), term
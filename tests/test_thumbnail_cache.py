@@ -0,0 +1,56 @@
+import pytest
+from PIL import ImageTk
+
+import thumbnail_cache
+from thumbnail_cache import ThumbnailCache, content_hash
+
+
+class FakePhoto:
+    """Stands in for ImageTk.PhotoImage, which needs a Tk root."""
+
+    def __init__(self, img):
+        self.size = img.size
+
+
+@pytest.fixture
+def cache(repo, monkeypatch):
+    monkeypatch.setattr(ImageTk, "PhotoImage", FakePhoto)
+    return ThumbnailCache(repo.db_path, max_photos=4)
+
+
+def _blobs(repo, n):
+    ids = [row[0] for row in repo.search(("icon_id",))][:n]
+    data = repo.icon_data(ids)
+    return [data[i] for i in ids]
+
+
+def test_thumbnails_are_scaled_and_written_to_the_sidecar(repo, cache):
+    blobs = _blobs(repo, 6) + [None, b"not a png"]
+    images = cache.thumbnails(blobs, (16, 16))
+    assert all(max(img.size) <= 16 for img in images[:6])
+    assert images[6:] == [None, None]
+    stored = cache.store.get_many([content_hash(b) for b in blobs[:6]], (16, 16))
+    assert set(stored) == {content_hash(b) for b in blobs[:6]}
+
+
+def test_realize_survives_eviction_after_prepare(repo, cache):
+    blobs = _blobs(repo, 3)
+    first = cache.realize(cache.prepare(blobs, (16, 16)))
+    assert all(first)
+    prepared = cache.prepare(blobs, (16, 16))  # all in memory: no images carried
+    assert all(img is None for _, img, _ in prepared)
+    cache._photos.clear()  # the LRU drops them before the Tk thread gets there
+    assert all(cache.realize(prepared))
+
+
+def test_prepare_hashes_each_blob_once(repo, cache, monkeypatch):
+    calls = []
+
+    def counting_hash(blob):
+        calls.append(blob)
+        return content_hash(blob)
+
+    monkeypatch.setattr(thumbnail_cache, "content_hash", counting_hash)
+    blobs = _blobs(repo, 5)
+    cache.prepare(blobs, (16, 16))
+    assert len(calls) == len(blobs)
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+from icon_search import FTS_TABLE
+from icon_stats import COUNT_SQL, STATS_TABLE
+from trigger_gates import SUSPEND_TABLE, gate, install_triggers, suspended
+
+
+def _fts_hits(repo, word):
+    return repo.reader().execute(f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?",
+                                 (word,)).fetchone()[0]
+
+
+def _suspended_rows(repo):
+    return repo.reader().execute(f"SELECT COUNT(*) FROM {SUSPEND_TABLE}").fetchone()[0]
+
+
+def test_only_writes_inside_the_block_skip_the_triggers(repo):
+    count = repo.reader().execute(COUNT_SQL).fetchone()[0]
+    with repo.writer() as conn:
+        with suspended(conn, (FTS_TABLE, STATS_TABLE)):
+            conn.execute("INSERT INTO ac_icons(icon_id, name) VALUES ('0x06FFFFF0', 'Zyxqor')")
+        conn.execute("INSERT INTO ac_icons(icon_id, name) VALUES ('0x06FFFFF1', 'Zyxqor')")
+    assert _fts_hits(repo, "zyxqor") == 1
+    assert repo.reader().execute(COUNT_SQL).fetchone()[0] == count + 1
+    assert _suspended_rows(repo) == 0
+
+
+def test_an_interrupted_bulk_write_leaves_nothing_suspended(repo):
+    with pytest.raises(RuntimeError):
+        with repo.writer() as conn, suspended(conn, (FTS_TABLE,)):
+            conn.execute("INSERT INTO ac_icons(icon_id, name) VALUES ('0x06FFFFF0', 'Zyxqor')")
+            raise RuntimeError("interrupted")
+    assert repo.get("0x06FFFFF0") is None and _suspended_rows(repo) == 0
+    repo.update(repo.search(("icon_id",))[0][0], name="Zyxqor")
+    assert _fts_hits(repo, "zyxqor") == 1
+
+
+def test_other_connections_are_never_suspended(repo, baseline_db):
+    other = sqlite3.connect(baseline_db, timeout=5)
+    try:
+        with repo.writer() as conn, suspended(conn, (FTS_TABLE,)):
+            assert other.execute(f"SELECT COUNT(*) FROM {SUSPEND_TABLE}").fetchone()[0] == 0
+    finally:
+        other.close()
+
+
+def test_ungated_triggers_are_replaced(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "t.db"))
+    conn.executescript("CREATE TABLE ac_icons (icon_id TEXT PRIMARY KEY); CREATE TABLE log (icon_id TEXT);"
+                       "CREATE TRIGGER log_ai AFTER INSERT ON ac_icons BEGIN "
+                       "INSERT INTO log VALUES (new.icon_id); END;")
+    install_triggers(conn, "log", f"CREATE TRIGGER IF NOT EXISTS log_ai AFTER INSERT ON ac_icons "
+                                  f"WHEN {gate('log')} BEGIN INSERT INTO log VALUES (new.icon_id); END;")
+    with conn, suspended(conn, ("log",)):
+        conn.execute("INSERT INTO ac_icons VALUES ('a')")
+    with conn:
+        conn.execute("INSERT INTO ac_icons VALUES ('b')")
+    assert conn.execute("SELECT icon_id FROM log").fetchall() == [("b",)]
+    conn.close()
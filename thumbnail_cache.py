@@ -0,0 +1,186 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from icon_trace import span
+
+# ==============================================
+# THUMBNAIL CACHE SETTINGS
+# ==============================================
+
+# PhotoImages kept ready in memory (level 1)
+MEMORY_CACHE_SIZE = 512
+# Pre-scaled pixels live in a sidecar SQLite file next to the icon DB (level 2)
+SIDECAR_SUFFIX = ".thumbs.db"
+# A sprite atlas exported next to the icon DB by sprite_atlas.py is read
+# before the sidecar: its tiles are memory-mapped, not decoded (level 2a)
+ATLAS_SUFFIX = ".atlas"
+
+
+def content_hash(blob):
+    """Key used for everything derived from an icon's image data."""
+    return hashlib.sha1(blob).hexdigest()
+
+
+def decode_thumbnail(blob, size):
+    """Decode a PNG blob and scale it to fit `size` - the slow path the cache avoids."""
+    from PIL import Image  # imported on first use so the apps can paint before PIL loads
+    img = Image.open(io.BytesIO(blob))
+    img.thumbnail(size)
+    if img.mode not in ("RGB", "RGBA", "L", "LA"):
+        img = img.convert("RGBA")
+    return img
+
+
+class ThumbnailStore:
+    """Level 2: raw pre-scaled pixels keyed by (content hash, box size).
+
+    A changed icon_data blob has a different hash, so stale entries are never
+    served; they just stop being read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS icon_thumbnails (
+                content_hash TEXT NOT NULL,
+                box_width INTEGER NOT NULL,
+                box_height INTEGER NOT NULL,
+                mode TEXT NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                pixels BLOB NOT NULL,
+                PRIMARY KEY (content_hash, box_width, box_height)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def get_many(self, hashes, size):
+        """Return {hash: Image} for the hashes already stored at `size`."""
+        from PIL import Image
+        hashes = list(set(hashes))
+        found = {}
+        with self._lock:
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                rows = self.conn.execute(
+                    "SELECT content_hash, mode, width, height, pixels FROM icon_thumbnails "
+                    f"WHERE box_width=? AND box_height=? AND content_hash IN ({','.join('?' * len(chunk))})",
+                    (size[0], size[1], *chunk)).fetchall()
+                for key, mode, width, height, pixels in rows:
+                    found[key] = Image.frombytes(mode, (width, height), pixels)
+        return found
+
+    def put_many(self, images, size):
+        """Store {hash: Image} scaled to `size`."""
+        if not images:
+            return
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO icon_thumbnails VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(key, size[0], size[1], img.mode, img.width, img.height, img.tobytes())
+                 for key, img in images.items()])
+
+    def close(self):
+        self.conn.close()
+
+
+class ThumbnailCache:
+    """Two-level cache: an LRU of PhotoImages in front of a ThumbnailStore.
+
+    If a sprite atlas at the box size exists next to the DB, it is
+    consulted before the store.
+    """
+
+    def __init__(self, db_path, max_photos=MEMORY_CACHE_SIZE):
+        self.max_photos = max_photos
+        self._photos = OrderedDict()
+        self.store = ThumbnailStore(os.path.splitext(db_path)[0] + SIDECAR_SUFFIX)
+        self.atlas_dir = os.path.splitext(db_path)[0] + ATLAS_SUFFIX
+        self._atlas = None  # AtlasReader, False if there is none; opened by the first load
+        self._atlas_lock = threading.Lock()
+
+    def atlas(self):
+        with self._atlas_lock:
+            if self._atlas is None:
+                from sprite_atlas import open_atlas
+                self._atlas = open_atlas(self.atlas_dir) or False
+        return self._atlas
+
+    def thumbnails(self, blobs, size, hashes=None):
+        """Return a scaled PIL image (or None) per blob without touching Tk.
+
+        Misses in the sidecar are decoded and written back in one batch.
+        `hashes`, if the caller already has them, are the blobs' content_hash().
+        """
+        keys = hashes if hashes is not None else [content_hash(b) if b else None for b in blobs]
+        atlas = self.atlas()
+        images = {}
+        if atlas:
+            with span("atlas"):
+                images = atlas.get_many([k for k in keys if k], size)
+        with span("sidecar"):
+            images.update(self.store.get_many([k for k in keys if k and k not in images], size))
+        decoded = {}
+        with span("decode"):
+            for key, blob in zip(keys, blobs):
+                if key and key not in images and key not in decoded:
+                    try:
+                        decoded[key] = decode_thumbnail(blob, size)
+                    except Exception:
+                        decoded[key] = None
+        with span("sidecar"):
+            self.store.put_many({k: img for k, img in decoded.items() if img is not None}, size)
+        images.update(decoded)
+        return [images.get(k) if k else None for k in keys]
+
+    def prepare(self, blobs, size):
+        """Resolve blobs to [(key, image, blob)] off the Tk thread.
+
+        `image` is None when the PhotoImage is already in memory (or the blob
+        is unreadable); realize() turns the result into PhotoImages. The blob
+        is kept for the in-memory ones, in case the LRU evicts them first.
+        """
+        hashes = [content_hash(b) if b else None for b in blobs]
+        keys = [(h, size) if h else None for h in hashes]
+        todo = [i for i, k in enumerate(keys) if k and k not in self._photos]
+        images = dict(zip((keys[i] for i in todo),
+                          self.thumbnails([blobs[i] for i in todo], size, [hashes[i] for i in todo])))
+        return [(k, images[k], None) if k in images else (k, None, b) for k, b in zip(keys, blobs)]
+
+    def realize(self, prepared):
+        """Return a PhotoImage (or None) per prepare() entry; must run on the Tk thread."""
+        from PIL import ImageTk
+
+        result = []
+        with span("photo"):
+            for key, img, blob in prepared:
+                photo = self._photos.get(key) if key else None
+                if photo is not None:
+                    self._photos.move_to_end(key)
+                    result.append(photo)
+                    continue
+                if img is None and key and blob:  # evicted since prepare(): a sidecar hit, rarely a decode
+                    img = self.thumbnails([blob], key[1], [key[0]])[0]
+                if img is not None:
+                    photo = ImageTk.PhotoImage(img)
+                    self.remember(key, photo)
+                result.append(photo)
+        return result
+
+    def photos(self, blobs, size):
+        """Return a PhotoImage (or None) per blob; must run on the Tk thread."""
+        return self.realize(self.prepare(blobs, size))
+
+    def remember(self, key, photo):
+        """Add a PhotoImage to the LRU, evicting the least recently used ones."""
+        self._photos[key] = photo
+        self._photos.move_to_end(key)
+        while len(self._photos) > self.max_photos:
+            self._photos.popitem(last=False)
@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+
+# ==============================================
+# SUSPENDING ac_icons TRIGGERS FOR BULK WRITES
+# ==============================================
+#
+# Bulk writers (import_icons.py, pack_icons.py) rebuild some derived tables
+# once at the end instead of row by row, or leave them alone entirely. So
+# every trigger on ac_icons is guarded by gate(prefix), and does nothing
+# while ac_icons_suspended holds a row for its prefix. suspended() inserts
+# those rows inside the bulk writer's own transaction and deletes them
+# again before the commit. Other connections therefore never see them:
+# edits saved by the apps during an import still fire every trigger, and
+# an interrupted bulk write rolls the rows back with the rest of its
+# transaction. The triggers themselves are never dropped.
+
+SUSPEND_TABLE = "ac_icons_suspended"
+
+SUSPEND_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {SUSPEND_TABLE} (
+    prefix TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+def gate(prefix):
+    """SQL condition that is false while the triggers named `prefix`* are suspended."""
+    return f"NOT EXISTS (SELECT 1 FROM {SUSPEND_TABLE} WHERE prefix = '{prefix}')"
+
+
+def install_triggers(conn, prefix, ddl):
+    """Run `ddl` (CREATE TRIGGER IF NOT EXISTS ... for triggers named `prefix`*).
+
+    Triggers made before the gates existed are replaced in the same
+    transaction, so no write can slip through without them.
+    """
+    stale = [name for name, sql in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='trigger' AND tbl_name='ac_icons'")
+        if name.startswith(prefix) and SUSPEND_TABLE not in sql]
+    if not stale:
+        conn.executescript(SUSPEND_SCHEMA + ddl)
+        return
+    drops = "".join(f"DROP TRIGGER {name};\n" for name in stale)
+    conn.executescript(f"BEGIN IMMEDIATE;\n{SUSPEND_SCHEMA}{drops}{ddl}\nCOMMIT;")
+
+
+@contextmanager
+def suspended(conn, prefixes):
+    """Within an open write transaction on `conn`, turn off the triggers named with `prefixes`.
+
+    Only writes made through `conn` before the block ends skip them; the
+    rows are removed before the transaction can commit.
+    """
+    conn.executemany(f"INSERT OR IGNORE INTO {SUSPEND_TABLE}(prefix) VALUES (?)", [(p,) for p in prefixes])
+    try:
+        yield conn
+    finally:
+        conn.executemany(f"DELETE FROM {SUSPEND_TABLE} WHERE prefix = ?", [(p,) for p in prefixes])